@@ -0,0 +1,65 @@
+# backfill_risk.py
+"""Rescore stored analyses after the risk profiles change.
+
+Streams symptom_analyses from postgres in id order, scores each chunk
+with the current RiskCalculator in one vectorized call and writes back
+risk_score, urgency_level and follow_up_days for the rows that changed.
+Progress is checkpointed per job in risk_backfill_checkpoints with every
+chunk it writes, so an interrupted run picks up where it stopped. The
+default job name carries a fingerprint of the risk profiles, so a profile
+change starts from the first row and rerunning the same profiles only
+rescores analyses added since.
+
+Usage: python backfill_risk.py [--chunk-size 5000] [--dry-run] [--restart]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from database.db_manager import DatabaseManager
+from models.risk_calculator import RiskCalculator
+from utils.data_preprocessor import DataPreprocessor
+from utils.risk_backfill import RISK_BACKFILL_CHUNK_SIZE, RiskBackfill
+
+logger = logging.getLogger("backfill_risk")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rescore stored analyses with the current risk profiles")
+    parser.add_argument("--chunk-size", type=int, default=RISK_BACKFILL_CHUNK_SIZE, help="Rows fetched and scored per step")
+    parser.add_argument("--job", help="Checkpoint name (default: from the risk profile fingerprint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the job's checkpoint and start from the first row")
+    parser.add_argument("--dry-run", action="store_true", help="Count changed rows without writing them")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+async def run(args: argparse.Namespace) -> dict:
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    
+    db = DatabaseManager()
+    await db.initialize()
+    try:
+        if not db.pool:
+            raise RuntimeError("Postgres is not reachable, check DATABASE_URL")
+        backfill = RiskBackfill(db, calculator, DataPreprocessor(), chunk_size=args.chunk_size, dry_run=args.dry_run)
+        return await backfill.run(job=args.job, restart=args.restart)
+    finally:
+        await db.close()
+
+def cli():
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    
+    try:
+        summary = asyncio.run(run(args))
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    
+    print(json.dumps(summary))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(cli())
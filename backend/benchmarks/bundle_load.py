@@ -0,0 +1,109 @@
+# benchmarks/bundle_load.py
+"""Compare model load time and memory: eager artifacts vs the model bundle.
+
+Each mode runs in a fresh interpreter so imports, the page cache and RSS do
+not leak between runs. Both modes load the current bundle. The 'eager' mode
+then reads every component fully and compiles the tree engine from the
+sklearn model, which is what startup did with the separate .pkl files. The
+'bundle' mode is SymptomAnalyzer.load_models_sync(), which maps the compiled
+arrays and defers the sklearn model. Both modes then score one request so
+the measured state can serve traffic.
+
+Usage: python -m benchmarks.bundle_load --runs 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+def read_rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def child(mode: str) -> Dict[str, float]:
+    # Imports are paid by both modes before measuring
+    import models.symptom_analyzer as symptom_analyzer_module
+    from models.model_bundle import ModelBundle
+    from models.tree_engine import CompiledTreeEnsemble
+    import sklearn.ensemble, sklearn.feature_extraction.text, sklearn.preprocessing  # noqa: F401
+    
+    analyzer = symptom_analyzer_module.SymptomAnalyzer()
+    baseline_kb = read_rss_kb()
+    started = time.perf_counter()
+    
+    if mode == 'eager':
+        bundle = ModelBundle.load_current(analyzer.model_path)
+        analyzer.primary_model = bundle.load_component('primary_model', mmap=False)
+        analyzer.text_vectorizer = bundle.load_component('vectorizer', mmap=False)
+        analyzer.symptom_encoder = bundle.load_component('encoder', mmap=False)
+        analyzer.scaler = bundle.load_component('scaler', mmap=False)
+        analyzer.condition_mappings = dict(bundle.manifest['condition_mappings'])
+        analyzer._build_feature_plan()
+        analyzer.inference_engine = CompiledTreeEnsemble(analyzer.primary_model)
+    else:
+        analyzer.load_models_sync()
+    load_seconds = time.perf_counter() - started
+    
+    processed = {
+        'primary_concern': 'persistent cough with fever', 'duration': '1-3 days',
+        'pain_level': 'Mild pain (1-3/10)', 'additional_symptoms': ['Fever']
+    }
+    analyzer.analyze_sync(processed)
+    
+    return {
+        'load_ms': load_seconds * 1000,
+        'rss_delta_kb': read_rss_kb() - baseline_kb,
+        'primary_model_loaded': analyzer._primary_model is not None or (
+            analyzer._model_loader is not None and analyzer._model_loader.loaded
+        )
+    }
+
+def run_child(mode: str) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bundle_load", "--child", mode],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=["eager", "bundle"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return 0
+    
+    results: Dict[str, List[Dict[str, float]]] = {'eager': [], 'bundle': []}
+    for _ in range(args.runs):
+        for mode in results:
+            results[mode].append(run_child(mode))
+    
+    summary = {
+        mode: {
+            'load_ms_median': float(np.median([run['load_ms'] for run in runs])),
+            'rss_delta_mb_median': float(np.median([run['rss_delta_kb'] for run in runs])) / 1024,
+            'primary_model_loaded': runs[-1]['primary_model_loaded']
+        }
+        for mode, runs in results.items()
+    }
+    print(f"{'mode':<8} {'load ms':>9} {'RSS delta MB':>13} {'sklearn model loaded':>21}")
+    for mode, row in summary.items():
+        print(f"{mode:<8} {row['load_ms_median']:>9.1f} {row['rss_delta_mb_median']:>13.1f} {str(row['primary_model_loaded']):>21}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'runs': results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# benchmarks/cascade.py
+"""Escalation rate, agreement and latency of cascade inference per threshold.
+
+Inputs are either the load-test generator's free-form requests or
+variations of the training templates (the distribution the model was
+trained on), run through the real preprocessing and feature extraction.
+For each threshold the analyzer's cascade answers every row;
+agreement is the share of rows whose predicted condition matches the full
+model alone, and escalation the share that needed the full model. Latency
+is the median of analyze_sync over single requests and of
+analyze_features_sync over batches. Threshold 1 is the full model only.
+
+Usage: python -m benchmarks.cascade --rows 2000 --thresholds 0.5 0.8 0.9 0.95 1
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Dict, List, Any
+
+from benchmarks.synthetic import SymptomInputGenerator
+from benchmarks.tree_engine_parity import time_call
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import build_training_frame, training_templates
+from utils.data_preprocessor import DataPreprocessor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--inputs", choices=['synthetic', 'training'], default='synthetic')
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.8, 0.9, 0.95, 1.0])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the inputs per timing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    analyzer = SymptomAnalyzer()
+    analyzer.load_models_sync()
+    if analyzer.cascade is None:
+        print("The current bundle has no distilled model, train one with train_model.py")
+        return 1
+    
+    if args.inputs == 'training':
+        # A seed other than the trainer's, so these are not the rows it fit on
+        frame = build_training_frame(training_templates(), args.rows, seed=args.seed + 1)
+        items = frame.drop(columns=['condition']).to_dict('records')
+    else:
+        items = SymptomInputGenerator(seed=args.seed).batch(args.rows)
+    preprocessor = DataPreprocessor()
+    processed = [preprocessor.process_symptoms_sync(item) for item in items]
+    features = analyzer._extract_features_many(processed)
+    _, full_classes = analyzer._predict(features)
+    
+    results: List[Dict[str, Any]] = []
+    for threshold in args.thresholds:
+        analyzer.cascade_threshold = threshold
+        _, predicted, escalated = analyzer._predict_cascade(features)
+        sample = processed[:200]
+        single_ms = time_call(lambda: [analyzer.analyze_sync(item) for item in sample], args.repeats) / len(sample)
+        batches = [
+            (processed[start:start + args.batch_size], features[start:start + args.batch_size])
+            for start in range(0, min(len(processed), 20 * args.batch_size), args.batch_size)
+        ]
+        batch_ms = time_call(
+            lambda: [analyzer.analyze_features_sync(items, rows) for items, rows in batches], args.repeats
+        ) / len(batches)
+        results.append({
+            'threshold': threshold,
+            'escalation_rate': float(escalated.mean()),
+            'agreement': float((predicted == full_classes).mean()),
+            'holdout_expected': analyzer.cascade.expected(threshold),
+            'single_ms': single_ms,
+            'batch_ms': batch_ms
+        })
+    
+    print(f"{'threshold':>9} {'escalated':>9} {'agreement':>9} {'1 request ms':>12} {f'{args.batch_size} batch ms':>12}")
+    for row in results:
+        print(
+            f"{row['threshold']:>9.2f} {row['escalation_rate']:>9.3f} {row['agreement']:>9.4f} "
+            f"{row['single_ms']:>12.3f} {row['batch_ms']:>12.3f}"
+        )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'rows': args.rows,
+                'inputs': args.inputs,
+                'cascade': {'nodes': len(analyzer.cascade.feature), 'max_depth': analyzer.cascade.max_depth},
+                'results': results
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# benchmarks/comorbidity_parity.py
+"""Check the compiled comorbidity matcher against the substring scans it replaced.
+
+The regression corpus is synthetic requests run through the real
+preprocessing, raw histories as patients type them, and hand-written edge
+cases: mixed case, categories inside other words, overlapping and repeated
+categories, empty entries and characters whose lower case changes length.
+For every row the comorbidity count, urgency level and risk factors must
+equal the previous implementations, kept in tests/parity.py, and
+the matched categories must equal a plain substring test of each category.
+Any mismatch exits with status 1. Timings compare the reference count,
+the matcher without its cache and the matcher on repeated histories.
+
+Usage: python -m benchmarks.comorbidity_parity --rows 5000
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+
+from benchmarks.tree_engine_parity import time_call
+from models.comorbidity_matcher import ComorbidityMatcher
+from models.risk_calculator import RiskCalculator
+from tests.parity import (
+    build_corpus, reference_categories, reference_count, reference_risk_factors, reference_urgency
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    corpus = build_corpus(calculator, args.rows, args.seed)
+    rng = random.Random(args.seed)
+    conditions = list(calculator.condition_risk_profiles) + ['Unlisted Condition']
+    
+    mismatches = {'comorbidity_count': 0, 'categories': 0, 'urgency_level': 0, 'risk_factors': 0}
+    for processed_data in corpus:
+        history = processed_data.get('medical_history', [])
+        condition = rng.choice(conditions)
+        risk_score = rng.randint(0, 100)
+        mismatches['comorbidity_count'] += calculator.comorbidity_count(history) != reference_count(history)
+        mismatches['categories'] += (
+            calculator.comorbidity_categories(history) != reference_categories(history, calculator.HIGH_RISK_CONDITIONS)
+        )
+        mismatches['urgency_level'] += (
+            calculator._determine_urgency_level(risk_score, condition, processed_data)
+            != reference_urgency(calculator, risk_score, condition, processed_data)
+        )
+        mismatches['risk_factors'] += (
+            calculator._identify_primary_risk_factors(processed_data, condition)
+            != reference_risk_factors(processed_data, condition)
+        )
+    
+    histories = [processed_data.get('medical_history', []) for processed_data in corpus]
+    uncached = ComorbidityMatcher(calculator.HIGH_RISK_CONDITIONS, cache_size=0)
+    timings = {
+        'reference_us': time_call(lambda: [reference_count(h) for h in histories], args.repeats),
+        'matcher_us': time_call(lambda: [uncached.match(h).entries for h in histories], args.repeats),
+        'cached_us': time_call(lambda: [calculator.comorbidity_count(h) for h in histories], args.repeats)
+    }
+    # Milliseconds per pass over the corpus to microseconds per history
+    timings = {name: ms * 1000 / len(histories) for name, ms in timings.items()}
+    
+    print(f"{len(corpus)} rows checked, mismatches: {mismatches}")
+    print(
+        f"per history: reference {timings['reference_us']:.2f} us, matcher {timings['matcher_us']:.2f} us, "
+        f"cached {timings['cached_us']:.2f} us"
+    )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': len(corpus), 'mismatches': mismatches, 'timings': timings}, f, indent=2)
+    return 1 if any(mismatches.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
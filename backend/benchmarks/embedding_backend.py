@@ -0,0 +1,155 @@
+# benchmarks/embedding_backend.py
+"""Compare the PyTorch and int8 ONNX sentence encoders.
+
+Each backend runs in a fresh interpreter, so import time and RSS are what a
+server worker pays. A run imports the backend's libraries, loads the
+encoder through SymptomAnalyzer.get_sentence_model(), encodes single
+queries and batches, and saves its embeddings of a fixed sentence set.
+Parity is the per-sentence cosine between the two backends' embeddings and
+the overlap of the top-5 most similar sentences for each sentence.
+
+Run export_embeddings.py first.
+
+Usage: python -m benchmarks.embedding_backend --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Any
+
+import numpy as np
+
+BACKENDS = ['torch', 'onnx']
+TOP_K = 5
+
+def read_rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def sentences() -> List[str]:
+    from models.training import build_training_frame, training_templates
+    
+    frame = build_training_frame(training_templates(), 200, seed=7)
+    return sorted(set(frame['condition'])) + list(frame['primary_concern'])
+
+def child(backend: str, output: str) -> Dict[str, Any]:
+    texts = sentences()
+    baseline_kb = read_rss_kb()
+    
+    started = time.perf_counter()
+    if backend == 'torch':
+        import sentence_transformers  # noqa: F401
+    else:
+        import onnxruntime, tokenizers  # noqa: F401
+    import_seconds = time.perf_counter() - started
+    
+    from models.symptom_analyzer import SymptomAnalyzer
+    started = time.perf_counter()
+    encoder = SymptomAnalyzer().get_sentence_model()
+    load_seconds = time.perf_counter() - started
+    if encoder is None:
+        raise RuntimeError(f"The {backend} encoder could not be loaded")
+    
+    embeddings = np.asarray(encoder.encode(texts), dtype=np.float32)
+    np.save(output, embeddings)
+    
+    single = []
+    for text in texts[:100]:
+        started = time.perf_counter()
+        encoder.encode([text])
+        single.append(time.perf_counter() - started)
+    batch = []
+    for start in range(0, len(texts) - 31, 32):
+        started = time.perf_counter()
+        encoder.encode(texts[start:start + 32])
+        batch.append(time.perf_counter() - started)
+    
+    return {
+        'backend': type(encoder).__name__,
+        'import_s': import_seconds,
+        'load_s': load_seconds,
+        'rss_mb': (read_rss_kb() - baseline_kb) / 1024,
+        'single_ms': float(np.median(single)) * 1000,
+        'batch32_ms': float(np.median(batch)) * 1000
+    }
+
+def run_child(backend: str, output: str) -> Dict[str, Any]:
+    env = dict(os.environ, EMBEDDING_BACKEND=backend)
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.embedding_backend", "--child", backend, "--embeddings", output],
+        capture_output=True, text=True, check=True, env=env
+    ).stdout
+    return json.loads(result.strip().splitlines()[-1])
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    def unit(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    reference, candidate = unit(reference), unit(candidate)
+    cosines = (reference * candidate).sum(axis=1)
+    
+    def top_k(vectors: np.ndarray) -> np.ndarray:
+        similarities = vectors @ vectors.T
+        np.fill_diagonal(similarities, -np.inf)
+        return np.argsort(-similarities, axis=1, kind='stable')[:, :TOP_K]
+    
+    overlap = [len(set(a) & set(b)) / TOP_K for a, b in zip(top_k(reference), top_k(candidate))]
+    similarity_error = np.abs(reference @ reference.T - candidate @ candidate.T)
+    return {
+        'min_cosine': float(cosines.min()),
+        'mean_cosine': float(cosines.mean()),
+        'max_similarity_error': float(similarity_error.max()),
+        f'top{TOP_K}_overlap': float(np.mean(overlap))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--embeddings", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(child(args.child, args.embeddings)))
+        return 0
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        runs: Dict[str, List[Dict[str, Any]]] = {backend: [] for backend in BACKENDS}
+        for _ in range(args.runs):
+            for backend in BACKENDS:
+                runs[backend].append(run_child(backend, str(Path(scratch) / f"{backend}.npy")))
+        embeddings = {backend: np.load(Path(scratch) / f"{backend}.npy") for backend in BACKENDS}
+    
+    summary = {
+        backend: {
+            'encoder': backend_runs[-1]['backend'],
+            **{key: float(np.median([run[key] for run in backend_runs]))
+               for key in ('import_s', 'load_s', 'rss_mb', 'single_ms', 'batch32_ms')}
+        }
+        for backend, backend_runs in runs.items()
+    }
+    print(f"{'backend':<8} {'import s':>8} {'load s':>7} {'RSS MB':>7} {'1 query ms':>10} {'32 batch ms':>11}")
+    for backend, row in summary.items():
+        print(
+            f"{backend:<8} {row['import_s']:>8.2f} {row['load_s']:>7.2f} {row['rss_mb']:>7.0f} "
+            f"{row['single_ms']:>10.2f} {row['batch32_ms']:>11.2f}"
+        )
+    agreement = parity(embeddings['torch'], embeddings['onnx'])
+    print(", ".join(f"{name}={value:.4f}" for name, value in agreement.items()))
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'parity': agreement, 'runs': runs}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# benchmarks/feature_plan_parity.py
+"""Check FeaturePlan against the vectorizer/scaler path and compare latency.
+
+Synthetic inputs go through the real preprocessing. Edge rows are added:
+empty text, repeated tokens, unknown duration, missing pain level and long
+symptom lists. The plan's matrix must be bit-identical to
+text_vectorizer.transform().toarray() stacked with scaler.transform(); any
+mismatch exits with status 1.
+
+Usage: python -m benchmarks.feature_plan_parity --rows 2000 --batch-sizes 1 8 32 256
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Any, Callable
+
+import numpy as np
+
+from benchmarks.synthetic import SymptomInputGenerator
+from models.symptom_analyzer import SymptomAnalyzer
+from utils.data_preprocessor import DataPreprocessor
+
+EDGE_CASES: List[Dict[str, Any]] = [
+    {'primary_concern': '', 'duration': '1-3 days', 'pain_level': None, 'additional_symptoms': []},
+    {'primary_concern': 'headache headache headache fever', 'duration': 'unknown', 'additional_symptoms': []},
+    {'primary_concern': 'cough with chest pain and shortness of breath', 'duration': 'More than 2 weeks',
+     'pain_level': 'Extreme pain (9-10/10)', 'additional_symptoms': [f"Symptom {i}" for i in range(40)]},
+    {'primary_concern': 'no words the model knows', 'duration': 'Less than 24 hours',
+     'pain_level': 'not a pain level', 'additional_symptoms': ['Fatigue']}
+]
+
+def time_call(fn: Callable, repeats: int) -> float:
+    """Median milliseconds per call"""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 256])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    analyzer = SymptomAnalyzer()
+    analyzer.load_models_sync()
+    plan = analyzer.feature_plan
+    if plan is None:
+        print("The analyzer could not build a feature plan", file=sys.stderr)
+        return 1
+    
+    preprocessor = DataPreprocessor()
+    generator = SymptomInputGenerator(seed=args.seed)
+    processed = [preprocessor.process_symptoms_sync(item) for item in generator.batch(args.rows)] + EDGE_CASES
+    
+    def reference(items: List[Dict[str, Any]]) -> np.ndarray:
+        # With no plan the analyzer takes the vectorizer/scaler path
+        analyzer.feature_plan = None
+        try:
+            return analyzer._extract_features_many(items)
+        finally:
+            analyzer.feature_plan = plan
+    
+    expected = reference(processed)
+    actual = plan.transform(processed)
+    parity = {
+        'rows': len(processed),
+        'shape_matches': expected.shape == actual.shape,
+        'row_mismatches': int((expected != actual).any(axis=1).sum()) if expected.shape == actual.shape else len(processed)
+    }
+    
+    timings = []
+    for batch_size in args.batch_sizes:
+        batch = processed[:batch_size]
+        timings.append({
+            'batch_size': batch_size,
+            'reference_ms': time_call(lambda: reference(batch), args.repeats),
+            'plan_ms': time_call(lambda: plan.transform(batch), args.repeats)
+        })
+    
+    print(f"{parity['rows']} rows  shape matches {parity['shape_matches']}  row mismatches {parity['row_mismatches']}")
+    print(f"{'batch':>6} {'reference ms':>13} {'plan ms':>8} {'speedup':>8}")
+    for t in timings:
+        print(f"{t['batch_size']:>6} {t['reference_ms']:>13.3f} {t['plan_ms']:>8.3f} {t['reference_ms'] / t['plan_ms']:>7.1f}x")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'n_features': plan.n_features, 'parity': parity, 'timings': timings}, f, indent=2)
+    
+    return 0 if parity['shape_matches'] and not parity['row_mismatches'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# benchmarks/measure_memory.py
+"""Measure per-worker memory of the pre-fork launcher.
+
+Starts serve.py with each requested worker count, sends some warmup traffic
+so inference pages are touched, then reads /proc/<pid>/smaps_rollup for the
+master and every worker. PSS (proportional set size) splits shared pages
+between the processes that map them, so the PSS total is the real memory
+cost; RSS counts shared pages once per process.
+
+Usage: python -m benchmarks.measure_memory --workers 1 4 16
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SAMPLE_REQUEST = {
+    "primary_concern": "persistent cough with fever",
+    "duration": "1-3 days",
+    "pain_level": "Mild pain (1-3/10)",
+    "additional_symptoms": ["Fever", "Fatigue"],
+    "age": 42
+}
+
+def read_smaps_rollup(pid: int) -> Dict[str, int]:
+    """Return memory counters in kB for one process"""
+    counters = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                counters[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss_kb': counters.get('Rss', 0),
+        'pss_kb': counters.get('Pss', 0),
+        'shared_kb': counters.get('Shared_Clean', 0) + counters.get('Shared_Dirty', 0),
+        'private_kb': counters.get('Private_Clean', 0) + counters.get('Private_Dirty', 0)
+    }
+
+def child_pids(pid: int) -> List[int]:
+    children = set()
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        content = (task / "children").read_text().split()
+        children.update(int(child) for child in content)
+    return sorted(children)
+
+def wait_until_ready(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+def send_warmup(port: int, requests: int):
+    body = json.dumps(SAMPLE_REQUEST).encode()
+    for _ in range(requests):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/analyze-symptoms",
+            data=body,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(request, timeout=30).read()
+        except Exception as e:
+            print(f"warmup request failed: {e}", file=sys.stderr)
+
+def measure(workers: int, port: int, warmup: int, timeout: float) -> Dict[str, object]:
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+    try:
+        if not wait_until_ready(port, timeout):
+            raise RuntimeError(f"server with {workers} workers did not become ready")
+        # Give every worker time to finish its lifespan startup
+        time.sleep(2)
+        send_warmup(port, warmup)
+        
+        master = read_smaps_rollup(process.pid)
+        worker_stats = [read_smaps_rollup(pid) for pid in child_pids(process.pid)]
+        total_pss = master['pss_kb'] + sum(w['pss_kb'] for w in worker_stats)
+        return {
+            'workers': workers,
+            'master': master,
+            'worker_mean_rss_kb': sum(w['rss_kb'] for w in worker_stats) // max(1, len(worker_stats)),
+            'worker_mean_private_kb': sum(w['private_kb'] for w in worker_stats) // max(1, len(worker_stats)),
+            'total_pss_kb': total_pss,
+            'pss_per_worker_kb': total_pss // max(1, workers)
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for readiness")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = [measure(n, args.port, args.warmup, args.timeout) for n in args.workers]
+    
+    print(f"{'workers':>8} {'total PSS MB':>13} {'PSS/worker MB':>14} {'worker RSS MB':>14} {'worker private MB':>18}")
+    for r in results:
+        print(
+            f"{r['workers']:>8} {r['total_pss_kb'] / 1024:>13.1f} {r['pss_per_worker_kb'] / 1024:>14.1f} "
+            f"{r['worker_mean_rss_kb'] / 1024:>14.1f} {r['worker_mean_private_kb'] / 1024:>18.1f}"
+        )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/model_swap.py
+"""Latency and errors of concurrent analyses while the model is swapped.
+
+Loads the current bundle, then keeps --threads threads scoring requests
+while the main thread alternates between swap_bundle(other) and rollback()
+every --interval seconds. The other bundle must share the current bundle's
+features, e.g. one written by the feedback retrainer. The same load is run
+first without swaps as the baseline.
+
+Usage: python -m benchmarks.model_swap --other <bundle version> --seconds 10
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from models.model_bundle import ModelBundle, BUNDLES_DIR
+from models.symptom_analyzer import SymptomAnalyzer
+
+REQUEST = {
+    'primary_concern': 'persistent cough with fever', 'duration': '1-3 days',
+    'pain_level': 'Mild pain (1-3/10)', 'additional_symptoms': ['Fever']
+}
+
+def run_load(analyzer: SymptomAnalyzer, threads: int, seconds: float, other: Optional[ModelBundle] = None,
+             interval: float = 0.5) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[str] = []
+    stop = threading.Event()
+    
+    def worker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                analyzer.analyze_sync(REQUEST)
+            except Exception as e:
+                errors.append(repr(e))
+            latencies.append(time.perf_counter() - started)
+    
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    
+    swaps = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(interval)
+        if other is not None:
+            if analyzer.model_version == other.version:
+                analyzer.rollback()
+            else:
+                analyzer.swap_bundle(other)
+            swaps += 1
+    stop.set()
+    for thread in workers:
+        thread.join()
+    
+    milliseconds = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'swaps': swaps,
+        **{f'p{q}_ms': float(np.percentile(milliseconds, q)) for q in (50, 99, 99.9)},
+        'max_ms': float(milliseconds.max())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--other", required=True, help="version of the bundle to swap in")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between swaps")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    analyzer = SymptomAnalyzer()
+    analyzer.load_models_sync()
+    other = ModelBundle.load(analyzer.model_path / BUNDLES_DIR / args.other)
+    # Swap once up front so a feature mismatch fails early and the files are cached
+    if not analyzer.swap_bundle(other):
+        print("The other bundle has different features and cannot be swapped in")
+        return 1
+    analyzer.rollback()
+    
+    results = {
+        'baseline': run_load(analyzer, args.threads, args.seconds),
+        'swapping': run_load(analyzer, args.threads, args.seconds, other, args.interval)
+    }
+    print(f"{'mode':<9} {'requests':>8} {'errors':>6} {'swaps':>5} {'p50 ms':>7} {'p99 ms':>7} {'p99.9 ms':>8} {'max ms':>7}")
+    for mode, row in results.items():
+        print(
+            f"{mode:<9} {row['requests']:>8} {row['errors']:>6} {row['swaps']:>5} {row['p50_ms']:>7.2f} "
+            f"{row['p99_ms']:>7.2f} {row['p99.9_ms']:>8.2f} {row['max_ms']:>7.2f}"
+        )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
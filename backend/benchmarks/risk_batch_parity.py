@@ -0,0 +1,90 @@
+# benchmarks/risk_batch_parity.py
+"""Check RiskCalculator.calculate_risk_batch against the scalar path and time it.
+
+Inputs are synthetic requests run through the real preprocessing, plus
+random rows that hit every edge the scalar code branches on: unknown
+conditions, durations and pain levels, missing and zero ages, age band
+boundaries, repeated and unknown symptoms, and confidences of exactly 0.5
+and 0.8. Scores, urgency levels and follow-up days must equal
+calculate_risk_sync row for row, both by arithmetic and with the lookup
+table on. Random columns beyond anything encode_risk_inputs produces
+(negative symptom weights, comorbidity counts past the table) must score
+the same in both modes. Any mismatch exits with status 1. The encoded
+columns are then tiled to --scale-rows and scored in one call per mode.
+
+Usage: python -m benchmarks.risk_batch_parity --rows 20000 --scale-rows 1000000
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.tree_engine_parity import time_call
+from models.risk_calculator import RiskCalculator
+from tests.parity import build_inputs, count_mismatches, random_columns
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="rows checked against the scalar path")
+    parser.add_argument("--scale-rows", type=int, default=1000000, help="rows scored in the timed batch")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    calculator = RiskCalculator(lookup_table=False)
+    calculator.initialize_sync()
+    table_calculator = RiskCalculator(lookup_table=True)
+    table_calculator.initialize_sync()
+    analyses, processed = build_inputs(calculator, args.rows, args.seed)
+    
+    started = time.perf_counter()
+    scalar = calculator.calculate_risk_many_sync(analyses, processed)
+    scalar_seconds = time.perf_counter() - started
+    
+    columns = calculator.encode_risk_inputs(analyses, processed)
+    mismatches = {
+        'arithmetic': count_mismatches(calculator.calculate_risk_batch(**columns), scalar, calculator.FOLLOW_UP_IMMEDIATE),
+        'table': count_mismatches(table_calculator.calculate_risk_batch(**columns), scalar, calculator.FOLLOW_UP_IMMEDIATE)
+    }
+    extremes = random_columns(calculator, args.rows, args.seed)
+    arithmetic, table = calculator.calculate_risk_batch(**extremes), table_calculator.calculate_risk_batch(**extremes)
+    mismatches['table_vs_arithmetic'] = {name: int((arithmetic[name] != table[name]).sum()) for name in arithmetic}
+    
+    repeats = -(-args.scale_rows // args.rows)
+    scaled = {name: np.tile(column, repeats)[:args.scale_rows] for name, column in columns.items()}
+    timings = {
+        mode: time_call(lambda: scorer.calculate_risk_batch(**scaled), args.repeats) / 1000
+        for mode, scorer in (('arithmetic', calculator), ('table', table_calculator))
+    }
+    results = {
+        'rows': args.rows,
+        'mismatches': mismatches,
+        'scalar_rows_per_second': args.rows / scalar_seconds,
+        'scale_rows': args.scale_rows,
+        'batch_seconds': timings,
+        'risk_table': table_calculator.lookup_table_stats()
+    }
+    
+    print(f"{args.rows} rows checked, mismatches: {mismatches}")
+    print(f"scalar: {results['scalar_rows_per_second']:,.0f} rows/s")
+    for mode, seconds in timings.items():
+        print(f"{mode + ':':<11} {args.scale_rows:,} rows in {seconds:.3f} s ({args.scale_rows / seconds:,.0f} rows/s)")
+    table_stats = results['risk_table']
+    print(
+        f"lookup table: {table_stats['entries']:,} entries, {table_stats['bytes'] / 2**20:.2f} MB, "
+        f"built in {table_stats['build_seconds']:.3f} s"
+    )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = any(count for checks in mismatches.values() for count in checks.values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/synthetic.py
+"""Seeded generator of realistic symptom inputs for benchmarks.
+
+Primary concerns and extra symptoms are drawn from the synonym and
+normalization tables in DataPreprocessor, and durations and pain levels from
+the encodings in SymptomAnalyzer. The inputs therefore go through the same
+preprocessing branches and feature values as real traffic.
+"""
+import random
+from typing import Dict, List, Any, Iterator, Optional
+
+from models.symptom_analyzer import SymptomAnalyzer
+from utils.data_preprocessor import DataPreprocessor
+
+# Keys understood by DataPreprocessor._normalize_medical_condition
+MEDICAL_HISTORY = [
+    'high blood pressure', 'diabetes', 'heart disease', 'asthma',
+    'lung disease', 'kidney disease', 'liver disease', 'heart problems'
+]
+
+GENDERS = ['male', 'female', 'other', None]
+
+MEDICATIONS = ['', 'ibuprofen', 'acetaminophen as needed', 'prescribed inhaler', 'aspirin daily']
+
+CONCERN_TEMPLATES = [
+    '{0}',
+    '{0} and {1}',
+    'really bad {0} since yesterday',
+    '{0} with some {1}, getting worse'
+]
+
+class SymptomInputGenerator:
+    """Deterministic stream of SymptomInput-shaped dicts"""
+    
+    def __init__(self, seed: int = 42, patients: int = 200):
+        self.random = random.Random(seed)
+        self.patient_ids = [f"bench-patient-{i:05d}" for i in range(patients)]
+        
+        preprocessor = DataPreprocessor()
+        self.terms = sorted(
+            set(preprocessor.medical_synonyms) | set(preprocessor.medical_synonyms.values()) |
+            set(preprocessor.symptom_normalizer) | set(preprocessor.symptom_normalizer.values())
+        )
+        self.additional_symptoms = sorted({term.title() for term in preprocessor.symptom_normalizer.values()} |
+                                          {term.title() for term in preprocessor.medical_synonyms.values()})
+        self.durations = list(SymptomAnalyzer.DURATION_CODES)
+        self.pain_levels = list(SymptomAnalyzer.PAIN_SCORES)
+    
+    def generate(self) -> Dict[str, Any]:
+        rng = self.random
+        template = rng.choice(CONCERN_TEMPLATES)
+        return {
+            'primary_concern': template.format(rng.choice(self.terms), rng.choice(self.terms)),
+            'duration': rng.choice(self.durations),
+            'pain_level': rng.choice(self.pain_levels),
+            'additional_symptoms': rng.sample(self.additional_symptoms, rng.randint(0, 3)),
+            'medications': rng.choice(MEDICATIONS),
+            'patient_id': rng.choice(self.patient_ids),
+            'age': rng.randint(1, 95),
+            'gender': rng.choice(GENDERS),
+            'medical_history': rng.sample(MEDICAL_HISTORY, rng.randint(0, 2))
+        }
+    
+    def stream(self, count: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        produced = 0
+        while count is None or produced < count:
+            yield self.generate()
+            produced += 1
+    
+    def batch(self, count: int) -> List[Dict[str, Any]]:
+        return list(self.stream(count))
@@ -0,0 +1,76 @@
+# benchmarks/training.py
+"""Compare trainers by wall time and test accuracy across dataset sizes.
+
+Each (trainer, rows) run is a fresh interpreter so peak memory and allocator
+state do not carry over. A run builds the dataset, featurizes it, fits and
+evaluates exactly as train_model.py does, but writes no bundle. Runs longer
+than --timeout-minutes are stopped and reported as timed out.
+
+Usage: python -m benchmarks.training --rows 10000 100000 1000000 --trainers hist gradient_boosting
+"""
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+from typing import Dict, List, Any
+
+from models.training import TRAINERS
+
+def child(trainer: str, rows: int, seed: int) -> Dict[str, Any]:
+    from models.symptom_analyzer import SymptomAnalyzer
+    from models.training import train
+    
+    report = train(SymptomAnalyzer(), rows=rows, trainer=trainer, seed=seed)
+    report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+def run_child(trainer: str, rows: int, seed: int, timeout_minutes: float) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.training", "--child", trainer, "--rows", str(rows), "--seed", str(seed)]
+    try:
+        output = subprocess.run(
+            command, capture_output=True, text=True, check=True, timeout=timeout_minutes * 60
+        ).stdout
+    except subprocess.TimeoutExpired:
+        return {'trainer': trainer, 'rows': rows, 'timed_out': True}
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--trainers", choices=TRAINERS, nargs="+", default=TRAINERS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout-minutes", type=float, default=120)
+    parser.add_argument("--child", choices=TRAINERS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    if args.child:
+        print(json.dumps(child(args.child, args.rows[0], args.seed)))
+        return 0
+    
+    results: List[Dict[str, Any]] = []
+    print(f"{'rows':>9} {'trainer':<18} {'iters':>5} {'featurize s':>11} {'fit s':>9} {'total s':>9} {'accuracy':>8} {'peak MB':>8}")
+    for rows in args.rows:
+        for trainer in args.trainers:
+            result = run_child(trainer, rows, args.seed, args.timeout_minutes)
+            results.append(result)
+            if result.get('timed_out'):
+                print(f"{rows:>9} {trainer:<18} timed out after {args.timeout_minutes:g} min")
+            else:
+                print(
+                    f"{rows:>9} {trainer:<18} {result['iterations']:>5} {result['featurize_seconds']:>11.2f} "
+                    f"{result['fit_seconds']:>9.2f} {result['total_seconds']:>9.2f} {result['test_accuracy']:>8.4f} "
+                    f"{result['peak_rss_mb']:>8.0f}"
+                )
+            sys.stdout.flush()
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# benchmarks/tree_contributions.py
+"""Check TreePathExplainer against a per-tree reference and time it.
+
+For synthetic inputs run through the real preprocessing and feature
+extraction, the contributions to the predicted class score are recomputed
+one tree and one row at a time straight from the sklearn model, and
+contributions plus bias must add up to the model's decision_function.
+Either check failing by more than --tolerance exits with status 1.
+Timings are the explainer alone and a full analyze_sync, which includes it.
+
+Usage: python -m benchmarks.tree_contributions --rows 200 --batch-sizes 1 8 32
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier
+
+from benchmarks.synthetic import SymptomInputGenerator
+from benchmarks.tree_engine_parity import time_call
+from models.symptom_analyzer import SymptomAnalyzer
+from models.tree_engine import CompiledTreeEnsemble
+from models.tree_explainer import TreePathExplainer
+from utils.data_preprocessor import DataPreprocessor
+
+def class_trees(model: Any, column: int) -> Tuple[List[Dict[str, np.ndarray]], float]:
+    """Node arrays of the trees scoring one class, with their leaf scale"""
+    output = 0 if len(model.classes_) == 2 else column
+    if isinstance(model, GradientBoostingClassifier):
+        trees = [{
+            'left': estimator.tree_.children_left, 'right': estimator.tree_.children_right,
+            'feature': estimator.tree_.feature, 'threshold': estimator.tree_.threshold,
+            'value': estimator.tree_.value[:, 0, 0], 'weight': estimator.tree_.weighted_n_node_samples,
+            'is_leaf': estimator.tree_.children_left == -1, 'missing_left': None
+        } for estimator in model.estimators_[:, output]]
+        return trees, model.learning_rate
+    trees = [{
+        'left': nodes['left'], 'right': nodes['right'], 'feature': nodes['feature_idx'],
+        'threshold': nodes['num_threshold'], 'value': nodes['value'], 'weight': nodes['count'].astype(float),
+        'is_leaf': nodes['is_leaf'].astype(bool), 'missing_left': nodes['missing_go_to_left']
+    } for nodes in (predictors[output].nodes for predictors in model._predictors)]
+    return trees, 1.0
+
+def reference_contributions(model: Any, row: np.ndarray, column: int) -> np.ndarray:
+    """Saabas contributions of one row, one tree at a time"""
+    contributions = np.zeros(len(row))
+    trees, scale = class_trees(model, column)
+    if isinstance(model, GradientBoostingClassifier):
+        row = row.astype(np.float32)
+    
+    for tree in trees:
+        expected = np.zeros(len(tree['value']))
+        
+        def fill(node: int) -> float:
+            if tree['is_leaf'][node]:
+                expected[node] = scale * tree['value'][node]
+            else:
+                left, right = tree['left'][node], tree['right'][node]
+                fill(left)
+                fill(right)
+                weights = tree['weight'][left] + tree['weight'][right]
+                expected[node] = (tree['weight'][left] * expected[left] + tree['weight'][right] * expected[right]) / weights
+            return expected[node]
+        
+        fill(0)
+        node = 0
+        while not tree['is_leaf'][node]:
+            value = row[tree['feature'][node]]
+            if np.isnan(value):
+                child = tree['left'][node] if tree['missing_left'][node] else tree['right'][node]
+            else:
+                child = tree['left'][node] if value <= tree['threshold'][node] else tree['right'][node]
+            contributions[tree['feature'][node]] += expected[child] - expected[node]
+            node = child
+    
+    sign = -1.0 if len(model.classes_) == 2 and column == 0 else 1.0
+    return contributions * sign
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    analyzer = SymptomAnalyzer()
+    analyzer.load_models_sync()
+    model = analyzer.primary_model
+    explainer = TreePathExplainer(CompiledTreeEnsemble(model))
+    
+    generator = SymptomInputGenerator(seed=args.seed)
+    preprocessor = DataPreprocessor()
+    processed = [preprocessor.process_symptoms_sync(item) for item in generator.batch(args.rows)]
+    features = analyzer._extract_features_many(processed)
+    columns = np.argmax(model.predict_proba(features), axis=1)
+    
+    contributions, bias = explainer.explain(features, columns)
+    raw = model.decision_function(features)
+    raw = np.column_stack([-raw, raw]) if raw.ndim == 1 else raw
+    expected = np.vstack([reference_contributions(model, row, column) for row, column in zip(features, columns)])
+    checks = {
+        'rows': len(features),
+        'max_reference_diff': float(np.abs(contributions - expected).max()),
+        'max_additivity_error': float(np.abs(contributions.sum(axis=1) + bias - raw[np.arange(len(raw)), columns]).max())
+    }
+    
+    timings: List[Dict[str, float]] = []
+    for batch_size in args.batch_sizes:
+        batch, batch_columns = features[:batch_size], columns[:batch_size]
+        timings.append({
+            'batch_size': batch_size,
+            'explain_ms': time_call(lambda: explainer.explain(batch, batch_columns), args.repeats)
+        })
+    analyze_ms = time_call(lambda: analyzer.analyze_sync(processed[0]), args.repeats)
+    
+    print(
+        f"{checks['rows']} rows  max reference diff {checks['max_reference_diff']:.3g}  "
+        f"max additivity error {checks['max_additivity_error']:.3g}"
+    )
+    print(f"{'batch':>6} {'explain ms':>11} {'per row ms':>11}")
+    for t in timings:
+        print(f"{t['batch_size']:>6} {t['explain_ms']:>11.3f} {t['explain_ms'] / t['batch_size']:>11.3f}")
+    print(f"analyze_sync with contributions: {analyze_ms:.3f} ms")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'cache_mb': explainer.path_contribution.nbytes * 2 / 2**20,
+                'checks': checks, 'timings': timings, 'analyze_ms': analyze_ms
+            }, f, indent=2)
+    
+    failed = max(checks['max_reference_diff'], checks['max_additivity_error']) > args.tolerance
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
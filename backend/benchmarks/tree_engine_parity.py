@@ -0,0 +1,133 @@
+# benchmarks/tree_engine_parity.py
+"""Check CompiledTreeEnsemble against sklearn and compare their latency.
+
+Feature rows come from synthetic inputs run through the real preprocessing
+and feature extraction, plus perturbed copies and rows sitting exactly on
+split thresholds. Probabilities and predicted classes must be identical to
+predict_proba/predict; any mismatch exits with status 1. Timings compare
+sklearn's predict_proba + predict (the old single-request path), the pure
+vectorized traversal and the engine as configured (which hands batches above
+TREE_ENGINE_MAX_ROWS to sklearn).
+
+Usage: python -m benchmarks.tree_engine_parity --rows 2000 --batch-sizes 1 8 32 256 1024
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Callable
+
+import numpy as np
+
+from benchmarks.synthetic import SymptomInputGenerator
+from models.symptom_analyzer import SymptomAnalyzer
+from models.tree_engine import CompiledTreeEnsemble
+from utils.data_preprocessor import DataPreprocessor
+
+def build_features(analyzer: SymptomAnalyzer, engine: CompiledTreeEnsemble, rows: int, seed: int) -> np.ndarray:
+    """Real feature rows, noisy copies of them and rows on split thresholds"""
+    generator = SymptomInputGenerator(seed=seed)
+    preprocessor = DataPreprocessor()
+    processed = [preprocessor.process_symptoms_sync(item) for item in generator.batch(rows)]
+    real = analyzer._extract_features_many(processed)
+    
+    rng = np.random.default_rng(seed)
+    noisy = real + rng.normal(scale=0.5, size=real.shape)
+    
+    # Put one split feature of each row exactly on its threshold to exercise float32 ties
+    on_threshold = real.copy()
+    split_nodes = np.flatnonzero(engine.children[0::2] != np.arange(len(engine.feature)))
+    picked = rng.choice(split_nodes, size=len(on_threshold))
+    on_threshold[np.arange(len(on_threshold)), engine.feature[picked]] = engine.threshold[picked]
+    
+    return np.vstack([real, noisy, on_threshold])
+
+def check_parity(model, predict: Callable, features: np.ndarray, chunk: int) -> Dict[str, float]:
+    expected_proba = model.predict_proba(features)
+    expected_class = model.predict(features)
+    
+    probabilities, predicted = [], []
+    for start in range(0, len(features), chunk):
+        proba, classes = predict(features[start:start + chunk])
+        probabilities.append(proba)
+        predicted.append(classes)
+    probabilities = np.vstack(probabilities)
+    predicted = np.concatenate(predicted)
+    
+    return {
+        'rows': len(features),
+        'max_abs_proba_diff': float(np.abs(probabilities - expected_proba).max()),
+        'proba_mismatches': int((probabilities != expected_proba).any(axis=1).sum()),
+        'class_mismatches': int((predicted != expected_class).sum())
+    }
+
+def time_call(fn: Callable, repeats: int) -> float:
+    """Median milliseconds per call"""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="synthetic inputs (3x rows are checked)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 256, 1024])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    analyzer = SymptomAnalyzer()
+    analyzer.load_models_sync()
+    model = analyzer.primary_model
+    engine = CompiledTreeEnsemble(model)
+    # Same trees with the sklearn hand-off disabled
+    vectorized = CompiledTreeEnsemble(model, max_rows=sys.maxsize)
+    
+    features = build_features(analyzer, engine, args.rows, args.seed)
+    parity = {
+        'vectorized': check_parity(model, vectorized.predict, features, chunk=64),
+        'engine': check_parity(model, engine.predict, features, chunk=max(args.batch_sizes))
+    }
+    
+    timings: List[Dict[str, float]] = []
+    for batch_size in args.batch_sizes:
+        batch = features[:batch_size]
+        timings.append({
+            'batch_size': batch_size,
+            'sklearn_ms': time_call(lambda: (model.predict_proba(batch), model.predict(batch)), args.repeats),
+            'vectorized_ms': time_call(lambda: vectorized.predict(batch), args.repeats),
+            'engine_ms': time_call(lambda: engine.predict(batch), args.repeats)
+        })
+    
+    for name, result in parity.items():
+        print(
+            f"{name:<11} {result['rows']} rows  proba mismatches {result['proba_mismatches']}  "
+            f"class mismatches {result['class_mismatches']}  max diff {result['max_abs_proba_diff']:.3g}"
+        )
+    print(f"{'batch':>6} {'sklearn ms':>11} {'vectorized ms':>14} {'engine ms':>10} {'speedup':>8}")
+    for t in timings:
+        print(
+            f"{t['batch_size']:>6} {t['sklearn_ms']:>11.3f} {t['vectorized_ms']:>14.3f} "
+            f"{t['engine_ms']:>10.3f} {t['sklearn_ms'] / t['engine_ms']:>7.1f}x"
+        )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'model': {'trees': len(engine.roots), 'nodes': len(engine.feature), 'max_depth': engine.max_depth,
+                          'engine_max_rows': engine.max_rows},
+                'parity': parity,
+                'timings': timings
+            }, f, indent=2)
+    
+    failed = any(result['proba_mismatches'] or result['class_mismatches'] for result in parity.values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
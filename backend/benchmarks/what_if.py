@@ -0,0 +1,108 @@
+# benchmarks/what_if.py
+"""Latency of the what-if endpoint and parity of its grid with the scalar path.
+
+The endpoint function is called directly for grids of increasing size, so
+the timing covers validation, the hop to a one-thread inference pool, base
+preprocessing, the vectorized grid and rendering the JSON body, but not the
+HTTP server. Every cell of the
+smallest grid is rescored with calculate_risk_sync on an input carrying
+that cell's age, duration, pain level and that many high-risk history
+entries; any mismatch exits with status 1.
+
+Usage: python -m benchmarks.what_if --ages 100 --comorbidities 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from typing import Dict, List, Any
+
+import numpy as np
+
+from benchmarks.tree_engine_parity import time_call
+from models.risk_calculator import RiskCalculator
+from utils.analysis_pipeline import AnalysisPipeline, install_pipeline
+from utils.data_preprocessor import DataPreprocessor
+from utils.inference_executor import InferenceExecutor
+import main as api
+
+BASE = {
+    'condition': 'Angina', 'confidence': 0.72, 'duration': '1-3 days', 'pain_level': 'Moderate pain (4-6/10)',
+    'additional_symptoms': ['Fatigue', 'Nausea'], 'age': 58, 'medical_history': ['high blood pressure']
+}
+
+def grid_request(calculator: RiskCalculator, ages: int, comorbidities: int) -> api.WhatIfRequest:
+    """Every duration and pain level, ages 0..ages-1 and 0..comorbidities-1 comorbidities"""
+    return api.WhatIfRequest(
+        **BASE, ages=list(range(ages)), durations=list(calculator.DURATION_MODIFIERS),
+        pain_levels=list(calculator.SEVERITY_MODIFIERS), comorbidity_counts=list(range(comorbidities))
+    )
+
+def check_grid(calculator: RiskCalculator, preprocessor: DataPreprocessor, request: api.WhatIfRequest,
+               body: Dict[str, Any]) -> int:
+    """Cells whose score or urgency differ from calculate_risk_sync"""
+    base = preprocessor.process_risk_inputs_sync(request)
+    analysis = {'primary_condition': request.condition, 'confidence': request.confidence}
+    scores, urgency = np.array(body['risk_scores']), np.array(body['urgency'])
+    mismatches = 0
+    for index in np.ndindex(scores.shape):
+        age, duration, pain_level, count = (body['axes'][axis][i] for axis, i in zip(body['axes'], index))
+        processed_data = {
+            **base, 'age': age, 'duration': duration, 'pain_level': pain_level,
+            'medical_history': ['diabetes'] * count
+        }
+        expected = calculator.calculate_risk_sync(analysis, processed_data)
+        mismatches += (
+            expected['risk_score'] != scores[index]
+            or expected['urgency_level'] != body['urgency_levels'][urgency[index]]
+        )
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ages", type=int, nargs="+", default=[20, 100, 120], help="age axis lengths to time")
+    parser.add_argument("--comorbidities", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    preprocessor = DataPreprocessor()
+    # The grid needs no model, only the preprocessor and risk calculator
+    install_pipeline(AnalysisPipeline(preprocessor, None, calculator))
+    executor = InferenceExecutor(kind='thread', max_workers=1)
+    executor.start()
+    
+    def call(request: api.WhatIfRequest) -> Any:
+        return asyncio.run(api.risk_what_if(request, calculator, executor))
+    
+    requests = [grid_request(calculator, ages, args.comorbidities) for ages in args.ages]
+    mismatches = check_grid(calculator, preprocessor, requests[0], json.loads(call(requests[0]).body))
+    
+    results: List[Dict[str, Any]] = []
+    for request in requests:
+        response = call(request)
+        body = json.loads(response.body)
+        results.append({
+            'points': int(np.size(body['risk_scores'])),
+            'response_ms': time_call(lambda: call(request), args.repeats),
+            'body_kb': len(response.body) / 1024,
+            'transitions': body['transitions']
+        })
+    
+    print(f"{results[0]['points']} cells checked, mismatches: {mismatches}")
+    print(f"{'points':>7} {'ms':>8} {'body KB':>8}")
+    for row in results:
+        print(f"{row['points']:>7} {row['response_ms']:>8.2f} {row['body_kb']:>8.1f}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mismatches': mismatches, 'results': results}, f, indent=2)
+    executor.shutdown()
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# bulk_analyze.py
+"""Offline bulk analysis of CSV/JSONL intake exports.
+
+Reads rows in chunks, runs them through the preprocess -> analyze -> risk ->
+recommendations chain and writes one NDJSON line per row as each chunk
+completes, followed by a summary line. Memory use is bounded by the chunk
+size, not the file size. Analyses are stored in symptom_analyses only with
+--persist.
+
+Usage: python bulk_analyze.py intake.csv --output results.ndjson [--persist]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+import main
+from database.db_manager import DatabaseManager
+from utils.analysis_pipeline import AnalysisPipeline
+from utils.bulk_analysis import BULK_CHUNK_SIZE, detect_format, open_text, iter_records, read_chunk
+from utils.result_cache import AnalysisResultCache
+
+logger = logging.getLogger("bulk_analyze")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stream symptom analyses for a CSV/JSONL file as NDJSON")
+    parser.add_argument("input", help="CSV or JSONL file, '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from the file extension)")
+    parser.add_argument("--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Rows analyzed per model call")
+    parser.add_argument("--persist", action="store_true", help="Store analyses in symptom_analyses")
+    parser.add_argument("--log-level", default="warning")
+    return parser.parse_args()
+
+async def run(args: argparse.Namespace, source, sink) -> dict:
+    fmt = detect_format(args.format, None if args.input == "-" else args.input)
+    
+    # Warmup is pointless for a one-off batch job
+    main.WARMUP_ROUNDS = 0
+    main.preload_models()
+    pipeline = AnalysisPipeline(main.data_preprocessor, main.symptom_analyzer, main.risk_calculator, AnalysisResultCache())
+    
+    db = None
+    if args.persist:
+        db = DatabaseManager()
+        await db.initialize()
+    
+    started = time.perf_counter()
+    records = iter_records(open_text(source), fmt)
+    rows = succeeded = stored_count = 0
+    try:
+        while True:
+            chunk = read_chunk(records, args.chunk_size)
+            if not chunk:
+                break
+            
+            parsed = [record for row_number, record, error in chunk if error is None]
+            valid_inputs, valid_indices, errors = main._validate_items(parsed)
+            stage_items = pipeline.run_many(valid_inputs) if valid_inputs else []
+            outcomes, stored = main._collect_outcomes(len(parsed), errors, valid_indices, valid_inputs, stage_items)
+            
+            for row_number, result, error in main._merge_chunk_outcomes(chunk, outcomes):
+                if error is None:
+                    succeeded += 1
+                    sink.write(json.dumps({'row': row_number, 'result': jsonable_encoder(result)}) + "\n")
+                else:
+                    sink.write(json.dumps({'row': row_number, 'error': error}) + "\n")
+            rows += len(chunk)
+            
+            if db is not None:
+                stored_count += await main._store_bulk_chunk(db, stored)
+            sink.flush()
+            logger.info(f"{rows} rows analyzed")
+    finally:
+        if db is not None:
+            await db.close()
+    
+    summary = {
+        'rows': rows,
+        'succeeded': succeeded,
+        'failed': rows - succeeded,
+        'stored': stored_count if args.persist else None,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    sink.write(json.dumps({'summary': summary}) + "\n")
+    return summary
+
+def cli():
+    args = parse_args()
+    # main configures INFO logging on import
+    logging.getLogger().setLevel(args.log_level.upper())
+    
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        summary = asyncio.run(run(args, source, sink))
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(cli())
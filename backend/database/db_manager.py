@@ -1,17 +1,91 @@
 # database/db_manager.py
 import asyncio
 import asyncpg
+import functools
 import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, AsyncIterator, Optional
 import os
 from contextlib import asynccontextmanager
 import pandas as pd
 
+from utils.metrics import REGISTRY
+
 logger = logging.getLogger(__name__)
 
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'symptom_checker_db_query_seconds',
+    'Latency of DatabaseManager queries, including the in-memory fallback',
+    ('query', 'backend')
+)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    'symptom_checker_db_query_errors_total',
+    'DatabaseManager queries that failed and returned a fallback value',
+    ('query',)
+)
+
+# Errors caused by the rows being written, which no retry can fix; anything
+# else (lost connections, timeouts, a restarting server) may succeed later
+ROW_ERRORS = (
+    asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError, TypeError, ValueError
+)
+
+def _timed_query(name: str):
+    """Record the latency of a DatabaseManager coroutine under query=name"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(self, *args, **kwargs)
+            finally:
+                backend = 'postgres' if self.pool else 'memory'
+                DB_QUERY_SECONDS.labels(name, backend).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
 class DatabaseManager:
+    # Column order shared by the INSERT statement and bulk COPY
+    ANALYSIS_COLUMNS = [
+        'analysis_id', 'patient_id', 'primary_concern', 'duration', 'pain_level',
+        'additional_symptoms', 'medications', 'age', 'gender', 'medical_history',
+        'condition_prediction', 'risk_score', 'confidence', 'urgency_level',
+        'contributors', 'recommendations', 'follow_up_days'
+    ]
+    
+    INSERT_ANALYSIS_SQL = '''
+        INSERT INTO symptom_analyses (
+            analysis_id, patient_id, primary_concern, duration, pain_level,
+            additional_symptoms, medications, age, gender, medical_history,
+            condition_prediction, risk_score, confidence, urgency_level,
+            contributors, recommendations, follow_up_days
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
+    '''
+    
+    # Feedback that names a diagnosis, with the inputs of the analysis it rates
+    FEEDBACK_EXAMPLES_SQL = '''
+        SELECT f.id AS feedback_id, f.actual_diagnosis, a.primary_concern, a.duration,
+               a.pain_level, a.additional_symptoms
+        FROM patient_feedback f
+        JOIN symptom_analyses a ON a.analysis_id = f.analysis_id
+        WHERE f.id > $1 AND COALESCE(f.actual_diagnosis, '') <> ''
+        ORDER BY f.id
+    '''
+    
+    # Stored inputs and risk of analyses after an id, for rescoring
+    RISK_INPUTS_SQL = '''
+        SELECT id, condition_prediction, confidence, duration, pain_level, additional_symptoms,
+               age, medical_history, risk_score, urgency_level, follow_up_days
+        FROM symptom_analyses
+        WHERE id > $1
+        ORDER BY id
+    '''
+    
+    # Rows per UPDATE ... FROM (VALUES ...); Postgres binds at most 32767 parameters, 4 per row here
+    RISK_UPDATE_BATCH_ROWS = 1000
+    
     def __init__(self):
         self.pool = None
         self.database_url = os.getenv(
@@ -99,6 +173,19 @@ class DatabaseManager:
                 )
             ''')
             
+            # Progress of risk backfills, one row per job
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS risk_backfill_checkpoints (
+                    job VARCHAR(255) PRIMARY KEY,
+                    last_id INTEGER NOT NULL DEFAULT 0,
+                    rows_scanned BIGINT NOT NULL DEFAULT 0,
+                    rows_updated BIGINT NOT NULL DEFAULT 0,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            ''')
+            
             # Create indexes for better performance
             await conn.execute('''
                 CREATE INDEX IF NOT EXISTS idx_patient_id ON symptom_analyses(patient_id);
@@ -107,6 +194,7 @@ class DatabaseManager:
                 CREATE INDEX IF NOT EXISTS idx_urgency ON symptom_analyses(urgency_level);
             ''')
     
+    @_timed_query('store_analysis')
     async def store_analysis(self, symptom_input: Any, result: Any) -> bool:
         """Store symptom analysis result"""
         if not self.pool:
@@ -115,32 +203,7 @@ class DatabaseManager:
         
         try:
             async with self.pool.acquire() as conn:
-                await conn.execute('''
-                    INSERT INTO symptom_analyses (
-                        analysis_id, patient_id, primary_concern, duration, pain_level,
-                        additional_symptoms, medications, age, gender, medical_history,
-                        condition_prediction, risk_score, confidence, urgency_level,
-                        contributors, recommendations, follow_up_days
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
-                ''', 
-                    result.analysis_id,
-                    getattr(symptom_input, 'patient_id', None),
-                    getattr(symptom_input, 'primary_concern', ''),
-                    getattr(symptom_input, 'duration', ''),
-                    getattr(symptom_input, 'pain_level', ''),
-                    json.dumps(getattr(symptom_input, 'additional_symptoms', [])),
-                    json.dumps(getattr(symptom_input, 'medications', '')),
-                    getattr(symptom_input, 'age', None),
-                    getattr(symptom_input, 'gender', None),
-                    json.dumps(getattr(symptom_input, 'medical_history', [])),
-                    result.condition,
-                    result.risk_score,
-                    result.confidence,
-                    result.urgency_level,
-                    json.dumps([c.dict() if hasattr(c, 'dict') else c for c in result.contributors]),
-                    json.dumps([r.dict() if hasattr(r, 'dict') else r for r in result.recommendations]),
-                    result.follow_up_days
-                )
+                await conn.execute(self.INSERT_ANALYSIS_SQL, *self._analysis_row(symptom_input, result))
             
             # Update daily analytics
             await self._update_daily_analytics(result)
@@ -148,8 +211,89 @@ class DatabaseManager:
             
         except Exception as e:
             logger.error(f"Error storing analysis: {e}")
+            DB_QUERY_ERRORS.labels('store_analysis').inc()
+            return False
+    
+    @_timed_query('store_analyses')
+    async def store_analyses(self, items: List[tuple]) -> bool:
+        """Store a batch of (symptom_input, result) pairs in one round trip"""
+        if not items:
+            return True
+        
+        if not self.pool:
+            return all([self._store_analysis_memory(symptom_input, result) for symptom_input, result in items])
+        
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.executemany(
+                    self.INSERT_ANALYSIS_SQL,
+                    [self._analysis_row(symptom_input, result) for symptom_input, result in items]
+                )
+            
+            # Update daily analytics
+            await self._update_daily_analytics(items[-1][1], count=len(items))
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error storing analyses: {e}")
+            DB_QUERY_ERRORS.labels('store_analyses').inc()
+            return False
+    
+    @_timed_query('copy_analyses')
+    async def copy_analyses(self, items: List[tuple], raise_errors: bool = False) -> bool:
+        """Bulk-load (symptom_input, result) pairs with COPY in one transaction.
+        
+        With raise_errors a failure is raised instead of returning False, so
+        the caller can tell bad rows (ROW_ERRORS) from an unavailable database.
+        """
+        if not items:
+            return True
+        
+        if not self.pool:
+            return all([self._store_analysis_memory(symptom_input, result) for symptom_input, result in items])
+        
+        try:
+            records = [self._analysis_row(symptom_input, result) for symptom_input, result in items]
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        'symptom_analyses',
+                        records=records,
+                        columns=self.ANALYSIS_COLUMNS
+                    )
+                    await self._increment_daily_analytics(conn, len(records))
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error bulk-copying analyses: {e}")
+            DB_QUERY_ERRORS.labels('copy_analyses').inc()
+            if raise_errors:
+                raise
             return False
     
+    def _analysis_row(self, symptom_input: Any, result: Any) -> tuple:
+        """Build the symptom_analyses column values for one analysis"""
+        return (
+            result.analysis_id,
+            getattr(symptom_input, 'patient_id', None),
+            getattr(symptom_input, 'primary_concern', ''),
+            getattr(symptom_input, 'duration', ''),
+            getattr(symptom_input, 'pain_level', ''),
+            json.dumps(getattr(symptom_input, 'additional_symptoms', [])),
+            json.dumps(getattr(symptom_input, 'medications', '')),
+            getattr(symptom_input, 'age', None),
+            getattr(symptom_input, 'gender', None),
+            json.dumps(getattr(symptom_input, 'medical_history', [])),
+            result.condition,
+            result.risk_score,
+            result.confidence,
+            result.urgency_level,
+            json.dumps([c.dict() if hasattr(c, 'dict') else c for c in result.contributors]),
+            json.dumps([r.dict() if hasattr(r, 'dict') else r for r in result.recommendations]),
+            result.follow_up_days
+        )
+    
+    @_timed_query('get_patient_history')
     async def get_patient_history(self, patient_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get patient's analysis history"""
         if not self.pool:
@@ -170,8 +314,10 @@ class DatabaseManager:
                 
         except Exception as e:
             logger.error(f"Error fetching patient history: {e}")
+            DB_QUERY_ERRORS.labels('get_patient_history').inc()
             return []
     
+    @_timed_query('get_analytics')
     async def get_analytics(self, days: int = 30) -> Dict[str, Any]:
         """Get analytics data for dashboard"""
         if not self.pool:
@@ -231,6 +377,7 @@ class DatabaseManager:
                 
         except Exception as e:
             logger.error(f"Error fetching analytics: {e}")
+            DB_QUERY_ERRORS.labels('get_analytics').inc()
             return {
                 "total_analyses": 0,
                 "average_risk_score": 0.0,
@@ -238,6 +385,7 @@ class DatabaseManager:
                 "urgency_distribution": {}
             }
     
+    @_timed_query('store_feedback')
     async def store_feedback(self, analysis_id: str, feedback: Dict[str, Any]) -> bool:
         """Store patient feedback"""
         if not self.pool:
@@ -262,39 +410,189 @@ class DatabaseManager:
             
         except Exception as e:
             logger.error(f"Error storing feedback: {e}")
+            DB_QUERY_ERRORS.labels('store_feedback').inc()
             return False
     
-    async def _update_daily_analytics(self, result: Any):
-        """Update daily analytics summary"""
+    async def iter_feedback_examples(self, after_id: int = 0, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream diagnosed feedback joined to its analysis, in feedback id order.
+        
+        Rows are read through a server-side cursor in batches, so memory is
+        bounded by batch_size however much feedback has accumulated. Errors
+        are raised, so a failed read fails the retraining run instead of
+        looking like the end of the feedback.
+        """
         if not self.pool:
+            examples = self._feedback_examples_memory(after_id)
+            for start in range(0, len(examples), batch_size):
+                yield examples[start:start + batch_size]
             return
         
+        started = time.perf_counter()
         try:
-            today = datetime.now().date()
-            
             async with self.pool.acquire() as conn:
-                # Check if record exists for today
-                existing = await conn.fetchrow('''
-                    SELECT * FROM analytics_summary WHERE date = $1
-                ''', today)
-                
-                if existing:
-                    # Update existing record
+                # Cursors only live inside a transaction
+                async with conn.transaction():
+                    cursor = await conn.cursor(self.FEEDBACK_EXAMPLES_SQL, after_id)
+                    while True:
+                        rows = await cursor.fetch(batch_size)
+                        if not rows:
+                            break
+                        yield [self._feedback_example(dict(row)) for row in rows]
+        except Exception as e:
+            logger.error(f"Error streaming feedback: {e}")
+            DB_QUERY_ERRORS.labels('iter_feedback_examples').inc()
+            raise
+        finally:
+            DB_QUERY_SECONDS.labels('iter_feedback_examples', 'postgres').observe(time.perf_counter() - started)
+    
+    @staticmethod
+    def _feedback_example(row: Dict[str, Any]) -> Dict[str, Any]:
+        symptoms = row.get('additional_symptoms')
+        if isinstance(symptoms, str):
+            symptoms = json.loads(symptoms)
+        return {
+            'feedback_id': row['feedback_id'],
+            'actual_diagnosis': row['actual_diagnosis'],
+            'primary_concern': row.get('primary_concern') or '',
+            'duration': row.get('duration') or '',
+            'pain_level': row.get('pain_level'),
+            'additional_symptoms': symptoms or []
+        }
+    
+    async def iter_risk_inputs(self, after_id: int = 0, batch_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream the stored inputs and risk of analyses, in id order.
+        
+        Like iter_feedback_examples this reads through a server-side cursor
+        and raises on errors, so a backfill never records a partial scan as done.
+        """
+        if not self.pool:
+            logger.warning("Stored analyses can only be streamed from postgres")
+            return
+        
+        started = time.perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    cursor = await conn.cursor(self.RISK_INPUTS_SQL, after_id)
+                    while True:
+                        rows = await cursor.fetch(batch_size)
+                        if not rows:
+                            break
+                        yield [self._risk_inputs(dict(row)) for row in rows]
+        except Exception as e:
+            logger.error(f"Error streaming analyses: {e}")
+            DB_QUERY_ERRORS.labels('iter_risk_inputs').inc()
+            raise
+        finally:
+            DB_QUERY_SECONDS.labels('iter_risk_inputs', 'postgres').observe(time.perf_counter() - started)
+    
+    @staticmethod
+    def _risk_inputs(row: Dict[str, Any]) -> Dict[str, Any]:
+        for column in ('additional_symptoms', 'medical_history'):
+            if isinstance(row.get(column), str):
+                row[column] = json.loads(row[column])
+        return row
+    
+    @_timed_query('start_risk_backfill')
+    async def start_risk_backfill(self, job: str, restart: bool = False) -> Optional[Dict[str, Any]]:
+        """Checkpoint of a backfill job, created on first use and reset on restart"""
+        if not self.pool:
+            return None
+        
+        async with self.pool.acquire() as conn:
+            if restart:
+                await conn.execute('DELETE FROM risk_backfill_checkpoints WHERE job = $1', job)
+            row = await conn.fetchrow('''
+                INSERT INTO risk_backfill_checkpoints (job) VALUES ($1)
+                ON CONFLICT (job) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+                RETURNING job, last_id, rows_scanned, rows_updated, started_at, finished_at
+            ''', job)
+            return dict(row)
+    
+    @_timed_query('update_risk_scores')
+    async def update_risk_scores(self, job: str, rows: List[tuple], last_id: int, scanned: int) -> bool:
+        """Write rescored (id, risk_score, urgency_level, follow_up_days) rows and advance the checkpoint.
+        
+        The updates and the checkpoint commit in one transaction, so a resumed
+        job starts right after the last chunk that was written.
+        """
+        if not self.pool:
+            return False
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    for start in range(0, len(rows), self.RISK_UPDATE_BATCH_ROWS):
+                        batch = rows[start:start + self.RISK_UPDATE_BATCH_ROWS]
+                        await conn.execute(self._risk_update_sql(len(batch)), *[value for row in batch for value in row])
                     await conn.execute('''
-                        UPDATE analytics_summary SET
-                            total_analyses = total_analyses + 1,
+                        UPDATE risk_backfill_checkpoints SET
+                            last_id = $2,
+                            rows_scanned = rows_scanned + $3,
+                            rows_updated = rows_updated + $4,
                             updated_at = CURRENT_TIMESTAMP
-                        WHERE date = $1
-                    ''', today)
-                else:
-                    # Create new record
-                    await conn.execute('''
-                        INSERT INTO analytics_summary (date, total_analyses)
-                        VALUES ($1, 1)
-                    ''', today)
+                        WHERE job = $1
+                    ''', job, last_id, scanned, len(rows))
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error writing rescored analyses: {e}")
+            DB_QUERY_ERRORS.labels('update_risk_scores').inc()
+            return False
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _risk_update_sql(rows: int) -> str:
+        """UPDATE ... FROM (VALUES ...) for a number of rows, so full batches reuse one prepared statement"""
+        values = ', '.join(
+            f"(${4 * i + 1}::integer, ${4 * i + 2}::integer, ${4 * i + 3}::varchar, ${4 * i + 4}::integer)"
+            for i in range(rows)
+        )
+        return f'''
+            UPDATE symptom_analyses AS a SET
+                risk_score = v.risk_score,
+                urgency_level = v.urgency_level,
+                follow_up_days = v.follow_up_days,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES {values}) AS v (id, risk_score, urgency_level, follow_up_days)
+            WHERE a.id = v.id
+        '''
+    
+    @_timed_query('finish_risk_backfill')
+    async def finish_risk_backfill(self, job: str):
+        """Mark a backfill job as done"""
+        if not self.pool:
+            return
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute('''
+                UPDATE risk_backfill_checkpoints SET finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE job = $1
+            ''', job)
+    
+    @_timed_query('update_daily_analytics')
+    async def _update_daily_analytics(self, result: Any, count: int = 1):
+        """Update daily analytics summary"""
+        if not self.pool:
+            return
+        
+        try:
+            async with self.pool.acquire() as conn:
+                await self._increment_daily_analytics(conn, count)
                     
         except Exception as e:
             logger.error(f"Error updating daily analytics: {e}")
+            DB_QUERY_ERRORS.labels('update_daily_analytics').inc()
+    
+    async def _increment_daily_analytics(self, conn: Any, count: int):
+        """Add count analyses to today's summary row in a single upsert"""
+        await conn.execute('''
+            INSERT INTO analytics_summary (date, total_analyses)
+            VALUES ($1, $2)
+            ON CONFLICT (date) DO UPDATE SET
+                total_analyses = analytics_summary.total_analyses + EXCLUDED.total_analyses,
+                updated_at = CURRENT_TIMESTAMP
+        ''', datetime.now().date(), count)
     
     async def close(self):
         """Close database connection pool"""
@@ -320,6 +618,9 @@ class DatabaseManager:
                 'analysis_id': result.analysis_id,
                 'patient_id': getattr(symptom_input, 'patient_id', None),
                 'primary_concern': getattr(symptom_input, 'primary_concern', ''),
+                'duration': getattr(symptom_input, 'duration', ''),
+                'pain_level': getattr(symptom_input, 'pain_level', None),
+                'additional_symptoms': getattr(symptom_input, 'additional_symptoms', []),
                 'condition': result.condition,
                 'risk_score': result.risk_score,
                 'urgency_level': result.urgency_level,
@@ -404,6 +705,7 @@ class DatabaseManager:
         
         try:
             feedback_data = {
+                'id': len(self._memory_storage['feedback']) + 1,
                 'analysis_id': analysis_id,
                 'feedback': feedback,
                 'created_at': datetime.now()
@@ -414,4 +716,21 @@ class DatabaseManager:
             
         except Exception as e:
             logger.error(f"Error storing feedback in memory: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def _feedback_examples_memory(self, after_id: int) -> List[Dict[str, Any]]:
+        """Diagnosed feedback joined to its stored analysis, from memory"""
+        self.__init_memory_storage()
+        
+        analyses = {a['analysis_id']: a for a in self._memory_storage['analyses']}
+        examples = []
+        for entry in self._memory_storage['feedback']:
+            analysis = analyses.get(entry['analysis_id'])
+            diagnosis = entry['feedback'].get('actual_diagnosis')
+            if entry['id'] > after_id and diagnosis and analysis is not None:
+                examples.append(self._feedback_example({
+                    'feedback_id': entry['id'],
+                    'actual_diagnosis': diagnosis,
+                    **analysis
+                }))
+        return examples
\ No newline at end of file
@@ -0,0 +1,175 @@
+# database/write_behind.py
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from database.db_manager import ROW_ERRORS
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """Buffer analyses in memory and bulk-COPY them in the background.
+    
+    Requests only enqueue; a drain task flushes every max_rows rows or
+    flush_interval_ms, whichever comes first. When the queue is full
+    (the database is slower than intake) the policy decides what happens:
+    'block' waits for space, 'drop' discards the analysis, and 'inline'
+    writes it synchronously through DatabaseManager.store_analysis.
+    
+    A COPY that fails because of its rows is split in halves until the bad
+    rows are isolated, so only those are dropped. Other failures are retried
+    with backoff, since the database may be briefly unavailable.
+    """
+    
+    POLICIES = ('block', 'drop', 'inline')
+    
+    def __init__(self, db_manager: Any, max_rows: Optional[int] = None,
+                 flush_interval_ms: Optional[float] = None, max_queue: Optional[int] = None,
+                 policy: Optional[str] = None, max_retries: int = 3):
+        self.db_manager = db_manager
+        self.max_rows = max_rows or int(os.getenv('WRITE_BEHIND_BATCH_ROWS', '500'))
+        self.flush_interval_ms = flush_interval_ms or float(os.getenv('WRITE_BEHIND_FLUSH_MS', '200'))
+        self.max_queue = max_queue or int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', '10000'))
+        self.policy = (policy or os.getenv('WRITE_BEHIND_POLICY', 'block')).lower()
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown write-behind policy: {self.policy}")
+        self.max_retries = max_retries
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flushed_rows = 0
+        self._flushes = 0
+        self._dropped = 0
+        self._inline_writes = 0
+        self._failed_rows = 0
+        self.flush_latency = Histogram()
+    
+    def start(self):
+        """Start the background drain task on the running loop"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+        logger.info(
+            f"Write-behind started (rows={self.max_rows}, interval={self.flush_interval_ms}ms, "
+            f"queue={self.max_queue}, policy={self.policy})"
+        )
+    
+    async def enqueue(self, symptom_input: Any, result: Any):
+        """Hand one analysis to the background writer"""
+        item = (symptom_input, result)
+        if self._closing or self._queue is None:
+            # Shutting down: write through so nothing is lost
+            await self.db_manager.store_analysis(symptom_input, result)
+            return
+        
+        try:
+            self._queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+        
+        if self.policy == 'block':
+            await self._queue.put(item)
+        elif self.policy == 'drop':
+            self._dropped += 1
+            logger.warning(f"Write-behind queue full, dropped analysis {result.analysis_id}")
+        else:
+            self._inline_writes += 1
+            await self.db_manager.store_analysis(symptom_input, result)
+    
+    async def enqueue_many(self, items: List[tuple]):
+        """Hand a batch of (symptom_input, result) pairs to the writer"""
+        for symptom_input, result in items:
+            await self.enqueue(symptom_input, result)
+    
+    async def _drain(self):
+        """Collect rows until the size or time limit, then flush them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            stop = False
+            deadline = loop.time() + self.flush_interval_ms / 1000.0
+            while len(batch) < self.max_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            await self._flush(batch)
+            if stop:
+                return
+    
+    async def _flush(self, batch: List[tuple]):
+        """COPY one batch and count what was stored and what was lost"""
+        started = time.monotonic()
+        stored = await self._copy(batch)
+        if stored:
+            self._flushes += 1
+            self._flushed_rows += stored
+            self.flush_latency.observe(time.monotonic() - started)
+        self._failed_rows += len(batch) - stored
+    
+    async def _copy(self, batch: List[tuple]) -> int:
+        """COPY rows, bisecting around bad rows; returns how many were stored"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if await self.db_manager.copy_analyses(batch, raise_errors=True):
+                    return len(batch)
+            except ROW_ERRORS as e:
+                if len(batch) == 1:
+                    logger.error(f"Write-behind dropped analysis {batch[0][1].analysis_id}: {e}")
+                    return 0
+                middle = len(batch) // 2
+                return await self._copy(batch[:middle]) + await self._copy(batch[middle:])
+            except Exception:
+                pass
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(5.0, 0.1 * 2 ** attempt))
+        
+        logger.error(f"Write-behind gave up on {len(batch)} analyses after {self.max_retries} retries")
+        return 0
+    
+    async def close(self):
+        """Flush everything still queued and stop the drain task"""
+        if self._task is None:
+            return
+        
+        # New analyses write through from here on; the sentinel marks the end
+        self._closing = True
+        pending = self._queue.qsize()
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info(f"Write-behind flushed {pending} queued analyses on shutdown")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush statistics"""
+        return {
+            'policy': self.policy,
+            'max_rows': self.max_rows,
+            'flush_interval_ms': self.flush_interval_ms,
+            'max_queue': self.max_queue,
+            'queued': self._queue.qsize() if self._queue else 0,
+            'flushes': self._flushes,
+            'flushed_rows': self._flushed_rows,
+            'dropped': self._dropped,
+            'inline_writes': self._inline_writes,
+            'failed_rows': self._failed_rows,
+            'flush_latency_seconds': self.flush_latency.snapshot()
+        }
@@ -0,0 +1,52 @@
+# export_embeddings.py
+"""Export the sentence model to int8 ONNX for EMBEDDING_BACKEND=onnx.
+
+Needs torch and sentence-transformers once, at export time. The export is
+checked against the PyTorch model on the condition names and the template
+concerns, and is not written if any of them falls below --min-cosine.
+Servers started with EMBEDDING_BACKEND=onnx then load it from
+models/trained_models/embeddings without importing torch.
+
+Usage: python export_embeddings.py [--model all-MiniLM-L6-v2] [--min-cosine 0.99]
+"""
+import argparse
+import json
+import logging
+import sys
+
+from models.sentence_encoder import export_onnx, onnx_model_dir
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import training_templates
+
+logger = logging.getLogger("export_embeddings")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the sentence model as a quantized ONNX encoder")
+    parser.add_argument("--model", default=SymptomAnalyzer.SENTENCE_MODEL_NAME, help="Hub name or local directory")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Lowest accepted cosine to the PyTorch embedding")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    
+    analyzer = SymptomAnalyzer()
+    templates = training_templates()
+    symptoms = {symptom for symptoms in templates['additional_symptoms'] for symptom in symptoms}
+    sentences = sorted(set(templates['condition'])) + sorted(set(templates['primary_concern'])) + sorted(symptoms)
+    
+    try:
+        config = export_onnx(
+            args.model, onnx_model_dir(analyzer.model_path, args.model), sentences,
+            min_cosine=args.min_cosine, opset=args.opset
+        )
+    except ValueError as e:
+        logger.error(f"{e}, nothing written")
+        return 1
+    print(json.dumps(config))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
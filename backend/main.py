@@ -1,58 +1,219 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError, conint
+from typing import List, Dict, Optional, Any, Tuple
+import hmac
+import json
+import os
 import uvicorn
 import numpy as np
 import pandas as pd
 from datetime import datetime
+import asyncio
+import time
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 # Import our custom modules
-from models.symptom_analyzer import SymptomAnalyzer
+from models.symptom_analyzer import SymptomAnalyzer, DIFFERENTIAL_TOP_K
 from models.risk_calculator import RiskCalculator
+from models.retraining import FeedbackRetrainer
 from utils.data_preprocessor import DataPreprocessor
+from utils.analysis_pipeline import (
+    AnalysisPipeline, install_pipeline, run_analysis, run_analysis_many,
+    prepare_analysis, run_prepared_analyses, run_what_if
+)
+from utils.inference_executor import InferenceExecutor, ExecutorSaturatedError
+from utils.micro_batcher import MicroBatcher
+from utils.result_cache import AnalysisResultCache
+from utils.warmup import warm_up
+from utils.bulk_analysis import detect_format, open_text, iter_records, read_chunk
+from utils.metrics import REGISTRY, render_histogram, render_value
 from database.db_manager import DatabaseManager
+from database.write_behind import WriteBehindQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on items accepted by the batch endpoint
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+
+# Upper bound on scenarios scored by one what-if request
+WHAT_IF_MAX_POINTS = int(os.getenv('WHAT_IF_MAX_POINTS', '50000'))
+
+# Coalesce concurrent single analyses into stacked model calls
+MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'true').lower() == 'true'
+
+# 'sync' stores each analysis before responding, 'write_behind' queues it
+ANALYSIS_WRITE_MODE = os.getenv('ANALYSIS_WRITE_MODE', 'sync').lower()
+
+# Synthetic passes through the pipeline before reporting ready, 0 disables
+WARMUP_ROUNDS = int(os.getenv('WARMUP_ROUNDS', '2'))
+
+# Required in X-Admin-Token by the model admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
 # Global variables for models
 symptom_analyzer = None
 risk_calculator = None
 data_preprocessor = None
 db_manager = None
+inference_executor = None
+micro_batcher = None
+write_behind = None
+result_cache = None
+model_retrainer = None
+
+# Metrics exposed on /metrics
+REQUEST_SECONDS = REGISTRY.histogram(
+    'symptom_checker_request_seconds',
+    'End-to-end latency of the analysis endpoints',
+    ('endpoint',)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    'symptom_checker_stage_seconds',
+    'Latency of each analysis stage; batch stages are observed once per batch',
+    ('stage', 'mode')
+)
+ANALYSES_TOTAL = REGISTRY.counter(
+    'symptom_checker_analyses_total',
+    'Analyzed inputs by outcome',
+    ('outcome',)
+)
+FALLBACKS_TOTAL = REGISTRY.counter(
+    'symptom_checker_fallbacks_total',
+    'Fallback-path activations by component',
+    ('component',)
+)
+CASCADE_ANSWERS_TOTAL = REGISTRY.counter(
+    'symptom_checker_cascade_answers_total',
+    'Model-backed analyses by the cascade tier that answered',
+    ('tier',)
+)
+
+# Readiness state reported by /ready
+service_ready = False
+startup_error = None
+startup_task = None
+startup_timings: Dict[str, float] = {}
+warmup_timings: Dict[str, float] = {}
+models_preloaded = False
+
+@contextmanager
+def _timed(component: str):
+    """Record how long a startup component took in startup_timings"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[component] = round(time.perf_counter() - started, 4)
+
+def preload_models():
+    """Load and warm the preprocessor and ML models into the module globals.
+
+    The pre-fork launcher calls this once in the master process so that
+    forked workers share the loaded models copy-on-write instead of each
+    worker loading its own copy. Otherwise the lifespan handler runs it in
+    a worker thread after the server has started accepting connections.
+    """
+    global symptom_analyzer, risk_calculator, data_preprocessor, warmup_timings
+    
+    # Initialize data preprocessor; NLTK data and the spell checker load on first use
+    with _timed('data_preprocessor'):
+        preprocessor = DataPreprocessor()
+    
+    # Load ML models; the sentence transformer loads on first similarity query
+    with _timed('symptom_analyzer'):
+        analyzer = SymptomAnalyzer()
+        analyzer.load_models_sync()
+    
+    with _timed('risk_calculator'):
+        calculator = RiskCalculator()
+        calculator.initialize_sync()
+    
+    if WARMUP_ROUNDS > 0:
+        with _timed('warmup'):
+            warmup_timings = {
+                stage: round(seconds, 4)
+                for stage, seconds in warm_up(preprocessor, analyzer, calculator, WARMUP_ROUNDS).items()
+            }
+    
+    data_preprocessor = preprocessor
+    risk_calculator = calculator
+    symptom_analyzer = analyzer
+
+async def _start_inference(started: float):
+    """Load models off the event loop, then start the inference services"""
+    global inference_executor, micro_batcher, model_retrainer, service_ready, startup_error, models_preloaded
+    try:
+        # Models may already be loaded by a pre-fork master (see serve.py)
+        if symptom_analyzer is None:
+            await asyncio.to_thread(preload_models)
+        else:
+            models_preloaded = True
+        
+        # Run CPU-bound inference on a bounded pool instead of the event loop.
+        # The pool starts after loading so forked process workers inherit the models.
+        install_pipeline(AnalysisPipeline(data_preprocessor, symptom_analyzer, risk_calculator, result_cache))
+        with _timed('inference_executor'):
+            inference_executor = InferenceExecutor()
+            inference_executor.start()
+        if MICRO_BATCH_ENABLED:
+            micro_batcher = MicroBatcher(inference_executor, run_prepared_analyses)
+        # Forked workers copy the models, so they are replaced after a model swap
+        model_retrainer = FeedbackRetrainer(symptom_analyzer, db_manager, on_swap=inference_executor.restart)
+        model_retrainer.start()
+        
+        startup_timings['time_to_ready'] = round(time.perf_counter() - started, 4)
+        service_ready = True
+        logger.info(
+            "Service ready: " + ", ".join(f"{component}={seconds:.3f}s" for component, seconds in startup_timings.items())
+        )
+    except Exception as e:
+        startup_error = str(e)
+        logger.error(f"Failed to initialize inference services: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global symptom_analyzer, risk_calculator, data_preprocessor, db_manager
-    logger.info("Loading ML models and initializing services...")
+    global db_manager, write_behind, result_cache, startup_task
+    logger.info("Initializing services...")
+    started = time.perf_counter()
     
     try:
         # Initialize database
-        db_manager = DatabaseManager()
-        await db_manager.initialize()
-        
-        # Initialize data preprocessor
-        data_preprocessor = DataPreprocessor()
+        with _timed('database'):
+            db_manager = DatabaseManager()
+            await db_manager.initialize()
+        if ANALYSIS_WRITE_MODE == 'write_behind':
+            write_behind = WriteBehindQueue(db_manager)
+            write_behind.start()
+        result_cache = AnalysisResultCache()
         
-        # Load ML models
-        symptom_analyzer = SymptomAnalyzer()
-        await symptom_analyzer.load_models()
+        # Load models in the background so /health answers while they load;
+        # /ready reports when inference can be served
+        startup_task = asyncio.create_task(_start_inference(started))
         
-        risk_calculator = RiskCalculator()
-        await risk_calculator.initialize()
-        
-        logger.info("All services initialized successfully")
+        logger.info("Accepting connections, loading ML models in the background")
         yield
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
         raise
     finally:
         # Cleanup
+        if startup_task and not startup_task.done():
+            startup_task.cancel()
+        if model_retrainer:
+            await model_retrainer.close()
+        if micro_batcher:
+            await micro_batcher.close()
+        if inference_executor:
+            inference_executor.shutdown()
+        if write_behind:
+            await write_behind.close()
         if db_manager:
             await db_manager.close()
 
@@ -83,11 +244,16 @@ class SymptomInput(BaseModel):
     age: Optional[int] = Field(None, ge=0, le=120)
     gender: Optional[str] = Field(None, description="Patient gender")
     medical_history: Optional[List[str]] = Field(default=[], description="Previous medical conditions")
+    top_k: int = Field(3, ge=1, le=DIFFERENTIAL_TOP_K, description="Conditions in the ranked differential")
 
 class ContributorFactor(BaseModel):
     factor: str
     impact: float = Field(..., ge=0, le=1)
 
+class DifferentialCondition(BaseModel):
+    condition: str
+    probability: float = Field(..., ge=0, le=1)
+
 class Recommendation(BaseModel):
     text: str
     priority: str = Field(..., regex="^(high|medium|low)$")
@@ -97,6 +263,7 @@ class AnalysisResult(BaseModel):
     condition: str
     risk_score: int = Field(..., ge=0, le=100)
     confidence: float = Field(..., ge=0, le=1)
+    differential: List[DifferentialCondition] = Field(default=[], description="Most likely conditions, best first")
     contributors: List[ContributorFactor]
     recommendations: List[Recommendation]
     urgency_level: str = Field(..., regex="^(emergency|urgent|routine|monitoring)$")
@@ -104,12 +271,41 @@ class AnalysisResult(BaseModel):
     analysis_id: str
     timestamp: datetime
 
+class BatchSymptomInput(BaseModel):
+    # Items are validated one by one so a bad entry fails alone
+    items: List[Dict[str, Any]] = Field(..., description="Symptom inputs to analyze")
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[AnalysisResult] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResult(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
 class HealthMetrics(BaseModel):
     total_analyses: int
     common_conditions: List[Dict[str, Any]]
     average_risk_score: float
     urgency_distribution: Dict[str, int]
 
+class WhatIfRequest(BaseModel):
+    # The base analysis and the patient inputs it was made from
+    condition: str = Field(..., description="Condition of the base analysis")
+    confidence: float = Field(..., ge=0, le=1)
+    duration: str = Field(..., description="How long symptoms have been present")
+    pain_level: Optional[str] = Field(None, description="Pain level if applicable")
+    additional_symptoms: List[str] = Field(default=[], description="Additional symptoms")
+    age: Optional[int] = Field(None, ge=0, le=120)
+    medical_history: Optional[List[str]] = Field(default=[], description="Previous medical conditions")
+    # Values to try per axis; an omitted axis keeps the base value
+    ages: Optional[List[Optional[conint(ge=0, le=120)]]] = Field(None, description="Ages, null for unknown")
+    durations: Optional[List[str]] = Field(None, description="Durations, as listed by the risk model")
+    pain_levels: Optional[List[str]] = Field(None, description="Pain levels, as listed by the risk model")
+    comorbidity_counts: Optional[List[conint(ge=0)]] = Field(None, description="High-risk comorbidity counts")
+
 # Dependency to get services
 async def get_symptom_analyzer():
     if symptom_analyzer is None:
@@ -131,6 +327,108 @@ async def get_db_manager():
         raise HTTPException(status_code=503, detail="Database manager not initialized")
     return db_manager
 
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token")
+
+async def get_inference_executor():
+    if inference_executor is None or not service_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Models are still loading",
+            headers={"Retry-After": "1"}
+        )
+    return inference_executor
+
+async def _shed_load(job):
+    """Await an inference job, turning a full queue into 503 + Retry-After"""
+    try:
+        return await job
+    except ExecutorSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference capacity exhausted, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def _analyze_one(executor: InferenceExecutor, symptoms: SymptomInput) -> Dict[str, Any]:
+    """Run the pipeline for one input, via the micro-batcher when enabled"""
+    if micro_batcher is None:
+        return await _shed_load(executor.run(run_analysis, symptoms))
+    
+    # Preprocess and featurize per request, then share one model call
+    prepared = await _shed_load(executor.run(prepare_analysis, symptoms))
+    if 'stages' in prepared:
+        # Result cache hit, no inference needed
+        return prepared['stages']
+    return await _shed_load(micro_batcher.submit(prepared))
+
+def _record_stages(stages: Dict[str, Any], mode: str, elapsed: Optional[float] = None):
+    """Observe the pipeline stage timings of one analysis or one batch"""
+    timings = stages.get('timings', {})
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage, mode).observe(seconds)
+    if elapsed is not None:
+        # Whatever the pipeline did not account for was spent waiting for
+        # a worker or a micro-batch, or moving data to and from the pool
+        STAGE_SECONDS.labels('queue', mode).observe(max(0.0, elapsed - sum(timings.values())))
+
+def _record_outcome(stages: Dict[str, Any]):
+    """Count one analysis outcome and any fallback paths it went through"""
+    if result_cache and inference_executor and inference_executor.kind == 'process' and 'cache_hit' in stages:
+        # Forked workers look up their own copy of the cache, so count their lookups here
+        result_cache.record_lookups(hits=int(stages['cache_hit']), misses=int(not stages['cache_hit']))
+    if 'error' in stages:
+        ANALYSES_TOTAL.labels('error').inc()
+        return
+    if stages.get('cache_hit'):
+        # Only model-backed results are cached, so there is nothing else to count
+        ANALYSES_TOTAL.labels('cache_hit').inc()
+        return
+    
+    ANALYSES_TOTAL.labels('analyzed').inc()
+    if stages['processed_data'].get('processing_error'):
+        FALLBACKS_TOTAL.labels('preprocessor').inc()
+    if not stages['analysis'].get('differential'):
+        # Keyword condition from SymptomAnalyzer._get_fallback_condition
+        FALLBACKS_TOTAL.labels('analyzer').inc()
+    else:
+        CASCADE_ANSWERS_TOTAL.labels(stages['analysis'].get('model_tier', 'full')).inc()
+    if not stages['risk_data'].get('risk_breakdown'):
+        FALLBACKS_TOTAL.labels('risk_calculator').inc()
+
+def _component_metrics() -> List[str]:
+    """Expose the executor, batcher, write-behind and cache statistics"""
+    lines = []
+    if inference_executor:
+        stats = inference_executor.stats()
+        lines += render_value('symptom_checker_executor_in_flight', 'Inference jobs running or queued', 'gauge', stats['in_flight'])
+        lines += render_value('symptom_checker_executor_queue_depth', 'Inference jobs waiting for a worker', 'gauge', stats['queue_depth'])
+        lines += render_value('symptom_checker_executor_rejected_total', 'Inference jobs shed with 503', 'counter', stats['rejected'])
+        lines += render_value('symptom_checker_executor_failed_total', 'Inference jobs that raised', 'counter', stats['failed'])
+        lines += render_histogram('symptom_checker_executor_wait_seconds', 'Time inference jobs waited for a worker', inference_executor.wait_time)
+        lines += render_histogram('symptom_checker_executor_run_seconds', 'Time inference jobs ran on a worker', inference_executor.run_time)
+    if micro_batcher:
+        lines += render_histogram('symptom_checker_micro_batch_size', 'Inputs per coalesced model call', micro_batcher.batch_size)
+        lines += render_histogram('symptom_checker_micro_batch_wait_seconds', 'Time inputs waited for a micro-batch to fill', micro_batcher.queue_latency)
+    if write_behind:
+        stats = write_behind.stats()
+        lines += render_value('symptom_checker_write_behind_queued', 'Analyses waiting to be flushed', 'gauge', stats['queued'])
+        lines += render_value('symptom_checker_write_behind_flushed_rows_total', 'Analyses flushed with COPY', 'counter', stats['flushed_rows'])
+        lines += render_value('symptom_checker_write_behind_dropped_total', 'Analyses dropped on a full queue', 'counter', stats['dropped'])
+        lines += render_value('symptom_checker_write_behind_failed_rows_total', 'Analyses that failed every flush retry', 'counter', stats['failed_rows'])
+        lines += render_histogram('symptom_checker_write_behind_flush_seconds', 'Latency of write-behind flushes', write_behind.flush_latency)
+    if result_cache:
+        stats = result_cache.stats()
+        lines += render_value('symptom_checker_result_cache_hits_total', 'Result cache hits', 'counter', stats['hits'])
+        lines += render_value('symptom_checker_result_cache_misses_total', 'Result cache misses', 'counter', stats['misses'])
+        lines += render_value('symptom_checker_result_cache_entries', 'Cached analyses', 'gauge', stats['entries'])
+    return lines
+
+REGISTRY.add_collector(_component_metrics)
+
 @app.get("/")
 async def root():
     return {"message": "MediCare Symptom Checker API", "status": "healthy"}
@@ -147,54 +445,359 @@ async def health_check():
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once models are loaded and warmed, 503 until then.
+    /health only reports that the process is alive.
+    """
+    body = {
+        "ready": service_ready,
+        "timestamp": datetime.now(),
+        "error": startup_error,
+        "models_preloaded": models_preloaded,
+        "startup_seconds": startup_timings,
+        "warmup_seconds": warmup_timings
+    }
+    if not service_ready:
+        return JSONResponse(status_code=503, content=jsonable_encoder(body))
+    return body
+
+@app.get("/stats")
+async def get_stats():
+    """
+    Runtime statistics for the inference pool, batching, caching, write queues, model updates and risk scoring
+    """
+    return {
+        "inference_executor": inference_executor.stats() if inference_executor else None,
+        "micro_batcher": micro_batcher.stats() if micro_batcher else None,
+        "write_behind": write_behind.stats() if write_behind else None,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "condition_index": (
+            symptom_analyzer.condition_index.stats()
+            if symptom_analyzer and symptom_analyzer.condition_index else None
+        ),
+        "model": model_retrainer.stats() if model_retrainer else None,
+        "cascade": _cascade_stats() if symptom_analyzer else None,
+        "risk_table": risk_calculator.lookup_table_stats() if risk_calculator else None
+    }
+
+def _cascade_stats() -> Dict[str, Any]:
+    """Cascade settings with the escalation rate observed since startup"""
+    fast = CASCADE_ANSWERS_TOTAL.labels('fast').value
+    full = CASCADE_ANSWERS_TOTAL.labels('full').value
+    return {
+        **symptom_analyzer.cascade_stats(),
+        'answered_fast': int(fast),
+        'answered_full': int(full),
+        'escalation_rate': full / (fast + full) if fast + full else None
+    }
+
+@app.post("/model/rollback", dependencies=[Depends(require_admin)])
+async def rollback_model():
+    """
+    Serve the model that was active before the last swap; it is still loaded.
+    The previous bundle becomes CURRENT, so other workers follow through the
+    CURRENT watcher and restarted workers load it.
+    """
+    if model_retrainer is None or not service_ready:
+        raise HTTPException(status_code=503, detail="Service is not ready")
+    previous_version = symptom_analyzer.model_version
+    version = model_retrainer.rollback()
+    if version is None:
+        raise HTTPException(status_code=409, detail="No previous model to roll back to")
+    return {"model_version": version, "rolled_back": previous_version}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Latency histograms and counters in the Prometheus text format
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/analyze-symptoms", response_model=AnalysisResult)
 async def analyze_symptoms(
     symptoms: SymptomInput,
-    analyzer: SymptomAnalyzer = Depends(get_symptom_analyzer),
-    risk_calc: RiskCalculator = Depends(get_risk_calculator),
-    preprocessor: DataPreprocessor = Depends(get_data_preprocessor),
+    executor: InferenceExecutor = Depends(get_inference_executor),
     db: DatabaseManager = Depends(get_db_manager)
 ):
     """
     Analyze symptoms and provide risk assessment with recommendations
     """
+    started = time.perf_counter()
     try:
         logger.info(f"Analyzing symptoms for patient: {symptoms.patient_id}")
         
-        # Preprocess input data
-        processed_data = await preprocessor.process_symptoms(symptoms)
-        
-        # Perform symptom analysis
-        analysis = await analyzer.analyze(processed_data)
-        
-        # Calculate risk score
-        risk_data = await risk_calc.calculate_risk(analysis, processed_data)
-        
-        # Generate recommendations
-        recommendations = await analyzer.generate_recommendations(analysis, risk_data)
+        # Preprocess, analyze, score and recommend off the event loop
+        stages = await _analyze_one(executor, symptoms)
+        _record_stages(stages, 'single', time.perf_counter() - started)
+        _record_outcome(stages)
+        if 'error' in stages:
+            raise ValueError(stages['error'])
         
         # Create result
-        result = AnalysisResult(
-            condition=analysis['primary_condition'],
-            risk_score=risk_data['risk_score'],
-            confidence=analysis['confidence'],
-            contributors=analysis['contributors'],
-            recommendations=recommendations,
-            urgency_level=risk_data['urgency_level'],
-            follow_up_days=risk_data.get('follow_up_days'),
-            analysis_id=analysis['analysis_id'],
-            timestamp=datetime.now()
-        )
+        result = _build_analysis_result(stages['analysis'], stages['risk_data'], stages['recommendations'], symptoms.top_k)
         
         # Store analysis in database
-        await db.store_analysis(symptoms, result)
+        store_started = time.perf_counter()
+        if write_behind:
+            await write_behind.enqueue(symptoms, result)
+        else:
+            await db.store_analysis(symptoms, result)
+        STAGE_SECONDS.labels('store', 'single').observe(time.perf_counter() - store_started)
         
         logger.info(f"Analysis completed successfully: {result.analysis_id}")
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing symptoms: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        REQUEST_SECONDS.labels('analyze_symptoms').observe(time.perf_counter() - started)
+
+@app.post("/analyze-symptoms/batch", response_model=BatchAnalysisResult)
+async def analyze_symptoms_batch(
+    batch: BatchSymptomInput,
+    executor: InferenceExecutor = Depends(get_inference_executor),
+    db: DatabaseManager = Depends(get_db_manager)
+):
+    """
+    Analyze a batch of symptom inputs with one vectorized model pass
+    """
+    if len(batch.items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {MAX_BATCH_SIZE}")
+    
+    started = time.perf_counter()
+    try:
+        logger.info(f"Analyzing symptom batch of {len(batch.items)} items")
+        
+        # Validate each item on its own so one bad entry does not fail the batch
+        valid_inputs, valid_indices, errors = _validate_items(batch.items)
+        
+        # Preprocess, analyze and score the valid items as one batch off the event loop
+        stage_items = await _shed_load(executor.run(run_analysis_many, valid_inputs))
+        
+        outcomes, stored = _collect_outcomes(len(batch.items), errors, valid_indices, valid_inputs, stage_items)
+        results = [
+            BatchItemResult(index=index, result=result, error=error)
+            for index, (result, error) in enumerate(outcomes)
+        ]
+        
+        # Store all successful analyses in one round trip
+        store_started = time.perf_counter()
+        if write_behind:
+            await write_behind.enqueue_many(stored)
+        else:
+            await db.store_analyses(stored)
+        STAGE_SECONDS.labels('store', 'batch').observe(time.perf_counter() - store_started)
+        
+        logger.info(f"Batch analysis completed: {len(stored)}/{len(batch.items)} succeeded")
+        return BatchAnalysisResult(
+            results=results,
+            succeeded=len(stored),
+            failed=len(batch.items) - len(stored)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing symptom batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+    finally:
+        REQUEST_SECONDS.labels('analyze_symptoms_batch').observe(time.perf_counter() - started)
+
+@app.post("/analyze-symptoms/bulk")
+async def analyze_symptoms_bulk(
+    file: UploadFile = File(..., description="CSV with a header row, or JSONL with one object per line"),
+    format: Optional[str] = None,
+    persist: bool = False,
+    executor: InferenceExecutor = Depends(get_inference_executor),
+    db: DatabaseManager = Depends(get_db_manager)
+):
+    """
+    Stream analyses for an uploaded CSV/JSONL file as NDJSON, one line per row
+    followed by a summary line. Rows are read and analyzed in fixed-size chunks,
+    so memory use does not depend on the file size.
+    """
+    try:
+        fmt = detect_format(format, file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logger.info(f"Starting bulk analysis of {file.filename} ({fmt}, persist={persist})")
+    return StreamingResponse(
+        _stream_bulk_analysis(executor, db, open_text(file.file), fmt, persist),
+        media_type="application/x-ndjson"
+    )
+
+async def _stream_bulk_analysis(executor: InferenceExecutor, db: DatabaseManager, stream, fmt: str, persist: bool):
+    """Read, analyze, optionally store and emit one chunk of rows at a time"""
+    started = time.perf_counter()
+    records = iter_records(stream, fmt)
+    rows = succeeded = stored_count = 0
+    
+    while True:
+        # File reads stay off the event loop; the upload may be spooled to disk
+        chunk = await asyncio.to_thread(read_chunk, records)
+        if not chunk:
+            break
+        
+        try:
+            outcomes, stored = await _analyze_bulk_chunk(executor, chunk)
+            if persist:
+                stored_count += await _store_bulk_chunk(db, stored)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band and stop
+            logger.error(f"Bulk analysis stopped after {rows} rows: {e}")
+            yield json.dumps({'error': f"Bulk analysis failed: {str(e)}", 'rows': rows}) + "\n"
+            return
+        
+        lines = []
+        for row_number, result, error in outcomes:
+            if error is None:
+                succeeded += 1
+                lines.append(json.dumps({'row': row_number, 'result': jsonable_encoder(result)}))
+            else:
+                lines.append(json.dumps({'row': row_number, 'error': error}))
+        rows += len(outcomes)
+        yield "\n".join(lines) + "\n"
+    
+    summary = {
+        'rows': rows,
+        'succeeded': succeeded,
+        'failed': rows - succeeded,
+        'stored': stored_count if persist else None,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    logger.info(f"Bulk analysis completed: {summary}")
+    yield json.dumps({'summary': summary}) + "\n"
+
+async def _analyze_bulk_chunk(executor: InferenceExecutor, chunk: List[Tuple]) -> Tuple[List[Tuple], List[tuple]]:
+    """Analyze one chunk of parsed rows as a batch, returning per-row outcomes"""
+    parsed = [(row_number, record) for row_number, record, error in chunk if error is None]
+    valid_inputs, valid_indices, errors = _validate_items([record for _, record in parsed])
+    
+    stage_items = []
+    while valid_inputs:
+        # A bulk job waits for capacity instead of failing mid-stream
+        try:
+            stage_items = await executor.run(run_analysis_many, valid_inputs)
+            break
+        except ExecutorSaturatedError as e:
+            await asyncio.sleep(e.retry_after)
+    
+    outcomes, stored = _collect_outcomes(len(parsed), errors, valid_indices, valid_inputs, stage_items)
+    return _merge_chunk_outcomes(chunk, outcomes), stored
+
+def _merge_chunk_outcomes(chunk: List[Tuple], outcomes: List[Tuple]) -> List[Tuple]:
+    """Interleave analysis outcomes with parse errors as (row, result, error)"""
+    parsed_outcomes = iter(outcomes)
+    results = []
+    for row_number, record, error in chunk:
+        if error is None:
+            result, error = next(parsed_outcomes)
+            results.append((row_number, result, error))
+        else:
+            results.append((row_number, None, error))
+    return results
+
+async def _store_bulk_chunk(db: DatabaseManager, stored: List[tuple]) -> int:
+    """Persist a chunk of analyses, returning how many rows were accepted"""
+    if write_behind:
+        await write_behind.enqueue_many(stored)
+        return len(stored)
+    if await db.copy_analyses(stored):
+        return len(stored)
+    logger.warning(f"Bulk COPY failed, retrying {len(stored)} analyses with INSERT")
+    return len(stored) if await db.store_analyses(stored) else 0
+
+def _validate_items(items: List[Dict[str, Any]]) -> Tuple[List[SymptomInput], List[int], Dict[int, str]]:
+    """Validate raw items one by one so that a bad entry fails alone"""
+    valid_inputs: List[SymptomInput] = []
+    valid_indices: List[int] = []
+    errors: Dict[int, str] = {}
+    for index, item in enumerate(items):
+        try:
+            valid_inputs.append(SymptomInput(**item))
+            valid_indices.append(index)
+        except ValidationError as e:
+            errors[index] = f"Invalid input: {e}"
+    return valid_inputs, valid_indices, errors
+
+def _collect_outcomes(count: int, errors: Dict[int, str], valid_indices: List[int],
+                      valid_inputs: List[SymptomInput], stage_items: List[Dict[str, Any]]) -> Tuple[List[Tuple], List[tuple]]:
+    """Pair every item with its (result, error) and gather the analyses to store"""
+    outcomes: List[Tuple[Optional[AnalysisResult], Optional[str]]] = [(None, errors.get(index)) for index in range(count)]
+    if stage_items:
+        # Batch stage timings are shared by every item, so observe them once
+        _record_stages(stage_items[0], 'batch')
+    
+    stored = []
+    for index, symptoms, stages in zip(valid_indices, valid_inputs, stage_items):
+        _record_outcome(stages)
+        try:
+            if 'error' in stages:
+                raise ValueError(stages['error'])
+            result = _build_analysis_result(stages['analysis'], stages['risk_data'], stages['recommendations'], symptoms.top_k)
+            outcomes[index] = (result, None)
+            stored.append((symptoms, result))
+        except Exception as e:
+            logger.error(f"Error analyzing batch item {index}: {e}")
+            outcomes[index] = (None, f"Analysis failed: {str(e)}")
+    return outcomes, stored
+
+def _build_analysis_result(analysis: Dict[str, Any], risk_data: Dict[str, Any], recommendations: List[Dict[str, Any]],
+                           top_k: int) -> AnalysisResult:
+    """Assemble the API result from the pipeline stage outputs"""
+    # The analyzer ranks DIFFERENTIAL_TOP_K conditions so cached results serve any top_k
+    return AnalysisResult(
+        condition=analysis['primary_condition'],
+        risk_score=risk_data['risk_score'],
+        confidence=analysis['confidence'],
+        differential=analysis.get('differential', [])[:top_k],
+        contributors=analysis['contributors'],
+        recommendations=recommendations,
+        urgency_level=risk_data['urgency_level'],
+        follow_up_days=risk_data.get('follow_up_days'),
+        analysis_id=analysis['analysis_id'],
+        timestamp=datetime.now()
+    )
+
+@app.post("/risk/what-if")
+async def risk_what_if(
+    request: WhatIfRequest,
+    calculator: RiskCalculator = Depends(get_risk_calculator),
+    executor: InferenceExecutor = Depends(get_inference_executor)
+):
+    """
+    Risk scores and urgency for every combination of ages, durations, pain levels and comorbidity counts
+    """
+    started = time.perf_counter()
+    try:
+        for axis, values, known in (('durations', request.durations, calculator.DURATION_MODIFIERS),
+                                    ('pain_levels', request.pain_levels, calculator.SEVERITY_MODIFIERS)):
+            unknown = [value for value in values or [] if value not in known]
+            if unknown:
+                raise HTTPException(status_code=422, detail=f"Unknown {axis} {unknown}, expected some of {list(known)}")
+        points = 1
+        for values in (request.ages, request.durations, request.pain_levels, request.comorbidity_counts):
+            points *= 1 if values is None else len(values)
+        if points > WHAT_IF_MAX_POINTS:
+            raise HTTPException(status_code=413, detail=f"Grid of {points} points exceeds limit of {WHAT_IF_MAX_POINTS}")
+        
+        # Scoring and serializing a large grid takes milliseconds, so it runs on the inference pool
+        content = await _shed_load(executor.run(run_what_if, request.dict()))
+        # Plain lists through json.dumps, jsonable_encoder would walk every cell
+        return JSONResponse(content=content)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error scoring what-if grid: {e}")
+        raise HTTPException(status_code=500, detail="Failed to score what-if grid")
+    finally:
+        REQUEST_SECONDS.labels('risk_what_if').observe(time.perf_counter() - started)
 
 @app.get("/symptoms/history/{patient_id}")
 async def get_symptom_history(
@@ -233,7 +836,7 @@ async def get_similar_conditions(
     analyzer: SymptomAnalyzer = Depends(get_symptom_analyzer)
 ):
     """
-    Get conditions similar to the given condition
+    Get conditions similar to a known condition name or a free-text description
     """
     try:
         similar = await analyzer.get_similar_conditions(condition_name)
@@ -0,0 +1,185 @@
+# models/cascade.py
+"""Two-tier inference: a distilled tree answers first, the boosted model when it is unsure.
+
+DistilledTree is one regression tree fit to the full model's class
+probabilities (its soft labels) on the training features, so each leaf
+holds a probability vector. Answering is a single walk of at most
+max_depth gathers instead of every tree of the ensemble. A row escalates
+to the full model when the distilled top probability is below the
+threshold; at 1.0 or above every row escalates and the cascade is off.
+
+Distillation also keeps the distilled confidence of every held-out row and
+whether its class agrees with the full model, so the escalation rate and
+agreement at any threshold can be read without the training data.
+"""
+import logging
+import os
+import time
+from typing import Dict, List, Any, Callable
+
+import numpy as np
+from sklearn.tree import DecisionTreeRegressor
+
+logger = logging.getLogger(__name__)
+
+# Distilled answers at or above this top probability are served; 1 escalates everything
+CASCADE_THRESHOLD = float(os.getenv('CASCADE_THRESHOLD', '0.9'))
+
+# Up to this many rows walk the tree in plain Python; numpy's per-call cost dominates below it
+PYTHON_WALK_MAX_ROWS = 4
+
+# Thresholds reported in the distillation summary
+REPORT_THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+
+class DistilledTree:
+    """A regression tree on soft labels, flattened like CompiledTreeEnsemble"""
+    
+    ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'classes', 'holdout_confidence', 'holdout_agrees')
+    
+    @classmethod
+    def distill(cls, teacher: Callable[[np.ndarray], np.ndarray], classes: np.ndarray, X_train: np.ndarray,
+                X_holdout: np.ndarray, max_depth: int = 16, min_samples_leaf: int = 20,
+                seed: int = 42) -> 'DistilledTree':
+        """Fit to teacher(X) probabilities on X_train and measure agreement on X_holdout"""
+        started = time.perf_counter()
+        tree = DecisionTreeRegressor(max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=seed)
+        tree.fit(X_train, teacher(X_train))
+        
+        nodes = tree.tree_
+        node_ids = np.arange(nodes.node_count)
+        is_leaf = nodes.children_left == -1
+        left = np.where(is_leaf, node_ids, nodes.children_left)
+        right = np.where(is_leaf, node_ids, nodes.children_right)
+        value = nodes.value[:, :, 0]
+        arrays = {
+            'feature': np.where(is_leaf, 0, nodes.feature).astype(np.intp),
+            'threshold': np.where(is_leaf, 0.0, nodes.threshold).astype(np.float64),
+            # Leaves point to themselves so every row takes exactly max_depth steps
+            'children': np.column_stack([left, right]).ravel().astype(np.intp),
+            'value': value / value.sum(axis=1, keepdims=True),
+            'classes': np.asarray(classes),
+            'holdout_confidence': np.empty(0, dtype=np.float32),
+            'holdout_agrees': np.empty(0, dtype=bool)
+        }
+        distilled = cls.from_arrays(arrays, nodes.n_features, nodes.max_depth)
+        
+        probabilities = distilled.predict_proba(X_holdout)
+        distilled.holdout_confidence = probabilities.max(axis=1).astype(np.float32)
+        distilled.holdout_agrees = probabilities.argmax(axis=1) == teacher(X_holdout).argmax(axis=1)
+        distilled.seconds = round(time.perf_counter() - started, 3)
+        
+        logger.info(
+            f"Distilled {nodes.node_count} nodes (depth {nodes.max_depth}), "
+            f"agreement {distilled.holdout_agrees.mean():.3f} on {len(X_holdout)} held-out rows"
+        )
+        return distilled
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], n_features: int, max_depth: int) -> 'DistilledTree':
+        """Rebuild from to_arrays() output and metadata()"""
+        distilled = cls.__new__(cls)
+        distilled.feature = arrays['feature']
+        distilled.threshold = arrays['threshold']
+        distilled.children = arrays['children']
+        distilled.value = arrays['value']
+        distilled.classes_ = arrays['classes']
+        distilled.holdout_confidence = arrays['holdout_confidence']
+        distilled.holdout_agrees = arrays['holdout_agrees']
+        distilled.n_features = int(n_features)
+        distilled.max_depth = int(max_depth)
+        distilled.seconds = None
+        # (feature, threshold, left, right) per node for the plain Python walk
+        distilled.nodes = list(zip(
+            distilled.feature.tolist(), distilled.threshold.tolist(),
+            distilled.children[0::2].tolist(), distilled.children[1::2].tolist()
+        ))
+        return distilled
+    
+    def metadata(self) -> Dict[str, Any]:
+        """Scalar settings from_arrays() needs, plus the distillation summary"""
+        return {
+            'n_features': self.n_features, 'max_depth': self.max_depth,
+            'summary': {
+                'nodes': len(self.feature), 'holdout_rows': len(self.holdout_agrees), 'seconds': self.seconds,
+                'thresholds': {str(threshold): self.expected(threshold) for threshold in REPORT_THRESHOLDS}
+            }
+        }
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The flattened tree and holdout measurements, for saving in a model bundle"""
+        return {name: getattr(self, 'classes_' if name == 'classes' else name) for name in self.ARRAY_NAMES}
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Distilled class probabilities, shape (n_samples, n_classes)"""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        # DecisionTreeRegressor compares in float32
+        X = X.astype(np.float32)
+        
+        if X.shape[0] <= PYTHON_WALK_MAX_ROWS:
+            return self.value[[self._leaf(row) for row in X.tolist()]]
+        
+        rows = np.arange(X.shape[0])
+        nodes = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.max_depth):
+            nodes = self.children[2 * nodes + (X[rows, self.feature[nodes]] > self.threshold[nodes])]
+        return self.value[nodes]
+    
+    def explain(self, X: np.ndarray, class_columns: np.ndarray) -> np.ndarray:
+        """Feature contributions to each row's class_columns probability, shape (n_samples, n_features).
+        
+        Each node holds the mean probability vector of its training rows, so
+        a split is credited with the change in the row's class probability
+        from the node to the child it takes. A row's contributions sum to its
+        leaf probability minus the root's.
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        X = X.astype(np.float32)
+        class_columns = np.asarray(class_columns, dtype=np.intp)
+        contributions = np.zeros(X.shape, dtype=np.float64)
+        
+        if X.shape[0] <= PYTHON_WALK_MAX_ROWS:
+            for contribution_row, row, column in zip(contributions, X.tolist(), class_columns.tolist()):
+                node = 0
+                feature, threshold, left, right = self.nodes[0]
+                while left != node:
+                    child = right if row[feature] > threshold else left
+                    contribution_row[feature] += self.value[child, column] - self.value[node, column]
+                    node = child
+                    feature, threshold, left, right = self.nodes[node]
+            return contributions
+        
+        rows = np.arange(X.shape[0])
+        nodes = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.max_depth):
+            children = self.children[2 * nodes + (X[rows, self.feature[nodes]] > self.threshold[nodes])]
+            # Each row moves at most once per step, so its (row, feature) pair is never repeated here
+            moved = children != nodes
+            contributions[rows[moved], self.feature[nodes[moved]]] += (
+                self.value[children[moved], class_columns[moved]] - self.value[nodes[moved], class_columns[moved]]
+            )
+            nodes = children
+        return contributions
+    
+    def _leaf(self, row: List[float]) -> int:
+        """Leaf reached by one row; float32 values are exact as Python floats"""
+        node = 0
+        feature, threshold, left, right = self.nodes[0]
+        while left != node:
+            node = right if row[feature] > threshold else left
+            feature, threshold, left, right = self.nodes[node]
+        return node
+    
+    def expected(self, threshold: float) -> Dict[str, float]:
+        """Held-out escalation rate and agreement with the full model at a threshold"""
+        if not len(self.holdout_agrees):
+            return {'escalation_rate': None, 'agreement': None}
+        answered = self.holdout_confidence >= threshold
+        return {
+            'escalation_rate': float(1 - answered.mean()),
+            # Escalated rows get the full model's answer, so they always agree
+            'agreement': float((self.holdout_agrees | ~answered).mean())
+        }
@@ -0,0 +1,93 @@
+# models/comorbidity_matcher.py
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Iterable, NamedTuple, FrozenSet, Tuple
+
+logger = logging.getLogger(__name__)
+
+class HistoryMatch(NamedTuple):
+    """High-risk categories found in a medical history"""
+    categories: FrozenSet[str]
+    # History entries that mention at least one category
+    entries: int
+
+NO_MATCH = HistoryMatch(frozenset(), 0)
+
+class ComorbidityMatcher:
+    """Finds high-risk condition categories as substrings of lower-cased history entries.
+    
+    All categories are compiled into one longest-first alternation, so each
+    entry is scanned once and entries without a category cost a single failed
+    search. A scan reports non-overlapping matches, so every category also
+    records the categories that are always present with it (contained in it)
+    and the ones that may overlap its end; only the latter are checked
+    against the entry, and only when it matched. The result is the same set
+    a substring test of every category would give. Results are kept per
+    history in an LRU cache, since the same patient's history comes back
+    with every analysis.
+    """
+    
+    def __init__(self, categories: Iterable[str], cache_size: int = 1024):
+        self.categories = tuple(dict.fromkeys(categories))
+        if not self.categories or not all(self.categories):
+            raise ValueError("Categories must be non-empty strings")
+        
+        alternatives = sorted(self.categories, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(category) for category in alternatives))
+        self._contained: Dict[str, FrozenSet[str]] = {
+            category: frozenset(other for other in self.categories if other in category)
+            for category in self.categories
+        }
+        # Categories starting in the last characters of another, which a scan would skip
+        self._overlapping: Dict[str, Tuple[str, ...]] = {
+            category: tuple(
+                other for other in self.categories
+                if other not in category and any(category.endswith(other[:size]) for size in range(1, len(other)))
+            )
+            for category in self.categories
+        }
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def match(self, history: List[str]) -> HistoryMatch:
+        """Categories and matching entry count of a history, cached per history"""
+        if not history:
+            return NO_MATCH
+        
+        key = tuple(history)
+        if self.cache_size <= 0:
+            return self._scan(key)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        
+        result = self._scan(key)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+    
+    def _scan(self, history: Iterable[str]) -> HistoryMatch:
+        """One search per entry, resolving overlaps only in entries that matched"""
+        categories = set()
+        entries = 0
+        for entry in history:
+            text = entry.lower()
+            found = self.pattern.findall(text)
+            if not found:
+                continue
+            entries += 1
+            for category in found:
+                categories |= self._contained[category]
+                if self._overlapping[category]:
+                    categories.update(other for other in self._overlapping[category] if other in text)
+        
+        if not entries:
+            return NO_MATCH
+        return HistoryMatch(frozenset(categories), entries)
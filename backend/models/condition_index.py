@@ -0,0 +1,144 @@
+# models/condition_index.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ConditionEmbeddingIndex:
+    """Unit-length sentence embeddings of the known condition names.
+    
+    Cosine similarity against every condition is then one matrix-vector
+    product, and argpartition picks the best matches without sorting the
+    rest. Known condition names reuse their own row. Free-text query
+    embeddings are kept in an LRU cache so repeated queries skip the
+    sentence model. The matrix is persisted next to the model artifacts and
+    reused while the condition names and sentence model stay the same.
+    """
+    
+    FILE_NAME = "condition_embeddings.npz"
+    
+    def __init__(self, names: List[str], embeddings: np.ndarray, model_name: str,
+                 query_cache_size: Optional[int] = None):
+        self.names = list(names)
+        self.model_name = model_name
+        self.embeddings = self.normalize(np.asarray(embeddings, dtype=np.float32))
+        self._positions = {name.strip().casefold(): i for i, name in enumerate(self.names)}
+        self.query_cache_size = (
+            query_cache_size if query_cache_size is not None else int(os.getenv('SIMILAR_QUERY_CACHE_SIZE', '1024'))
+        )
+        self._query_cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._known_queries = 0
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale rows to unit L2 norm; all-zero rows stay zero"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+    
+    @classmethod
+    def build(cls, sentence_model: Any, names: List[str], model_name: str) -> 'ConditionEmbeddingIndex':
+        """Encode every condition name once"""
+        return cls(names, sentence_model.encode(list(names)), model_name)
+    
+    @classmethod
+    def load(cls, directory: Path, names: List[str], model_name: str) -> Optional['ConditionEmbeddingIndex']:
+        """Load a persisted index; None if missing or built for other names or another model"""
+        path = Path(directory) / cls.FILE_NAME
+        if not path.exists():
+            return None
+        
+        try:
+            with np.load(path) as data:
+                if data['names'].tolist() != list(names) or str(data['model_name']) != model_name:
+                    logger.info("Persisted condition embeddings are stale, they will be rebuilt")
+                    return None
+                return cls(names, data['embeddings'], model_name)
+        except Exception as e:
+            logger.warning(f"Could not load condition embeddings: {e}")
+            return None
+    
+    def save(self, directory: Path):
+        """Write the index atomically so concurrent loaders never see a partial file"""
+        path = Path(directory) / self.FILE_NAME
+        temp_path = path.with_name(f".{path.stem}.{os.getpid()}.npz")
+        np.savez(
+            temp_path,
+            embeddings=self.embeddings,
+            names=np.array(self.names, dtype=str),
+            model_name=np.array(self.model_name)
+        )
+        os.replace(temp_path, path)
+    
+    def position(self, query: str) -> Optional[int]:
+        """Row of a known condition name, ignoring case and surrounding spaces"""
+        position = self._positions.get(query.strip().casefold())
+        if position is not None:
+            with self._lock:
+                self._known_queries += 1
+        return position
+    
+    def cached_query(self, query: str) -> Optional[np.ndarray]:
+        """Cached unit embedding of a free-text query, or None on a miss"""
+        key = query.strip()
+        with self._lock:
+            vector = self._query_cache.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._query_cache.move_to_end(key)
+            self._hits += 1
+            return vector
+    
+    def remember_query(self, query: str, embedding: np.ndarray) -> np.ndarray:
+        """Normalize and cache a free-text query embedding"""
+        vector = self.normalize(np.asarray(embedding, dtype=np.float32))
+        if self.query_cache_size > 0:
+            with self._lock:
+                self._query_cache[query.strip()] = vector
+                self._query_cache.move_to_end(query.strip())
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return vector
+    
+    def most_similar(self, vector: np.ndarray, limit: int, min_similarity: float,
+                     exclude: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Best matches by cosine similarity, highest first"""
+        similarities = self.embeddings @ vector
+        if exclude is not None:
+            similarities[exclude] = -np.inf
+        
+        limit = min(limit, len(self.names) - (exclude is not None))
+        if limit <= 0:
+            return []
+        
+        top = np.argpartition(-similarities, limit - 1)[:limit]
+        top = top[np.argsort(-similarities[top], kind='stable')]
+        return [
+            {'condition': self.names[idx], 'similarity': float(similarities[idx])}
+            for idx in top
+            if similarities[idx] > min_similarity
+        ]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'conditions': len(self.names),
+                'dimensions': int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0,
+                'model_name': self.model_name,
+                'known_condition_queries': self._known_queries,
+                'cached_queries': len(self._query_cache),
+                'max_cached_queries': self.query_cache_size,
+                'query_cache_hits': self._hits,
+                'query_cache_misses': self._misses,
+                'query_cache_hit_rate': self._hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,131 @@
+# models/feature_plan.py
+import logging
+import numpy as np
+import scipy.sparse as sp
+from typing import Dict, List, Any, Optional
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l2
+
+logger = logging.getLogger(__name__)
+
+class FeaturePlan:
+    """SymptomAnalyzer feature extraction compiled from the fitted transformers.
+    
+    Holds the vocabulary, IDF weights and the scaled value of every duration
+    and pain category, so a call only tokenizes the text and writes each
+    row's non-zero TF-IDF entries and three scaled numbers straight into the
+    output matrix. There is no dense TF-IDF matrix, hstack or per-call
+    scaler validation.
+    
+    The values are the same bits as vectorizer.transform().toarray() plus
+    scaler.transform(): tokens are counted and sorted like CountVectorizer,
+    weighted and L2-normalized in CSR form with sklearn's own row routine, and
+    scaled with the same subtract-then-divide steps.
+    """
+    
+    DEFAULT_DURATION_CODE = 2
+    DEFAULT_PAIN_LEVEL = 'No pain (0/10)'
+    
+    def __init__(self, vectorizer: Any, scaler: Any, duration_codes: Dict[str, float], pain_scores: Dict[str, float]):
+        if not isinstance(vectorizer, TfidfVectorizer):
+            raise TypeError(f"Cannot plan features for {type(vectorizer).__name__}, expected TfidfVectorizer")
+        if vectorizer.norm not in ('l2', None) or vectorizer.dtype != np.float64:
+            raise TypeError("Feature plan supports float64 TF-IDF with l2 or no normalization")
+        
+        self.analyze = vectorizer.build_analyzer()
+        self.vectorizer_params = vectorizer.get_params()
+        self.vocabulary = dict(vectorizer.vocabulary_)
+        self.n_text_features = len(self.vocabulary)
+        self.binary = vectorizer.binary
+        self.sublinear_tf = vectorizer.sublinear_tf
+        self.normalize = vectorizer.norm == 'l2'
+        self.idf = np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else None
+        self.n_features = self.n_text_features + 3
+        
+        # x - 0.0 and x / 1.0 are exact, so disabled scaler steps use neutral values
+        n_numeric = scaler.n_features_in_
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_numeric)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_numeric)
+        
+        # Scaling is elementwise, so each category's scaled value is computed once
+        self.duration_values = {duration: self._scale(0, code) for duration, code in duration_codes.items()}
+        self.default_duration_value = self._scale(0, self.DEFAULT_DURATION_CODE)
+        self.pain_values = {pain: self._scale(1, score) for pain, score in pain_scores.items()}
+        self.default_pain_value = self._scale(1, 0)
+    
+    def matches(self, other: Optional['FeaturePlan']) -> bool:
+        """True if other builds exactly the same feature matrix from the same inputs"""
+        if other is None:
+            return False
+        return (
+            self.vectorizer_params == other.vectorizer_params
+            and self.vocabulary == other.vocabulary
+            and (self.idf is None) == (other.idf is None)
+            and (self.idf is None or np.array_equal(self.idf, other.idf))
+            and np.array_equal(self.mean, other.mean)
+            and np.array_equal(self.scale, other.scale)
+            and self.duration_values == other.duration_values
+            and self.pain_values == other.pain_values
+        )
+    
+    def _scale(self, column: int, value: float) -> float:
+        """StandardScaler.transform for one value of one column"""
+        return float((np.float64(value) - self.mean[column]) / self.scale[column])
+    
+    def transform(self, processed_items: List[Dict[str, Any]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Feature matrix with one row per processed input, optionally written into out"""
+        n_rows = len(processed_items)
+        if out is None:
+            out = np.zeros((n_rows, self.n_features))
+        else:
+            out[:n_rows] = 0.0
+        
+        data, indices, indptr = self._tfidf_csr(processed_data['primary_concern'] for processed_data in processed_items)
+        row_ids = np.repeat(np.arange(n_rows), np.diff(indptr))
+        out[row_ids, indices] = data
+        
+        numeric = out[:n_rows, self.n_text_features:]
+        for row, processed_data in enumerate(processed_items):
+            numeric[row, 0] = self.duration_values.get(processed_data['duration'], self.default_duration_value)
+            numeric[row, 1] = self.pain_values.get(
+                processed_data.get('pain_level', self.DEFAULT_PAIN_LEVEL), self.default_pain_value
+            )
+            numeric[row, 2] = len(processed_data.get('additional_symptoms', []))
+        # Symptom counts are unbounded, so this column is scaled per call
+        numeric[:, 2] -= self.mean[2]
+        numeric[:, 2] /= self.scale[2]
+        
+        return out[:n_rows]
+    
+    def _tfidf_csr(self, texts: Any) -> tuple:
+        """CSR arrays of the TF-IDF rows, column indices sorted within each row"""
+        vocabulary = self.vocabulary
+        indices: List[int] = []
+        counts: List[int] = []
+        indptr = [0]
+        for text in texts:
+            counter: Dict[int, int] = {}
+            for token in self.analyze(text):
+                index = vocabulary.get(token)
+                if index is not None:
+                    counter[index] = counter.get(index, 0) + 1
+            for index in sorted(counter):
+                indices.append(index)
+                counts.append(1 if self.binary else counter[index])
+            indptr.append(len(indices))
+        
+        # sklearn's normalization routine wants matching index and indptr dtypes
+        indices = np.asarray(indices, dtype=np.int32)
+        indptr = np.asarray(indptr, dtype=np.int32)
+        data = np.asarray(counts, dtype=np.float64)
+        
+        if self.sublinear_tf:
+            np.log(data, data)
+            data += 1.0
+        if self.idf is not None:
+            data *= self.idf[indices]
+        if self.normalize:
+            inplace_csr_row_normalize_l2(
+                sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, self.n_text_features), copy=False)
+            )
+        return data, indices, indptr
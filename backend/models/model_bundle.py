@@ -0,0 +1,205 @@
+# models/model_bundle.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import joblib
+import numpy as np
+import sklearn
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+# Names the active bundle directory; replaced atomically on every save
+CURRENT_POINTER = "CURRENT"
+BUNDLES_DIR = "bundles"
+
+class BundleError(Exception):
+    """Raised when a bundle is missing, incomplete or fails verification"""
+
+class ModelBundle:
+    """One versioned, self-describing directory of model artifacts.
+    
+    Layout under the model directory:
+        
+        CURRENT                         name of the active bundle
+        bundles/<version>/manifest.json format, version, checksums, feature schema
+        bundles/<version>/<name>.joblib estimators, uncompressed
+        bundles/<version>/arrays/<group>/<name>.npy
+    
+    A bundle is written into a temporary directory and renamed into place,
+    then CURRENT is replaced, so readers see either the old set or the new
+    one, never a mix. The version is a hash of the file checksums. Joblib
+    files are uncompressed so joblib.load(mmap_mode='r') maps their arrays,
+    and .npy arrays are mapped read-only and shared through the page cache.
+    """
+    
+    def __init__(self, path: Path, manifest: Dict[str, Any]):
+        self.path = Path(path)
+        self.manifest = manifest
+    
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+    
+    @staticmethod
+    def current_path(model_dir: Path) -> Optional[Path]:
+        """Directory of the active bundle, or None if no bundle was saved"""
+        pointer = Path(model_dir) / CURRENT_POINTER
+        if not pointer.exists():
+            return None
+        return Path(model_dir) / BUNDLES_DIR / pointer.read_text().strip()
+    
+    @classmethod
+    def load_current(cls, model_dir: Path, verify: bool = True) -> Optional['ModelBundle']:
+        path = cls.current_path(model_dir)
+        return cls.load(path, verify) if path is not None else None
+    
+    @classmethod
+    def load(cls, path: Path, verify: bool = True) -> 'ModelBundle':
+        try:
+            with open(Path(path) / MANIFEST_FILE) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"Cannot read bundle manifest in {path}: {e}")
+        
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle format {manifest.get('format_version')} in {path}")
+        
+        bundle = cls(path, manifest)
+        if verify:
+            bundle.verify()
+        return bundle
+    
+    @classmethod
+    def write(cls, model_dir: Path, components: Dict[str, Any], arrays: Dict[str, Dict[str, np.ndarray]],
+              metadata: Dict[str, Any], activate: bool = True) -> 'ModelBundle':
+        """Write a new bundle atomically and, by default, make it the current one"""
+        bundles_dir = Path(model_dir) / BUNDLES_DIR
+        bundles_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = bundles_dir / f".tmp-{uuid.uuid4().hex}"
+        temp_dir.mkdir()
+        
+        try:
+            for name, component in components.items():
+                joblib.dump(component, temp_dir / f"{name}.joblib")
+            for group, group_arrays in arrays.items():
+                (temp_dir / "arrays" / group).mkdir(parents=True)
+                for name, array in group_arrays.items():
+                    np.save(temp_dir / "arrays" / group / f"{name}.npy", np.ascontiguousarray(array))
+            
+            files = {
+                path.relative_to(temp_dir).as_posix(): {'sha256': _sha256(path), 'bytes': path.stat().st_size}
+                for path in sorted(temp_dir.rglob("*")) if path.is_file()
+            }
+            version = hashlib.sha256(
+                json.dumps({name: entry['sha256'] for name, entry in files.items()}, sort_keys=True).encode()
+            ).hexdigest()[:16]
+            
+            manifest = {
+                'format_version': BUNDLE_FORMAT_VERSION,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'libraries': {'sklearn': sklearn.__version__, 'numpy': np.__version__},
+                'components': sorted(components),
+                'arrays': {group: sorted(group_arrays) for group, group_arrays in arrays.items()},
+                'files': files,
+                **metadata
+            }
+            _write_atomic(temp_dir / MANIFEST_FILE, json.dumps(manifest, indent=2, default=str))
+            
+            final_dir = bundles_dir / version
+            if final_dir.exists() and _is_intact(final_dir):
+                # Identical content was saved before
+                shutil.rmtree(temp_dir)
+            else:
+                shutil.rmtree(final_dir, ignore_errors=True)
+                os.replace(temp_dir, final_dir)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        
+        bundle = cls(final_dir, manifest)
+        if activate:
+            bundle.activate(model_dir)
+        logger.info(f"Wrote model bundle {version} to {final_dir}")
+        return bundle
+    
+    def activate(self, model_dir: Path):
+        """Point CURRENT at this bundle"""
+        _write_atomic(Path(model_dir) / CURRENT_POINTER, self.path.name + "\n")
+    
+    def verify(self):
+        """Check every file against the manifest checksums"""
+        for name, entry in self.manifest.get('files', {}).items():
+            path = self.path / name
+            if not path.exists():
+                raise BundleError(f"Bundle {self.version} is missing {name}")
+            if _sha256(path) != entry['sha256']:
+                raise BundleError(f"Bundle {self.version} file {name} fails its checksum")
+    
+    def load_component(self, name: str, mmap: bool = True) -> Any:
+        """Load a joblib component; its numpy arrays are memory-mapped when possible"""
+        return joblib.load(self.path / f"{name}.joblib", mmap_mode='r' if mmap else None)
+    
+    def load_arrays(self, group: str) -> Dict[str, np.ndarray]:
+        """Map a group of arrays read-only without copying them"""
+        names: List[str] = self.manifest.get('arrays', {}).get(group, [])
+        if not names:
+            raise BundleError(f"Bundle {self.version} has no '{group}' arrays")
+        # Plain ndarray views avoid np.memmap's per-operation overhead
+        return {
+            name: np.load(self.path / "arrays" / group / f"{name}.npy", mmap_mode='r').view(np.ndarray)
+            for name in names
+        }
+
+class LazyComponent:
+    """Loads one bundle component on its first call, then returns the same object"""
+    
+    def __init__(self, bundle: ModelBundle, name: str):
+        self.bundle = bundle
+        self.name = name
+        self._value = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+    
+    def __call__(self) -> Any:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self.bundle.load_component(self.name)
+                    logger.info(f"Loaded {self.name} from bundle {self.bundle.version}")
+        return self._value
+
+def _is_intact(path: Path) -> bool:
+    try:
+        ModelBundle.load(path)
+        return True
+    except BundleError:
+        return False
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_atomic(path: Path, content: str):
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
@@ -0,0 +1,390 @@
+# models/retraining.py
+"""Background retraining from patient feedback.
+
+FeedbackRetrainer streams feedback that names the actual diagnosis, joined
+to the analysis it rates, and refits the condition model in a separate
+process. The refit keeps the served bundle's vectorizer and scaler, so the
+features do not change and only the model is swapped: on synthetic replay
+rows plus every feedback example so far, with feedback weighted up. Fitting
+from scratch is used instead of warm_start because a histogram booster
+rebins its features on new data, which warm_start does not allow.
+
+A candidate is only swapped in when it is at least as accurate as the
+served model on held-out feedback and loses at most RETRAIN_MAX_REGRESSION
+on held-out replay rows. The feedback holdout is chosen by feedback id, so
+it is the same across runs. A run reads all new feedback but keeps only
+the newest RETRAIN_MAX_FEEDBACK examples, so its memory is bounded; when
+such a run is accepted, the older examples it dropped are never trained on. Accepted feedback is carried in the bundle's
+'feedback' arrays and the last feedback id in its training metadata, which
+is where the next run resumes.
+
+The swap is SymptomAnalyzer.swap_bundle(): requests in flight finish on the
+model they started with, and the replaced model stays loaded so rollback()
+is a reference swap. A rollback makes the previous bundle CURRENT and
+records the rolled-back feedback in SKIP_FILE, so every worker, including
+ones started later, leaves that feedback alone. The fit runs at low priority on RETRAIN_THREADS
+threads in its own process, so it does not hold the GIL or the cores that
+serve requests.
+"""
+import asyncio
+import collections
+import fcntl
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Optional
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from models.cascade import DistilledTree
+from models.model_bundle import ModelBundle, BundleError, _write_atomic
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import build_training_frame, make_estimator, training_templates
+
+logger = logging.getLogger(__name__)
+
+# Seconds between retraining checks; off unless set, since a retrain swaps the served model
+RETRAIN_INTERVAL_SECONDS = float(os.getenv('RETRAIN_INTERVAL_SECONDS', '0'))
+
+# New diagnosed feedback needed before a retrain is attempted
+RETRAIN_MIN_FEEDBACK = int(os.getenv('RETRAIN_MIN_FEEDBACK', '50'))
+
+# Synthetic rows replayed with the feedback so the model keeps its base coverage
+RETRAIN_REPLAY_ROWS = int(os.getenv('RETRAIN_REPLAY_ROWS', '20000'))
+
+# Newest new feedback examples a run trains on; older ones are dropped
+RETRAIN_MAX_FEEDBACK = int(os.getenv('RETRAIN_MAX_FEEDBACK', '20000'))
+
+# Sample weight of a feedback example relative to a replay row
+RETRAIN_FEEDBACK_WEIGHT = float(os.getenv('RETRAIN_FEEDBACK_WEIGHT', '5'))
+
+# Share of replay rows and of feedback held out for the accept/reject decision
+RETRAIN_HOLDOUT_SHARE = float(os.getenv('RETRAIN_HOLDOUT_SHARE', '0.2'))
+
+# Largest replay-holdout accuracy drop a candidate may have
+RETRAIN_MAX_REGRESSION = float(os.getenv('RETRAIN_MAX_REGRESSION', '0.01'))
+
+# Threads the retraining process may use
+RETRAIN_THREADS = int(os.getenv('RETRAIN_THREADS', '1'))
+
+# Seconds between checks for a bundle activated by another process; off unless set
+MODEL_WATCH_SECONDS = float(os.getenv('MODEL_WATCH_SECONDS', '0'))
+
+FEEDBACK_BATCH_SIZE = 500
+
+# Held in the model directory while a worker retrains, so only one does
+LOCK_FILE = ".retrain.lock"
+
+# Feedback id up to which a rolled-back model was trained, shared by all workers
+SKIP_FILE = "RETRAIN_SKIP"
+
+def _init_retrain_process():
+    os.nice(10)
+
+def _feedback_through_id(bundle: Optional[ModelBundle]) -> int:
+    if bundle is None:
+        return 0
+    return int(bundle.manifest.get('training', {}).get('feedback_through_id', 0))
+
+def retrain_from_feedback(bundle_path: str, examples: List[Dict[str, Any]], seed: int) -> Dict[str, Any]:
+    """Refit a bundle's model on replay rows plus feedback; runs in the retraining process.
+    
+    Writes the candidate as an inactive bundle when it passes the holdout
+    checks and returns a report either way.
+    """
+    from threadpoolctl import threadpool_limits
+    from utils.data_preprocessor import DataPreprocessor
+    
+    started = time.perf_counter()
+    analyzer = SymptomAnalyzer()
+    bundle = ModelBundle.load(Path(bundle_path))
+    analyzer.model_path = bundle.path.parent.parent
+    analyzer._load_bundle(bundle)
+    model = analyzer.primary_model
+    
+    # Diagnoses are free text; match them to the model's conditions
+    conditions = {condition.casefold(): index for condition, index in analyzer.condition_mappings.items()}
+    known = [example for example in examples if example['actual_diagnosis'].strip().casefold() in conditions]
+    
+    features = np.empty((0, bundle.manifest['feature_schema']['n_features']))
+    labels = np.empty(0, dtype=np.int64)
+    ids = np.empty(0, dtype=np.int64)
+    if 'feedback' in bundle.manifest.get('arrays', {}):
+        previous = bundle.load_arrays('feedback')
+        features, labels, ids = (np.asarray(previous[name]) for name in ('features', 'labels', 'ids'))
+    if known:
+        processed = DataPreprocessor().process_symptoms_many_sync(known)
+        features = np.vstack([features, analyzer._extract_features_many(processed)])
+        labels = np.concatenate([labels, [conditions[example['actual_diagnosis'].strip().casefold()] for example in known]])
+        ids = np.concatenate([ids, [example['feedback_id'] for example in known]])
+    
+    frame = build_training_frame(training_templates(), RETRAIN_REPLAY_ROWS, seed)
+    replay_features = analyzer._extract_features_many(frame.to_dict('records'))
+    replay_labels = frame['condition'].map(analyzer.condition_mappings).to_numpy()
+    replay_train, replay_test, replay_train_labels, replay_test_labels = train_test_split(
+        replay_features, replay_labels, test_size=RETRAIN_HOLDOUT_SHARE, random_state=seed, stratify=replay_labels
+    )
+    holdout = ids % 100 < RETRAIN_HOLDOUT_SHARE * 100
+    
+    X = np.vstack([replay_train, features[~holdout]])
+    y = np.concatenate([replay_train_labels, labels[~holdout]])
+    weights = np.concatenate([np.ones(len(replay_train_labels)), np.full((~holdout).sum(), RETRAIN_FEEDBACK_WEIGHT)])
+    
+    candidate = make_estimator('hist', seed)
+    with threadpool_limits(RETRAIN_THREADS):
+        candidate.fit(X, y, sample_weight=weights)
+        
+        def accuracy(estimator: Any, X_test: np.ndarray, y_test: np.ndarray) -> Optional[float]:
+            return float(accuracy_score(y_test, estimator.predict(X_test))) if len(y_test) else None
+        
+        scores = {
+            'current_replay_accuracy': accuracy(model, replay_test, replay_test_labels),
+            'candidate_replay_accuracy': accuracy(candidate, replay_test, replay_test_labels),
+            'current_feedback_accuracy': accuracy(model, features[holdout], labels[holdout]),
+            'candidate_feedback_accuracy': accuracy(candidate, features[holdout], labels[holdout])
+        }
+    
+    through_id = max([example['feedback_id'] for example in examples], default=_feedback_through_id(bundle))
+    report = {
+        'trainer': 'hist',
+        'model': type(candidate).__name__,
+        'retrained_from': bundle.version,
+        'feedback_through_id': int(through_id),
+        'new_feedback': len(examples),
+        'unknown_diagnoses': len(examples) - len(known),
+        'feedback_examples': len(labels),
+        'feedback_holdout': int(holdout.sum()),
+        'replay_rows': RETRAIN_REPLAY_ROWS,
+        'iterations': int(candidate.n_iter_),
+        'seed': seed,
+        **scores
+    }
+    
+    if not np.array_equal(candidate.classes_, model.classes_):
+        report['accepted'], report['reason'] = False, "candidate is missing conditions"
+    elif scores['candidate_replay_accuracy'] < scores['current_replay_accuracy'] - RETRAIN_MAX_REGRESSION:
+        report['accepted'], report['reason'] = False, "replay holdout accuracy regressed"
+    elif (scores['current_feedback_accuracy'] is not None
+            and scores['candidate_feedback_accuracy'] < scores['current_feedback_accuracy']):
+        report['accepted'], report['reason'] = False, "feedback holdout accuracy regressed"
+    else:
+        report['accepted'], report['reason'] = True, None
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    
+    if report['accepted']:
+        # The first cascade tier must imitate the candidate, so it is distilled again
+        with threadpool_limits(RETRAIN_THREADS):
+            cascade = DistilledTree.distill(candidate.predict_proba, candidate.classes_, X, replay_test, seed=seed)
+        report['cascade'] = cascade.metadata()['summary']
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        written = analyzer._write_bundle(
+            candidate, training=report, activate=False,
+            arrays={'feedback': {'features': features, 'labels': labels, 'ids': ids}}, cascade=cascade
+        )
+        report['bundle'] = written.version
+    return report
+
+class FeedbackRetrainer:
+    """Retrains the served model from feedback and keeps it in sync with CURRENT.
+    
+    on_swap is called on the event loop after every model change, e.g. to
+    restart forked inference workers that hold a copy of the old model.
+    """
+    
+    def __init__(self, analyzer: SymptomAnalyzer, db_manager: Any, on_swap: Optional[Callable[[], Any]] = None,
+                 interval: Optional[float] = None):
+        self.analyzer = analyzer
+        self.db_manager = db_manager
+        self.on_swap = on_swap
+        self.interval = RETRAIN_INTERVAL_SECONDS if interval is None else interval
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._lock = asyncio.Lock()
+        # Feedback up to this id produced a rejected or rolled-back model
+        self._skip_through_id = self._read_skip()
+        # CURRENT versions that could not be swapped in without a restart
+        self._refused_versions = set()
+        self._runs = 0
+        self._accepted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._swaps = 0
+        self._rollbacks = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+    
+    def start(self):
+        """Start the retraining loop and the CURRENT watcher"""
+        if self._tasks:
+            return
+        if self.interval > 0:
+            self._tasks.append(asyncio.create_task(self.run_forever()))
+        if MODEL_WATCH_SECONDS > 0:
+            self._tasks.append(asyncio.create_task(self.watch_current()))
+        logger.info(f"Model retrainer started (interval={self.interval:g}s, watch={MODEL_WATCH_SECONDS:g}s)")
+    
+    async def close(self):
+        """Stop the loops; a retrain in progress is abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._failed += 1
+                self.last_error = str(e)
+                logger.error(f"Retraining failed: {e}")
+    
+    async def watch_current(self):
+        while True:
+            await asyncio.sleep(MODEL_WATCH_SECONDS)
+            try:
+                await self.sync_with_current()
+            except Exception as e:
+                logger.error(f"Could not follow the current model bundle: {e}")
+    
+    async def run_once(self) -> Optional[Dict[str, Any]]:
+        """Retrain if enough new feedback arrived; returns the run report or None"""
+        async with self._lock:
+            bundle = self.analyzer.model_bundle
+            if bundle is None:
+                return None
+            # Another worker may have rolled back since the last run
+            self._skip_through_id = max(self._skip_through_id, self._read_skip())
+            
+            # Resume after the served model's feedback, including feedback a
+            # rejected run already saw, but only retrain once there is more
+            examples = collections.deque(maxlen=RETRAIN_MAX_FEEDBACK)
+            new_feedback = scanned = 0
+            async for batch in self.db_manager.iter_feedback_examples(_feedback_through_id(bundle), FEEDBACK_BATCH_SIZE):
+                examples.extend(batch)
+                scanned += len(batch)
+                new_feedback += sum(1 for example in batch if example['feedback_id'] > self._skip_through_id)
+            if new_feedback < RETRAIN_MIN_FEEDBACK:
+                return None
+            if scanned > len(examples):
+                logger.warning(f"Retraining on the newest {len(examples)} of {scanned} feedback examples")
+            
+            lock_file = self._acquire_lock()
+            if lock_file is None:
+                logger.info("Another worker is retraining, skipping")
+                return None
+            try:
+                report = await self._retrain(bundle, list(examples))
+            finally:
+                lock_file.close()
+            
+            self._runs += 1
+            self.last_report = report
+            if not report['accepted']:
+                self._rejected += 1
+                self._skip_through_id = report['feedback_through_id']
+                logger.info(f"Rejected retrained model: {report['reason']}")
+                return report
+            
+            self._accepted += 1
+            candidate = await asyncio.to_thread(ModelBundle.load, bundle.path.parent / report['bundle'])
+            if await asyncio.to_thread(self.analyzer.swap_bundle, candidate):
+                # Another process may have activated a newer bundle meanwhile
+                if ModelBundle.current_path(self.analyzer.model_path) == bundle.path:
+                    candidate.activate(self.analyzer.model_path)
+                self._after_swap()
+            return report
+    
+    async def _retrain(self, bundle: ModelBundle, examples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self._executor is None:
+            # Spawned, not forked: the child needs none of the server's state
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'), initializer=_init_retrain_process
+            )
+        seed = max(example['feedback_id'] for example in examples)
+        logger.info(f"Retraining model {bundle.version} with {len(examples)} feedback examples")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, retrain_from_feedback, str(bundle.path), examples, seed)
+    
+    def _acquire_lock(self) -> Optional[Any]:
+        lock_file = open(Path(self.analyzer.model_path) / LOCK_FILE, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    async def sync_with_current(self) -> bool:
+        """Swap in the CURRENT bundle if another process activated a new one"""
+        path = ModelBundle.current_path(self.analyzer.model_path)
+        if path is None or path.name == self.analyzer.model_version or path.name in self._refused_versions:
+            return False
+        
+        async with self._lock:
+            try:
+                bundle = await asyncio.to_thread(ModelBundle.load, path)
+                swapped = await asyncio.to_thread(self.analyzer.swap_bundle, bundle)
+            except BundleError as e:
+                logger.error(f"Ignoring model bundle: {e}")
+                swapped = False
+            if not swapped:
+                self._refused_versions.add(path.name)
+                return False
+            self._after_swap()
+            return True
+    
+    def rollback(self) -> Optional[str]:
+        """Serve the previous model again and make its bundle CURRENT"""
+        rolled_back = self.analyzer.model_bundle
+        version = self.analyzer.rollback()
+        if version is None:
+            return None
+        
+        # Do not retrain the rolled-back model from the same feedback again, in any worker
+        self._skip_through_id = max(self._skip_through_id, self._read_skip(), _feedback_through_id(rolled_back))
+        _write_atomic(Path(self.analyzer.model_path) / SKIP_FILE, f"{self._skip_through_id}\n")
+        if self.analyzer.model_bundle is not None:
+            self.analyzer.model_bundle.activate(self.analyzer.model_path)
+        self._rollbacks += 1
+        self._after_swap()
+        return version
+    
+    def _read_skip(self) -> int:
+        try:
+            return int((Path(self.analyzer.model_path) / SKIP_FILE).read_text())
+        except (OSError, ValueError):
+            return 0
+    
+    def _after_swap(self):
+        self._swaps += 1
+        if self.on_swap is not None:
+            self.on_swap()
+    
+    def stats(self) -> Dict[str, Any]:
+        previous = self.analyzer.previous_model
+        return {
+            'model_version': self.analyzer.model_version,
+            'previous_version': previous['version'] if previous else None,
+            'retraining_enabled': self.interval > 0,
+            'feedback_through_id': _feedback_through_id(self.analyzer.model_bundle),
+            'skip_through_id': self._skip_through_id,
+            'runs': self._runs,
+            'accepted': self._accepted,
+            'rejected': self._rejected,
+            'failed': self._failed,
+            'swaps': self._swaps,
+            'rollbacks': self._rollbacks,
+            'last_report': self.last_report,
+            'last_error': self.last_error
+        }
@@ -1,14 +1,85 @@
 # models/risk_calculator.py
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet
+import hashlib
 import logging
+import os
+import re
+import time
 from datetime import datetime, timedelta
 
+from models.comorbidity_matcher import ComorbidityMatcher
+
 logger = logging.getLogger(__name__)
 
+# Precompute scores for every discrete input at initialize and score batches by lookup
+RISK_LOOKUP_TABLE = os.getenv('RISK_LOOKUP_TABLE', 'false').lower() == 'true'
+
 class RiskCalculator:
-    def __init__(self):
+    # Age modifier factor per age band (unknown, infant, child, adult, senior, elderly)
+    AGE_BAND_FACTORS = (0.0, 0.3, 0.1, 0.0, 0.2, 0.4)
+    # Ages where the known bands start, after infants
+    AGE_BAND_EDGES = (2, 18, 65, 75)
+    
+    # Modifier tables shared by the scalar and batch paths; a code is the key's position
+    DURATION_MODIFIERS = {
+        'Less than 24 hours': 0.2,
+        '1-3 days': 0.1,
+        '4-7 days': 0.0,
+        '1-2 weeks': -0.1,
+        'More than 2 weeks': -0.2
+    }
+    SEVERITY_MODIFIERS = {
+        'No pain (0/10)': 0.0,
+        'Mild pain (1-3/10)': 0.1,
+        'Moderate pain (4-6/10)': 0.2,
+        'Severe pain (7-8/10)': 0.4,
+        'Extreme pain (9-10/10)': 0.6
+    }
+    DEFAULT_RISK_PROFILE = {
+        'base_risk': 40,
+        'age_multiplier': 0.5,
+        'duration_multiplier': 0.5,
+        'severity_multiplier': 1.0,
+        'comorbidity_multiplier': 1.2
+    }
+    
+    # Conditions, and symptoms or pain levels, that make any score an emergency
+    EMERGENCY_CONDITIONS = ('Acute Chest Pain Syndrome', 'Acute Headache Syndrome')
+    EMERGENCY_SYMPTOMS = ('Chest pain', 'Extreme pain (9-10/10)', 'Shortness of breath')
+    UNKNOWN_SYMPTOM_WEIGHT = 2
+    
+    # History entries mentioning any of these (lower-cased substring) count as comorbidities
+    HIGH_RISK_CONDITIONS = (
+        'diabetes', 'heart disease', 'hypertension', 'copd',
+        'asthma', 'cancer', 'kidney disease', 'liver disease'
+    )
+    # Symptoms listed as risk factors, and pain levels that count as high severity
+    HIGH_RISK_SYMPTOMS = frozenset(['Chest pain', 'Shortness of breath', 'Severe pain'])
+    HIGH_PAIN_PATTERN = re.compile('Severe|Extreme')
+    
+    # Batch codes: urgency levels by index, and the follow-up for immediate care (None in the scalar path)
+    URGENCY_LEVELS = ('emergency', 'urgent', 'routine', 'monitoring')
+    FOLLOW_UP_IMMEDIATE = -1
+    # Follow-up days by urgency code, at a score of at most 50 and above 50
+    FOLLOW_UP_DAYS = ((-1, -1), (1, 1), (14, 7), (14, 14))
+    # Confidence modifier by confidence band (below 0.5, between, above 0.8)
+    CONFIDENCE_MODIFIERS = (0.1, 0.0, -0.05)
+    # Duration and pain codes past the known keys; pain 6 is an unknown level that is an emergency symptom
+    UNKNOWN_DURATION_CODE = 5
+    UNKNOWN_PAIN_CODE = 5
+    EMERGENCY_PAIN_CODE = 6
+    
+    # Lookup table inputs where the scalar modifiers stop changing: 4 comorbidities give the 0.4 cap, weight 30 the 0.3 cap
+    TABLE_MAX_COMORBIDITIES = 4
+    TABLE_MAX_SYMPTOM_WEIGHT = 30
+    # An age in each band (unknown first) and a confidence in each band (below 0.5, between, above 0.8)
+    TABLE_AGES = (np.nan, 1, 10, 30, 70, 80)
+    TABLE_CONFIDENCES = (0.0, 0.65, 0.9)
+    TABLE_EMERGENCY_BIT = 0x80
+    
+    def __init__(self, lookup_table: Optional[bool] = None):
         self.risk_factors = {}
         self.urgency_thresholds = {
             'emergency': 85,
@@ -17,12 +88,26 @@ class RiskCalculator:
             'monitoring': 0
         }
         self.condition_risk_profiles = {}
+        self.lookup_table = RISK_LOOKUP_TABLE if lookup_table is None else lookup_table
+        self.comorbidity_matcher = None
+        self._emergency_conditions_set = frozenset(self.EMERGENCY_CONDITIONS)
+        self._emergency_symptoms_set = frozenset(self.EMERGENCY_SYMPTOMS)
+        self.risk_table = None
+        self.risk_table_seconds = None
         self._initialize_risk_profiles()
     
     async def initialize(self):
         """Initialize risk calculation parameters"""
+        self.initialize_sync()
+    
+    def initialize_sync(self):
+        """Synchronous core of initialize"""
         self._setup_condition_risk_profiles()
         self._setup_symptom_risk_weights()
+        self.comorbidity_matcher = ComorbidityMatcher(self.HIGH_RISK_CONDITIONS)
+        self._setup_batch_codes()
+        if self.lookup_table:
+            self._build_risk_table()
         logger.info("Risk calculator initialized successfully")
     
     def _initialize_risk_profiles(self):
@@ -120,20 +205,36 @@ class RiskCalculator:
             'Fatigue': 3
         }
     
+    def _setup_batch_codes(self):
+        """Setup the column codes calculate_risk_batch reads"""
+        # Condition index is the profile's position; anything else gets the default profile after them
+        self.condition_codes = {condition: index for index, condition in enumerate(self.condition_risk_profiles)}
+        self.duration_codes = {duration: code for code, duration in enumerate(self.DURATION_MODIFIERS)}
+        self.pain_codes = {pain_level: code for code, pain_level in enumerate(self.SEVERITY_MODIFIERS)}
+        
+        # One bit per weighted symptom, plus the emergency symptoms that have no weight of their own
+        vocabulary = list(self.symptom_risk_weights)
+        vocabulary += [symptom for symptom in self.EMERGENCY_SYMPTOMS if symptom not in self.symptom_risk_weights]
+        self.symptom_bits = {symptom: bit for bit, symptom in enumerate(vocabulary)}
+        
+        # Summed weight of every symptom set, indexed by its bitmask
+        weights = np.array([self.symptom_risk_weights.get(symptom, self.UNKNOWN_SYMPTOM_WEIGHT) for symptom in vocabulary])
+        masks = np.arange(2 ** len(vocabulary))
+        self.symptom_mask_weight = ((masks[:, None] >> np.arange(len(vocabulary))) & 1) @ weights
+        self.emergency_symptom_mask = sum(1 << self.symptom_bits[symptom] for symptom in self.EMERGENCY_SYMPTOMS)
+    
     async def calculate_risk(self, analysis: Dict[str, Any], processed_data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate comprehensive risk score and urgency level"""
+        return self.calculate_risk_sync(analysis, processed_data)
+    
+    def calculate_risk_sync(self, analysis: Dict[str, Any], processed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Synchronous core of calculate_risk, safe to run in a worker"""
         try:
             condition = analysis['primary_condition']
             confidence = analysis['confidence']
             
             # Get base risk for condition
-            risk_profile = self.condition_risk_profiles.get(condition, {
-                'base_risk': 40,
-                'age_multiplier': 0.5,
-                'duration_multiplier': 0.5,
-                'severity_multiplier': 1.0,
-                'comorbidity_multiplier': 1.2
-            })
+            risk_profile = self.condition_risk_profiles.get(condition, self.DEFAULT_RISK_PROFILE)
             
             base_risk = risk_profile['base_risk']
             
@@ -184,54 +285,361 @@ class RiskCalculator:
                 'risk_factors': ['Unable to calculate detailed risk factors']
             }
     
+    async def calculate_risk_many(self, analyses: List[Dict[str, Any]], processed_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Calculate risk for a batch of analyses, preserving input order"""
+        return self.calculate_risk_many_sync(analyses, processed_items)
+    
+    def calculate_risk_many_sync(self, analyses: List[Dict[str, Any]], processed_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Synchronous core of calculate_risk_many"""
+        return [
+            self.calculate_risk_sync(analysis, processed_data)
+            for analysis, processed_data in zip(analyses, processed_items)
+        ]
+    
+    def encode_risk_inputs(self, analyses: List[Dict[str, Any]], processed_items: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Columns for calculate_risk_batch from analyses and their processed inputs.
+        
+        Symptoms outside the bitmask vocabulary, and repeats of one already in
+        it, are summed into other_symptom_weight so totals match the scalar path.
+        """
+        n_rows = len(analyses)
+        columns = {
+            'condition_index': np.empty(n_rows, dtype=np.int16),
+            'duration_code': np.empty(n_rows, dtype=np.int8),
+            'pain_code': np.empty(n_rows, dtype=np.int8),
+            'age': np.empty(n_rows, dtype=np.float64),
+            'symptom_mask': np.zeros(n_rows, dtype=np.int64),
+            'comorbidity_count': np.empty(n_rows, dtype=np.int16),
+            'confidence': np.empty(n_rows, dtype=np.float64),
+            'other_symptom_weight': np.zeros(n_rows, dtype=np.int64)
+        }
+        default_condition = len(self.condition_risk_profiles)
+        
+        for row, (analysis, processed_data) in enumerate(zip(analyses, processed_items)):
+            columns['condition_index'][row] = self.condition_codes.get(analysis['primary_condition'], default_condition)
+            columns['confidence'][row] = analysis['confidence']
+            columns['duration_code'][row] = self.duration_codes.get(processed_data.get('duration', ''), self.UNKNOWN_DURATION_CODE)
+            
+            columns['pain_code'][row] = self.pain_code(processed_data.get('pain_level', 'No pain (0/10)'))
+            
+            age = processed_data.get('age')
+            columns['age'][row] = age if age else np.nan
+            
+            mask = 0
+            other_weight = 0
+            for symptom in processed_data.get('additional_symptoms', []):
+                bit = self.symptom_bits.get(symptom)
+                if bit is None or mask >> bit & 1:
+                    other_weight += self.symptom_risk_weights.get(symptom, self.UNKNOWN_SYMPTOM_WEIGHT)
+                else:
+                    mask |= 1 << bit
+            columns['symptom_mask'][row] = mask
+            columns['other_symptom_weight'][row] = other_weight
+            columns['comorbidity_count'][row] = self.comorbidity_count(processed_data.get('medical_history', []))
+        
+        return columns
+    
+    def pain_code(self, pain_level: Optional[str]) -> int:
+        """Batch code of a pain level"""
+        if pain_level in self.pain_codes:
+            return self.pain_codes[pain_level]
+        if pain_level in self._emergency_symptoms_set:
+            return self.EMERGENCY_PAIN_CODE
+        return self.UNKNOWN_PAIN_CODE
+    
+    def calculate_risk_grid(self, analysis: Dict[str, Any], processed_data: Dict[str, Any],
+                            ages: Optional[List[Optional[int]]] = None, durations: Optional[List[str]] = None,
+                            pain_levels: Optional[List[str]] = None,
+                            comorbidity_counts: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Score every combination of the axis values around one analysis in one batch.
+        
+        An axis left as None holds the base value. Everything else (condition,
+        confidence, symptoms) stays as in the base. Result arrays are shaped
+        (age, duration, pain level, comorbidity count).
+        """
+        base = self.encode_risk_inputs([analysis], [processed_data])
+        axes = {
+            'age': [processed_data.get('age')] if ages is None else list(ages),
+            'duration': [processed_data.get('duration', '')] if durations is None else list(durations),
+            'pain_level': [processed_data.get('pain_level', 'No pain (0/10)')] if pain_levels is None else list(pain_levels),
+            'comorbidity_count': [int(base['comorbidity_count'][0])] if comorbidity_counts is None else list(comorbidity_counts)
+        }
+        
+        age, duration_code, pain_code, comorbidity_count = (column.ravel() for column in np.meshgrid(
+            np.array([age if age else np.nan for age in axes['age']], dtype=np.float64),
+            np.array([self.duration_codes.get(duration, self.UNKNOWN_DURATION_CODE) for duration in axes['duration']]),
+            np.array([self.pain_code(pain_level) for pain_level in axes['pain_level']]),
+            np.array(axes['comorbidity_count'], dtype=np.int64),
+            indexing='ij'
+        ))
+        shape = tuple(len(values) for values in axes.values())
+        points = int(np.prod(shape))
+        grid = self.calculate_risk_batch(
+            condition_index=np.full(points, base['condition_index'][0]), duration_code=duration_code,
+            pain_code=pain_code, age=age, symptom_mask=np.full(points, base['symptom_mask'][0]),
+            comorbidity_count=comorbidity_count, confidence=np.full(points, base['confidence'][0]),
+            other_symptom_weight=np.full(points, base['other_symptom_weight'][0])
+        )
+        base_result = self.calculate_risk_batch(**base)
+        
+        return {
+            'axes': axes,
+            'base': {
+                'risk_score': int(base_result['risk_score'][0]),
+                'urgency_code': int(base_result['urgency_code'][0]),
+                'follow_up_days': int(base_result['follow_up_days'][0])
+            },
+            'risk_score': grid['risk_score'].reshape(shape),
+            'urgency_code': grid['urgency_code'].reshape(shape),
+            'follow_up_days': grid['follow_up_days'].reshape(shape),
+            # Grid points per urgency code
+            'urgency_counts': np.bincount(grid['urgency_code'], minlength=len(self.URGENCY_LEVELS))
+        }
+    
+    def calculate_risk_batch(self, condition_index: np.ndarray, duration_code: np.ndarray, pain_code: np.ndarray,
+                             age: np.ndarray, symptom_mask: np.ndarray, comorbidity_count: np.ndarray,
+                             confidence: np.ndarray, other_symptom_weight: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Risk scores, urgency levels and follow-up days for columnar inputs.
+        
+        Gives the same scores, urgency and follow-up as calculate_risk_sync
+        row for row, with every modifier computed as a table lookup over the
+        whole batch. Codes are as built by encode_risk_inputs; age is NaN or 0
+        when unknown. follow_up_days holds FOLLOW_UP_IMMEDIATE where the scalar
+        path returns None, and urgency_code indexes URGENCY_LEVELS.
+        """
+        condition_index = np.asarray(condition_index, dtype=np.intp)
+        duration_code = np.asarray(duration_code, dtype=np.intp)
+        pain_code = np.asarray(pain_code, dtype=np.intp)
+        symptom_mask = np.asarray(symptom_mask, dtype=np.int64)
+        comorbidity_count = np.asarray(comorbidity_count, dtype=np.int64)
+        confidence = np.asarray(confidence, dtype=np.float64)
+        
+        symptom_weight = self.symptom_mask_weight[symptom_mask]
+        if other_symptom_weight is not None:
+            symptom_weight = symptom_weight + np.asarray(other_symptom_weight, dtype=np.int64)
+        
+        if self.risk_table is not None and self._risk_table_current():
+            risk_score, urgency_code = self._lookup_batch(
+                condition_index, duration_code, pain_code, age, symptom_weight, comorbidity_count, confidence
+            )
+        else:
+            risk_score, urgency_code = self._score_batch(
+                condition_index, duration_code, pain_code, age, symptom_weight, comorbidity_count, confidence
+            )
+        
+        # Emergency symptoms override the score
+        urgency_code[symptom_mask & self.emergency_symptom_mask != 0] = 0
+        follow_up_days = np.asarray(self.FOLLOW_UP_DAYS)[urgency_code, (risk_score > 50).astype(np.intp)]
+        
+        return {
+            'risk_score': risk_score,
+            'urgency_code': urgency_code,
+            'urgency_level': np.array(self.URGENCY_LEVELS, dtype=object)[urgency_code],
+            'follow_up_days': follow_up_days
+        }
+    
+    def _score_batch(self, condition_index: np.ndarray, duration_code: np.ndarray, pain_code: np.ndarray,
+                     age: np.ndarray, symptom_weight: np.ndarray, comorbidity_count: np.ndarray,
+                     confidence: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores and urgency codes by arithmetic; urgency leaves out emergency symptoms"""
+        # Profile columns by condition index, the default profile last
+        profiles = list(self.condition_risk_profiles.values()) + [self.DEFAULT_RISK_PROFILE]
+        base_risk = np.array([profile['base_risk'] for profile in profiles], dtype=np.float64)[condition_index]
+        age_multiplier = np.array([profile.get('age_multiplier', 0.5) for profile in profiles])[condition_index]
+        duration_multiplier = np.array([profile.get('duration_multiplier', 0.5) for profile in profiles])[condition_index]
+        severity_multiplier = np.array([profile.get('severity_multiplier', 1.0) for profile in profiles])[condition_index]
+        comorbidity_multiplier = np.array([profile.get('comorbidity_multiplier', 1.2) for profile in profiles])[condition_index]
+        
+        # Unknown duration and pain codes add nothing
+        duration_modifiers = np.array(list(self.DURATION_MODIFIERS.values()) + [0.0])
+        severity_modifiers = np.array(list(self.SEVERITY_MODIFIERS.values()) + [0.0, 0.0])
+        
+        age_modifier = np.asarray(self.AGE_BAND_FACTORS)[self.age_bands(age)] * age_multiplier
+        duration_modifier = duration_modifiers[duration_code] * duration_multiplier
+        severity_modifier = severity_modifiers[pain_code] * severity_multiplier
+        symptom_modifier = np.minimum(0.3, symptom_weight / 100.0)
+        comorbidity_modifier = np.minimum(0.4, comorbidity_count * 0.1) * (comorbidity_multiplier - 1.0)
+        confidence_modifier = np.asarray(self.CONFIDENCE_MODIFIERS)[self.confidence_bands(confidence)]
+        
+        # Same order of additions as the scalar path, so the floats round the same way
+        risk_score = base_risk * (
+            1 + age_modifier + duration_modifier + severity_modifier +
+            symptom_modifier + comorbidity_modifier + confidence_modifier
+        )
+        risk_score = np.clip(np.trunc(risk_score), 0, 100).astype(np.int64)
+        
+        emergency = self._emergency_conditions()[condition_index] | self._emergency_pain()[pain_code]
+        return risk_score, np.where(emergency, 0, self._urgency_by_score()[risk_score]).astype(np.int8)
+    
+    def _emergency_conditions(self) -> np.ndarray:
+        """Emergency flag by condition index"""
+        return np.array([condition in self.EMERGENCY_CONDITIONS for condition in self.condition_risk_profiles] + [False])
+    
+    def _emergency_pain(self) -> np.ndarray:
+        """Emergency flag by pain code"""
+        return np.array([pain_level in self.EMERGENCY_SYMPTOMS for pain_level in self.SEVERITY_MODIFIERS] + [False, True])
+    
+    def _urgency_by_score(self) -> np.ndarray:
+        """Urgency code of every score from 0 to 100 by the standard thresholds"""
+        scores = np.arange(101)
+        return np.select([
+            scores >= self.urgency_thresholds['emergency'],
+            scores >= self.urgency_thresholds['urgent'],
+            scores >= self.urgency_thresholds['routine']
+        ], [0, 1, 2], 3).astype(np.int8)
+    
+    def _risk_table_shape(self) -> Tuple[int, ...]:
+        """Lookup table dimensions: condition, duration, pain, age band, confidence band, comorbidities, symptom weight"""
+        return (
+            len(self.condition_risk_profiles) + 1, self.UNKNOWN_DURATION_CODE + 1, self.EMERGENCY_PAIN_CODE + 1,
+            len(self.TABLE_AGES), len(self.TABLE_CONFIDENCES),
+            self.TABLE_MAX_COMORBIDITIES + 1, self.TABLE_MAX_SYMPTOM_WEIGHT + 1
+        )
+    
+    def _profile_key(self) -> str:
+        """Everything scores depend on besides the class constants"""
+        return repr((self.condition_risk_profiles, self.urgency_thresholds))
+    
+    def profile_fingerprint(self) -> str:
+        """Short hash of the risk profiles and urgency thresholds in use"""
+        return hashlib.sha256(self._profile_key().encode()).hexdigest()[:16]
+    
+    def _risk_table_current(self) -> bool:
+        """The table was built from the profiles and thresholds in use"""
+        if self._risk_table_built_from == self._profile_key():
+            return True
+        logger.warning("Risk profiles changed since the lookup table was built, scoring by arithmetic")
+        return False
+    
+    def _build_risk_table(self):
+        """Score every point of the discrete input space with _score_batch"""
+        started = time.perf_counter()
+        shape = self._risk_table_shape()
+        self.risk_table = np.empty(shape, dtype=np.uint8)
+        # One condition at a time keeps the float temporaries small
+        grid = np.indices(shape[1:]).reshape(len(shape) - 1, -1)
+        ages = np.asarray(self.TABLE_AGES)[grid[2]]
+        confidences = np.asarray(self.TABLE_CONFIDENCES)[grid[3]]
+        for condition in range(shape[0]):
+            risk_score, urgency_code = self._score_batch(
+                np.full(grid.shape[1], condition), grid[0], grid[1], ages, grid[5], grid[4], confidences
+            )
+            # Scores fit in 7 bits; the top bit marks entries whose urgency is emergency
+            entries = risk_score | (urgency_code == 0) * self.TABLE_EMERGENCY_BIT
+            self.risk_table[condition] = entries.reshape(shape[1:])
+        
+        # Urgency code of every entry
+        entries = np.arange(256)
+        self.risk_table_urgency = np.where(
+            entries >= self.TABLE_EMERGENCY_BIT, 0, self._urgency_by_score()[np.minimum(entries, 100)]
+        ).astype(np.int8)
+        self._risk_table_built_from = self._profile_key()
+        self.risk_table_seconds = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"Risk lookup table: {self.risk_table.size} entries, {self.risk_table.nbytes / 2**20:.2f} MB, "
+            f"built in {self.risk_table_seconds:.3f}s"
+        )
+    
+    def _lookup_batch(self, condition_index: np.ndarray, duration_code: np.ndarray, pain_code: np.ndarray,
+                      age: np.ndarray, symptom_weight: np.ndarray, comorbidity_count: np.ndarray,
+                      confidence: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """_score_batch by table lookup, with rows outside the table scored by arithmetic"""
+        shape = self.risk_table.shape
+        for codes, size, name in ((condition_index, shape[0], 'condition index'), (duration_code, shape[1], 'duration code'),
+                                  (pain_code, shape[2], 'pain code')):
+            if len(codes) and (codes.min() < 0 or codes.max() >= size):
+                raise IndexError(f"{name} outside 0..{size - 1}")
+        
+        # Row-major index by hand, np.ravel_multi_index is several times slower;
+        # capping at the table edge is exact, the modifiers are already capped there
+        index = condition_index
+        for codes, size in ((duration_code, shape[1]), (pain_code, shape[2]), (self.age_bands(age), shape[3]),
+                            (self.confidence_bands(confidence), shape[4]),
+                            (np.clip(comorbidity_count, 0, self.TABLE_MAX_COMORBIDITIES), shape[5]),
+                            (np.clip(symptom_weight, 0, self.TABLE_MAX_SYMPTOM_WEIGHT), shape[6])):
+            index = index * size + codes
+        entries = self.risk_table.ravel()[index]
+        risk_score = (entries & ~np.uint8(self.TABLE_EMERGENCY_BIT)).astype(np.int64)
+        urgency_code = self.risk_table_urgency[entries]
+        
+        # Only negative symptom weights or comorbidity counts fall outside
+        outside = np.flatnonzero((symptom_weight < 0) | (comorbidity_count < 0))
+        if len(outside):
+            age = np.asarray(age, dtype=np.float64)
+            risk_score[outside], urgency_code[outside] = self._score_batch(
+                condition_index[outside], duration_code[outside], pain_code[outside], age[outside],
+                symptom_weight[outside], comorbidity_count[outside], confidence[outside]
+            )
+        return risk_score, urgency_code
+    
+    def lookup_table_stats(self) -> Dict[str, Any]:
+        """Size and build time of the risk lookup table, if it is on"""
+        if self.risk_table is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'current': self._risk_table_built_from == self._profile_key(),
+            'shape': list(self.risk_table.shape),
+            'entries': int(self.risk_table.size),
+            'bytes': int(self.risk_table.nbytes),
+            'build_seconds': self.risk_table_seconds
+        }
+    
     def _calculate_age_modifier(self, processed_data: Dict[str, Any], risk_profile: Dict[str, Any]) -> float:
         """Calculate age-based risk modifier"""
-        age = processed_data.get('age')
-        if not age:
+        band = self.age_band(processed_data.get('age'))
+        if band == 0:
             return 0.0
         
         age_multiplier = risk_profile.get('age_multiplier', 0.5)
+        return self.AGE_BAND_FACTORS[band] * age_multiplier
+    
+    @staticmethod
+    def age_band(age: Optional[int]) -> int:
+        """Map an age to its risk band; 0 means unknown"""
+        if not age:
+            return 0
         
         if age < 2:
-            return 0.3 * age_multiplier  # Infants
+            return 1  # Infants
         elif age < 18:
-            return 0.1 * age_multiplier  # Children
+            return 2  # Children
         elif age < 65:
-            return 0.0 * age_multiplier  # Adults
+            return 3  # Adults
         elif age < 75:
-            return 0.2 * age_multiplier  # Seniors
+            return 4  # Seniors
         else:
-            return 0.4 * age_multiplier  # Elderly
+            return 5  # Elderly
+    
+    @classmethod
+    def age_bands(cls, age: np.ndarray) -> np.ndarray:
+        """age_band over an array; NaN and 0 mean unknown"""
+        age = np.asarray(age, dtype=np.float64)
+        bands = np.ones(age.shape, dtype=np.int8)
+        for edge in cls.AGE_BAND_EDGES:
+            bands += age >= edge
+        # NaN compares false both ways, like 0
+        return bands * ((age < 0) | (age > 0))
+    
+    @staticmethod
+    def confidence_bands(confidence: np.ndarray) -> np.ndarray:
+        """Index into CONFIDENCE_MODIFIERS; NaN falls between, like the scalar comparisons"""
+        confidence = np.asarray(confidence, dtype=np.float64)
+        return 1 - (confidence < 0.5) + (confidence > 0.8)
     
     def _calculate_duration_modifier(self, processed_data: Dict[str, Any], risk_profile: Dict[str, Any]) -> float:
         """Calculate duration-based risk modifier"""
         duration = processed_data.get('duration', '')
         duration_multiplier = risk_profile.get('duration_multiplier', 0.5)
         
-        duration_modifiers = {
-            'Less than 24 hours': 0.2,
-            '1-3 days': 0.1,
-            '4-7 days': 0.0,
-            '1-2 weeks': -0.1,
-            'More than 2 weeks': -0.2
-        }
-        
-        return duration_modifiers.get(duration, 0.0) * duration_multiplier
+        return self.DURATION_MODIFIERS.get(duration, 0.0) * duration_multiplier
     
     def _calculate_severity_modifier(self, processed_data: Dict[str, Any], risk_profile: Dict[str, Any]) -> float:
         """Calculate severity-based risk modifier"""
         pain_level = processed_data.get('pain_level', 'No pain (0/10)')
         severity_multiplier = risk_profile.get('severity_multiplier', 1.0)
         
-        severity_modifiers = {
-            'No pain (0/10)': 0.0,
-            'Mild pain (1-3/10)': 0.1,
-            'Moderate pain (4-6/10)': 0.2,
-            'Severe pain (7-8/10)': 0.4,
-            'Extreme pain (9-10/10)': 0.6
-        }
-        
-        return severity_modifiers.get(pain_level, 0.0) * severity_multiplier
+        return self.SEVERITY_MODIFIERS.get(pain_level, 0.0) * severity_multiplier
     
     def _calculate_symptom_modifier(self, processed_data: Dict[str, Any]) -> float:
         """Calculate symptom-based risk modifier"""
@@ -242,7 +650,7 @@ class RiskCalculator:
         
         total_symptom_risk = 0
         for symptom in additional_symptoms:
-            risk_weight = self.symptom_risk_weights.get(symptom, 2)
+            risk_weight = self.symptom_risk_weights.get(symptom, self.UNKNOWN_SYMPTOM_WEIGHT)
             total_symptom_risk += risk_weight
         
         # Normalize by dividing by 100 (max expected symptom risk)
@@ -256,19 +664,17 @@ class RiskCalculator:
         if not medical_history:
             return 0.0
         
-        # High-risk conditions
-        high_risk_conditions = [
-            'diabetes', 'heart disease', 'hypertension', 'copd', 
-            'asthma', 'cancer', 'kidney disease', 'liver disease'
-        ]
-        
-        risk_count = 0
-        for condition in medical_history:
-            if any(high_risk in condition.lower() for high_risk in high_risk_conditions):
-                risk_count += 1
-        
+        risk_count = self.comorbidity_count(medical_history)
         return min(0.4, risk_count * 0.1) * (comorbidity_multiplier - 1.0)
     
+    def comorbidity_count(self, medical_history: List[str]) -> int:
+        """Number of history entries that mention a high-risk condition"""
+        return self.comorbidity_matcher.match(medical_history).entries
+    
+    def comorbidity_categories(self, medical_history: List[str]) -> FrozenSet[str]:
+        """High-risk conditions mentioned anywhere in a history"""
+        return self.comorbidity_matcher.match(medical_history).categories
+    
     def _calculate_confidence_modifier(self, confidence: float) -> float:
         """Calculate confidence-based risk modifier"""
         if confidence < 0.5:
@@ -281,16 +687,13 @@ class RiskCalculator:
         """Determine urgency level based on risk score and specific indicators"""
         
         # Emergency conditions override risk score
-        emergency_conditions = ['Acute Chest Pain Syndrome', 'Acute Headache Syndrome']
-        emergency_symptoms = ['Chest pain', 'Extreme pain (9-10/10)', 'Shortness of breath']
-        
-        if condition in emergency_conditions:
+        if condition in self._emergency_conditions_set:
             return 'emergency'
         
         additional_symptoms = processed_data.get('additional_symptoms', [])
         pain_level = processed_data.get('pain_level', '')
         
-        if any(symptom in emergency_symptoms for symptom in additional_symptoms + [pain_level]):
+        if pain_level in self._emergency_symptoms_set or not self._emergency_symptoms_set.isdisjoint(additional_symptoms):
             return 'emergency'
         
         # Standard risk score thresholds
@@ -344,18 +747,17 @@ class RiskCalculator:
         
         # Symptom-related risks
         pain_level = processed_data.get('pain_level', '')
-        if 'Severe' in pain_level or 'Extreme' in pain_level:
+        if self.HIGH_PAIN_PATTERN.search(pain_level):
             risk_factors.append("High pain severity")
         
         additional_symptoms = processed_data.get('additional_symptoms', [])
-        high_risk_symptoms = ['Chest pain', 'Shortness of breath', 'Severe pain']
         for symptom in additional_symptoms:
-            if symptom in high_risk_symptoms:
+            if symptom in self.HIGH_RISK_SYMPTOMS:
                 risk_factors.append(f"Presence of {symptom.lower()}")
         
         # Duration risks
         duration = processed_data.get('duration', '')
-        if duration == 'Less than 24 hours' and condition in ['Acute Chest Pain Syndrome', 'Acute Headache Syndrome']:
+        if duration == 'Less than 24 hours' and condition in self._emergency_conditions_set:
             risk_factors.append("Acute onset of serious symptoms")
         
         # Medical history risks
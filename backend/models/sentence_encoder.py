@@ -0,0 +1,204 @@
+# models/sentence_encoder.py
+"""Sentence embeddings without PyTorch: an int8 ONNX export run by onnxruntime.
+
+export_onnx() converts a sentence-transformers model once: the transformer
+is exported to ONNX, its weights are quantized to int8 with dynamic
+quantization, and the fast tokenizer is saved next to it. It needs torch
+and sentence-transformers. OnnxSentenceEncoder only needs onnxruntime,
+tokenizers and numpy at serving time, and reproduces the model's mean
+pooling and normalization. The export is refused unless every sample
+sentence keeps a cosine similarity of at least min_cosine with the PyTorch
+embedding.
+
+Layout under the model directory:
+    
+    embeddings/<model>-int8/model.onnx      quantized transformer
+    embeddings/<model>-int8/tokenizer.json  fast tokenizer with truncation
+    embeddings/<model>-int8/encoder.json    pooling, parity and sizes
+"""
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 'torch' runs sentence-transformers, 'onnx' the quantized export
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+
+# onnxruntime intra-op threads; similarity lookups are one short sentence
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', '1'))
+
+EMBEDDINGS_DIR = "embeddings"
+CONFIG_FILE = "encoder.json"
+MODEL_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+def onnx_model_dir(model_dir: Path, model_name: str) -> Path:
+    """Where the quantized export of a sentence model is kept"""
+    return Path(model_dir) / EMBEDDINGS_DIR / f"{Path(model_name).name}-int8"
+
+class OnnxSentenceEncoder:
+    """Drop-in for SentenceTransformer.encode() on a quantized ONNX export"""
+    
+    def __init__(self, directory: Path, threads: int = EMBEDDING_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        
+        self.directory = Path(directory)
+        with open(self.directory / CONFIG_FILE) as f:
+            self.config = json.load(f)
+        
+        self.tokenizer = Tokenizer.from_file(str(self.directory / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+        
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(self.directory / MODEL_FILE), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+    
+    @property
+    def model_name(self) -> str:
+        return self.config['model_name']
+    
+    def encode(self, sentences: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embeddings as a (len(sentences), dimensions) float32 array"""
+        sentences = list(sentences)
+        embeddings = np.zeros((len(sentences), self.config['dimensions']), dtype=np.float32)
+        # Sort by length so each batch pads to similar lengths, as sentence-transformers does
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        for start in range(0, len(sentences), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([sentences[i] for i in batch])
+        return embeddings
+    
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        inputs = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        token_embeddings = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        
+        # Mean over real tokens, then unit length if the model normalizes
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config['normalize']:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+def export_onnx(model_name: str, directory: Path, sentences: List[str], min_cosine: float = 0.99,
+                opset: int = 17) -> Dict[str, Any]:
+    """Export, quantize and check a sentence-transformers model; returns the encoder config.
+    
+    The export is written to a temporary directory and renamed into place,
+    so a failed parity check leaves the previous export untouched.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    
+    reference = SentenceTransformer(model_name, device='cpu')
+    transformer, pooling = reference[0], reference[1]
+    pooling_mode = pooling.get_pooling_mode_str() if hasattr(pooling, 'get_pooling_mode_str') else pooling.pooling_mode
+    if pooling_mode != 'mean':
+        raise ValueError(f"Only mean pooling is supported, {model_name} uses {pooling_mode}")
+    tokenizer = transformer.tokenizer
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in tokenizer.model_input_names]
+    
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model: Any):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+    
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    temp_dir = directory.parent / f".tmp-{uuid.uuid4().hex}"
+    temp_dir.mkdir()
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            float_path = Path(scratch) / MODEL_FILE
+            sample = tokenizer(["a sample sentence to trace the model"], return_tensors='pt')
+            export_options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+            with torch.no_grad():
+                torch.onnx.export(
+                    TokenEmbeddings(transformer.auto_model.eval()),
+                    tuple(sample[name] for name in input_names),
+                    str(float_path),
+                    input_names=input_names,
+                    output_names=['token_embeddings'],
+                    dynamic_axes={
+                        **{name: {0: 'batch', 1: 'sequence'} for name in input_names},
+                        'token_embeddings': {0: 'batch', 1: 'sequence'}
+                    },
+                    opset_version=opset,
+                    **export_options
+                )
+            quantize_dynamic(str(float_path), str(temp_dir / MODEL_FILE), weight_type=QuantType.QInt8)
+            float_bytes = float_path.stat().st_size
+        
+        tokenizer.backend_tokenizer.save(str(temp_dir / TOKENIZER_FILE))
+        config = {
+            'model_name': model_name,
+            'max_seq_length': reference.max_seq_length,
+            'dimensions': int(_embedding_dimension(reference)),
+            'normalize': any(type(module).__name__ == 'Normalize' for module in reference),
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+            'quantization': 'dynamic int8 weights',
+            'float_bytes': float_bytes,
+            'quantized_bytes': (temp_dir / MODEL_FILE).stat().st_size
+        }
+        with open(temp_dir / CONFIG_FILE, 'w') as f:
+            json.dump(config, f, indent=2)
+        
+        # Compare against the PyTorch embeddings before publishing
+        started = time.perf_counter()
+        expected = reference.encode(sentences, convert_to_numpy=True)
+        actual = OnnxSentenceEncoder(temp_dir).encode(sentences)
+        cosines = _row_cosines(expected, actual)
+        config['parity'] = {
+            'sentences': len(sentences),
+            'min_cosine': float(cosines.min()),
+            'mean_cosine': float(cosines.mean()),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        if cosines.min() < min_cosine:
+            raise ValueError(f"Quantized encoder cosine {cosines.min():.4f} is below {min_cosine}")
+        with open(temp_dir / CONFIG_FILE, 'w') as f:
+            json.dump(config, f, indent=2)
+        
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temp_dir, directory)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    
+    logger.info(f"Exported {model_name} to {directory} ({config['quantized_bytes'] / 2**20:.1f} MB)")
+    return config
+
+def _embedding_dimension(model: Any) -> int:
+    # Newer sentence-transformers releases renamed the method
+    method = getattr(model, 'get_embedding_dimension', None) or model.get_sentence_embedding_dimension
+    return method()
+
+def _row_cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
@@ -1,64 +1,144 @@
 # models/symptom_analyzer.py
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
-from sentence_transformers import SentenceTransformer
-import pickle
 import joblib
 import json
+import hashlib
 import uuid
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Optional
 import logging
+import os
 import asyncio
+import threading
 from pathlib import Path
 
+from models.cascade import CASCADE_THRESHOLD, DistilledTree
+from models.condition_index import ConditionEmbeddingIndex
+from models.feature_plan import FeaturePlan
+from models.model_bundle import ModelBundle, BundleError, LazyComponent
+from models.sentence_encoder import EMBEDDING_BACKEND, OnnxSentenceEncoder, onnx_model_dir
+from models.tree_engine import CompiledTreeEnsemble
+from models.tree_explainer import TreePathExplainer
+
 logger = logging.getLogger(__name__)
 
+# 'compiled' evaluates the boosted trees with CompiledTreeEnsemble, 'sklearn' with predict_proba
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'compiled').lower()
+
+# Conditions ranked in each analysis' differential; requests may ask for fewer
+DIFFERENTIAL_TOP_K = int(os.getenv('DIFFERENTIAL_TOP_K', '5'))
+
 class SymptomAnalyzer:
+    # Ordinal encodings shared by training and inference
+    DURATION_CODES = {
+        'Less than 24 hours': 0, '1-3 days': 1, '4-7 days': 2,
+        '1-2 weeks': 3, 'More than 2 weeks': 4
+    }
+    PAIN_SCORES = {
+        'No pain (0/10)': 0, 'Mild pain (1-3/10)': 2, 'Moderate pain (4-6/10)': 5,
+        'Severe pain (7-8/10)': 7.5, 'Extreme pain (9-10/10)': 9.5
+    }
+    
+    # Separate artifact files written before model bundles; migrated on first load
+    MODEL_FILES = [
+        "primary_model.pkl",
+        "vectorizer.pkl",
+        "encoder.pkl",
+        "scaler.pkl",
+        "condition_mappings.json"
+    ]
+    
+    # Order of the scaled columns after the TF-IDF block
+    NUMERIC_FEATURES = ['duration_code', 'pain_score', 'additional_symptom_count']
+    
+    # A hub name or a local sentence-transformers directory
+    SENTENCE_MODEL_NAME = os.getenv('SENTENCE_MODEL', 'all-MiniLM-L6-v2')
+    
+    # /conditions/similar returns at most this many matches above the threshold
+    SIMILAR_CONDITIONS_LIMIT = 5
+    SIMILARITY_THRESHOLD = 0.3
+    
     def __init__(self):
-        self.primary_model = None
+        self._primary_model = None
+        self._model_loader = None
+        self.model_bundle = None
+        self.inference_engine = None
+        self.explainer = None
+        # Distilled first tier; rows below cascade_threshold escalate to the full model
+        self.cascade = None
+        self.cascade_threshold = CASCADE_THRESHOLD
+        # Model references served before the last swap, for rollback
+        self.previous_model = None
+        self._swap_lock = threading.Lock()
+        self.feature_plan = None
         self.text_vectorizer = None
         self.symptom_encoder = None
         self.scaler = None
         self.sentence_model = None
+        self._sentence_model_attempted = False
+        self._sentence_model_lock = threading.Lock()
+        self.condition_index = None
+        self._condition_index_lock = threading.Lock()
         self.condition_mappings = {}
+        # Condition name of each probability column
+        self.condition_labels = np.array([], dtype=object)
+        # Name of each feature column: TF-IDF terms, then NUMERIC_FEATURES
+        self.feature_names = np.array([], dtype=object)
         self.symptom_database = {}
+        self.model_version = None
         self.model_path = Path("models/trained_models")
         self.model_path.mkdir(parents=True, exist_ok=True)
         
     async def load_models(self):
-        """Load pre-trained models or train new ones if not available"""
+        """Load the trained models; they are built offline with train_model.py"""
+        self.load_models_sync()
+    
+    @property
+    def primary_model(self) -> Any:
+        """The sklearn model; with a bundle it is only read from disk on first use"""
+        if self._primary_model is None and self._model_loader is not None:
+            return self._model_loader()
+        return self._primary_model
+    
+    @primary_model.setter
+    def primary_model(self, model: Any):
+        self._primary_model = model
+    
+    def load_models_sync(self):
+        """Synchronous core of load_models, safe to run in a worker thread"""
+        bundle = None
         try:
-            # Try to load existing models
-            if self._models_exist():
-                await self._load_existing_models()
-                logger.info("Loaded existing models")
-            else:
-                # Train new models with sample data
-                await self._create_and_train_models()
-                logger.info("Created and trained new models")
-                
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
-            # Fallback to creating new models
-            await self._create_and_train_models()
+            bundle = ModelBundle.load_current(self.model_path)
+        except BundleError as e:
+            logger.error(f"Ignoring model bundle: {e}")
+        
+        if bundle is not None:
+            self._load_bundle(bundle)
+            logger.info(f"Loaded model bundle {self.model_version}")
+        elif self._models_exist():
+            self._load_existing_models()
+            logger.info("Loaded existing models")
+            self._migrate_to_bundle()
+        else:
+            # Training is too slow for startup; the service stays unready instead
+            raise BundleError(
+                f"No trained model in {self.model_path}, build one with 'python train_model.py'"
+            )
     
     def _models_exist(self) -> bool:
         """Check if trained models exist"""
-        required_files = [
-            "primary_model.pkl",
-            "vectorizer.pkl",
-            "encoder.pkl",
-            "scaler.pkl",
-            "condition_mappings.json"
-        ]
-        return all((self.model_path / file).exists() for file in required_files)
+        return all((self.model_path / file).exists() for file in self.MODEL_FILES)
     
-    async def _load_existing_models(self):
+    def _compute_model_version(self) -> str:
+        """Fingerprint the model artifacts so caches can detect a model change"""
+        digest = hashlib.sha256()
+        for file in self.MODEL_FILES:
+            digest.update((self.model_path / file).read_bytes())
+        return digest.hexdigest()[:16]
+    
+    def _load_existing_models(self):
         """Load existing trained models"""
         self.primary_model = joblib.load(self.model_path / "primary_model.pkl")
         self.text_vectorizer = joblib.load(self.model_path / "vectorizer.pkl")
@@ -67,169 +147,261 @@ class SymptomAnalyzer:
         
         with open(self.model_path / "condition_mappings.json", 'r') as f:
             self.condition_mappings = json.load(f)
-            
-        # Load sentence transformer for semantic similarity
+        
+        self.model_version = self._compute_model_version()
+        self._build_condition_labels()
+        self._build_feature_plan()
+        self.inference_engine = self._compile_engine(None, lambda: self.primary_model)
+        self.explainer = self._build_explainer(self.inference_engine, lambda: self.primary_model)
+        self._load_condition_index()
+    
+    def _load_bundle(self, bundle: ModelBundle):
+        """Load a model bundle; the primary model itself is read lazily"""
+        manifest = bundle.manifest
+        self._check_feature_schema(manifest.get('feature_schema', {}))
+        
+        self.text_vectorizer = bundle.load_component('vectorizer')
+        self.symptom_encoder = bundle.load_component('encoder')
+        self.scaler = bundle.load_component('scaler')
+        self.condition_mappings = dict(manifest['condition_mappings'])
+        
+        self._build_condition_labels()
+        self._build_feature_plan()
+        self._set_model_state(self._model_state(bundle))
+        self._load_condition_index()
+    
+    def _model_state(self, bundle: ModelBundle) -> Dict[str, Any]:
+        """Everything that changes with the model, loaded and ready to swap in"""
+        loader = LazyComponent(bundle, 'primary_model')
+        engine = self._compile_engine(bundle, loader)
+        if engine is None:
+            # sklearn inference needs the model for every request
+            loader()
+        return {
+            'bundle': bundle, 'version': bundle.version, 'inference_engine': engine,
+            'explainer': self._build_explainer(engine, loader), 'cascade': self._load_cascade(bundle),
+            'model_loader': loader, 'primary_model': None
+        }
+    
+    def _current_model_state(self) -> Dict[str, Any]:
+        return {
+            'bundle': self.model_bundle, 'version': self.model_version, 'inference_engine': self.inference_engine,
+            'explainer': self.explainer, 'cascade': self.cascade,
+            'model_loader': self._model_loader, 'primary_model': self._primary_model
+        }
+    
+    def _set_model_state(self, state: Dict[str, Any]):
+        """Point the analyzer at another model; each assignment is atomic.
+        
+        _predict reads the engine (or the model) once per call, and a compiled
+        engine carries its own model reference, so a request in flight runs on
+        either the old model or the new one. primary_model never reads None
+        in between because the non-empty reference is assigned first.
+        """
+        self.inference_engine = state['inference_engine']
+        self.explainer = state['explainer']
+        self.cascade = state['cascade']
+        if state['primary_model'] is not None:
+            self._primary_model = state['primary_model']
+            self._model_loader = state['model_loader']
+        else:
+            self._model_loader = state['model_loader']
+            self._primary_model = None
+        self.model_bundle = state['bundle']
+        self.model_version = state['version']
+    
+    def swap_bundle(self, bundle: ModelBundle) -> bool:
+        """Serve another bundle's model without a restart.
+        
+        The new model is fully loaded before any reference changes. Only the
+        model is swapped, so the bundle must encode features and conditions
+        exactly like the loaded one; otherwise it is refused and needs a
+        restart. The replaced model is kept for rollback().
+        """
+        if bundle.version == self.model_version:
+            return True
+        
+        self._check_feature_schema(bundle.manifest.get('feature_schema', {}))
+        plan = FeaturePlan(
+            bundle.load_component('vectorizer'), bundle.load_component('scaler'), self.DURATION_CODES, self.PAIN_SCORES
+        )
+        if not plan.matches(self.feature_plan) or dict(bundle.manifest['condition_mappings']) != self.condition_mappings:
+            logger.warning(f"Bundle {bundle.version} changes the features or conditions, restart to load it")
+            return False
+        
+        state = self._model_state(bundle)
+        with self._swap_lock:
+            self.previous_model = self._current_model_state()
+            self._set_model_state(state)
+        logger.info(f"Swapped model {self.previous_model['version']} for {bundle.version}")
+        return True
+    
+    def rollback(self) -> Optional[str]:
+        """Swap back to the model served before the last swap; returns its version"""
+        with self._swap_lock:
+            if self.previous_model is None:
+                return None
+            state = self.previous_model
+            self.previous_model = self._current_model_state()
+            self._set_model_state(state)
+        logger.info(f"Rolled back model {self.previous_model['version']} to {state['version']}")
+        return state['version']
+    
+    def _migrate_to_bundle(self):
+        """Rewrite separately saved artifacts as a bundle so later starts load it"""
         try:
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self._save_models()
+            self.model_version = self.model_bundle.version
         except Exception as e:
-            logger.warning(f"Could not load sentence transformer: {e}")
+            logger.warning(f"Could not migrate model artifacts to a bundle: {e}")
     
-    async def _create_and_train_models(self):
-        """Create and train models with comprehensive medical data"""
-        logger.info("Creating training dataset...")
-        
-        # Create comprehensive training data
-        training_data = self._create_comprehensive_training_data()
-        
-        # Prepare features and targets
-        X, y = self._prepare_training_data(training_data)
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
+    def _feature_schema(self) -> Dict[str, Any]:
+        """Layout and encodings of the feature matrix the model was trained on"""
+        text_features = len(self.text_vectorizer.vocabulary_)
+        return {
+            'n_features': text_features + len(self.NUMERIC_FEATURES),
+            'text': {'vectorizer': type(self.text_vectorizer).__name__, 'n_features': text_features},
+            'numeric': self.NUMERIC_FEATURES,
+            'duration_codes': self.DURATION_CODES,
+            'pain_scores': self.PAIN_SCORES
+        }
+    
+    def _check_feature_schema(self, schema: Dict[str, Any]):
+        """Refuse bundles whose encodings differ from the ones this code produces"""
+        if (schema.get('numeric') != self.NUMERIC_FEATURES
+                or schema.get('duration_codes') != self.DURATION_CODES
+                or schema.get('pain_scores') != self.PAIN_SCORES):
+            raise BundleError("Bundle feature schema does not match the analyzer's feature encodings")
+    
+    def _load_condition_index(self):
+        """Reuse persisted condition embeddings; otherwise they are built on first use"""
+        self.condition_index = ConditionEmbeddingIndex.load(
+            self.model_path, list(self.condition_mappings), self._embedding_model_id()
         )
-        
-        # Train models
-        logger.info("Training models...")
-        self.primary_model = GradientBoostingClassifier(
-            n_estimators=200,
-            learning_rate=0.1,
-            max_depth=6,
-            random_state=42
+    
+    def _embedding_model_id(self) -> str:
+        """Names the embeddings in the persisted index; each backend keeps its own"""
+        if EMBEDDING_BACKEND == 'onnx':
+            return f"{self.SENTENCE_MODEL_NAME}:onnx-int8"
+        return self.SENTENCE_MODEL_NAME
+    
+    def get_condition_index(self) -> Any:
+        """Return the condition embedding index, building and persisting it if needed"""
+        if self.condition_index is None:
+            with self._condition_index_lock:
+                if self.condition_index is None:
+                    sentence_model = self.get_sentence_model()
+                    if not sentence_model:
+                        return None
+                    index = ConditionEmbeddingIndex.build(
+                        sentence_model, list(self.condition_mappings), self._embedding_model_id()
+                    )
+                    try:
+                        index.save(self.model_path)
+                    except Exception as e:
+                        logger.warning(f"Could not persist condition embeddings: {e}")
+                    self.condition_index = index
+        return self.condition_index
+    
+    def _build_condition_labels(self):
+        """Index-to-name array so a prediction's labels are one fancy index"""
+        labels = np.full(len(self.condition_mappings), "Unknown Condition", dtype=object)
+        for condition, index in self.condition_mappings.items():
+            if 0 <= index < len(labels):
+                labels[index] = condition
+        self.condition_labels = labels
+    
+    def _build_feature_plan(self):
+        """Precompute feature extraction; None keeps the vectorizer/scaler path"""
+        self.feature_names = np.array(
+            list(self.text_vectorizer.get_feature_names_out()) + self.NUMERIC_FEATURES, dtype=object
         )
-        self.primary_model.fit(X_train, y_train)
-        
-        # Evaluate model
-        y_pred = self.primary_model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        logger.info(f"Model accuracy: {accuracy:.3f}")
-        
-        # Save models
-        await self._save_models()
-        
-        # Load sentence transformer
+        self.feature_plan = None
         try:
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.feature_plan = FeaturePlan(self.text_vectorizer, self.scaler, self.DURATION_CODES, self.PAIN_SCORES)
         except Exception as e:
-            logger.warning(f"Could not load sentence transformer: {e}")
-    
-    def _create_comprehensive_training_data(self) -> pd.DataFrame:
-        """Create comprehensive training data with medical conditions and symptoms"""
-        
-        # Comprehensive medical conditions with symptoms
-        medical_data = [
-            # Respiratory conditions
-            {
-                'primary_concern': 'persistent cough with fever',
-                'duration': '1-3 days',
-                'pain_level': 'Mild pain (1-3/10)',
-                'additional_symptoms': ['Fever', 'Fatigue', 'Headache'],
-                'condition': 'Upper Respiratory Infection',
-                'severity': 'moderate'
-            },
-            {
-                'primary_concern': 'severe chest pain and shortness of breath',
-                'duration': 'Less than 24 hours',
-                'pain_level': 'Severe pain (7-8/10)',
-                'additional_symptoms': ['Chest pain', 'Shortness of breath', 'Dizziness'],
-                'condition': 'Acute Chest Pain Syndrome',
-                'severity': 'high'
-            },
-            
-            # Gastrointestinal conditions
-            {
-                'primary_concern': 'severe stomach pain and nausea',
-                'duration': '4-7 days',
-                'pain_level': 'Severe pain (7-8/10)',
-                'additional_symptoms': ['Nausea', 'Abdominal pain', 'Fever'],
-                'condition': 'Gastroenteritis',
-                'severity': 'moderate'
-            },
-            {
-                'primary_concern': 'chronic abdominal discomfort',
-                'duration': 'More than 2 weeks',
-                'pain_level': 'Moderate pain (4-6/10)',
-                'additional_symptoms': ['Abdominal pain', 'Fatigue'],
-                'condition': 'Irritable Bowel Syndrome',
-                'severity': 'low'
-            },
-            
-            # Neurological conditions
-            {
-                'primary_concern': 'severe headache with sensitivity to light',
-                'duration': '1-2 weeks',
-                'pain_level': 'Severe pain (7-8/10)',
-                'additional_symptoms': ['Headache', 'Nausea', 'Dizziness'],
-                'condition': 'Migraine',
-                'severity': 'moderate'
-            },
-            {
-                'primary_concern': 'sudden severe headache',
-                'duration': 'Less than 24 hours',
-                'pain_level': 'Extreme pain (9-10/10)',
-                'additional_symptoms': ['Headache', 'Nausea', 'Dizziness'],
-                'condition': 'Acute Headache Syndrome',
-                'severity': 'high'
-            },
-            
-            # Cardiovascular conditions
-            {
-                'primary_concern': 'chest tightness with exercise',
-                'duration': '1-2 weeks',
-                'pain_level': 'Moderate pain (4-6/10)',
-                'additional_symptoms': ['Chest pain', 'Shortness of breath', 'Fatigue'],
-                'condition': 'Angina',
-                'severity': 'moderate'
-            },
-            
-            # Infectious diseases
-            {
-                'primary_concern': 'high fever with body aches',
-                'duration': '1-3 days',
-                'pain_level': 'Moderate pain (4-6/10)',
-                'additional_symptoms': ['Fever', 'Headache', 'Fatigue'],
-                'condition': 'Viral Syndrome',
-                'severity': 'moderate'
-            },
-            
-            # Musculoskeletal conditions
-            {
-                'primary_concern': 'joint pain and stiffness',
-                'duration': 'More than 2 weeks',
-                'pain_level': 'Moderate pain (4-6/10)',
-                'additional_symptoms': ['Fatigue'],
-                'condition': 'Arthritis',
-                'severity': 'low'
-            },
-            
-            # Add more variations and conditions
-            {
-                'primary_concern': 'difficulty breathing at night',
-                'duration': '4-7 days',
-                'pain_level': 'Mild pain (1-3/10)',
-                'additional_symptoms': ['Shortness of breath', 'Fatigue'],
-                'condition': 'Asthma Exacerbation',
-                'severity': 'moderate'
-            }
-        ]
-        
-        # Generate more variations
-        base_conditions = len(medical_data)
-        for i in range(base_conditions):
-            original = medical_data[i].copy()
-            
-            # Create variations with different symptom combinations
-            variations = [
-                {**original, 'duration': '1-2 weeks', 'additional_symptoms': original['additional_symptoms'][:2]},
-                {**original, 'pain_level': 'Mild pain (1-3/10)', 'additional_symptoms': original['additional_symptoms'] + ['Dizziness']},
-                {**original, 'duration': 'More than 2 weeks', 'severity': 'low' if original['severity'] != 'low' else 'moderate'}
-            ]
-            medical_data.extend(variations)
-        
-        return pd.DataFrame(medical_data)
+            logger.warning(f"Could not build feature plan, using vectorizer transform: {e}")
+    
+    def _compile_engine(self, bundle: Optional[ModelBundle], model: Callable[[], Any]) -> Optional[CompiledTreeEnsemble]:
+        """Compile the primary model for inference; None keeps the sklearn path"""
+        if INFERENCE_BACKEND != 'compiled':
+            return None
+        try:
+            if bundle is not None and 'tree_engine' in bundle.manifest.get('arrays', {}):
+                # Mapped from the bundle, so the sklearn model is not needed to start.
+                # Bundles from before the histogram trainer only record the shape.
+                return CompiledTreeEnsemble.from_arrays(
+                    bundle.load_arrays('tree_engine'), reference=model, **bundle.manifest['tree_engine']
+                )
+            return CompiledTreeEnsemble(model())
+        except Exception as e:
+            logger.warning(f"Could not compile primary model, using sklearn inference: {e}")
+            return None
     
-    def _prepare_training_data(self, data: pd.DataFrame) -> tuple:
-        """Prepare features and targets for training"""
+    def _build_explainer(self, engine: Optional[CompiledTreeEnsemble], model: Callable[[], Any]) -> Optional[TreePathExplainer]:
+        """Cache tree path contributions for the model; None if it is not a boosted ensemble"""
+        try:
+            if engine is None or engine.weight is None:
+                # INFERENCE_BACKEND=sklearn, or a bundle written before node weights were saved
+                engine = CompiledTreeEnsemble(model())
+            return TreePathExplainer(engine)
+        except Exception as e:
+            logger.warning(f"Could not build tree path explainer, using generic contributors: {e}")
+            return None
+    
+    def _load_cascade(self, bundle: ModelBundle) -> Optional[DistilledTree]:
+        """Map the bundle's distilled model; bundles without one always use the full model"""
+        if 'cascade' not in bundle.manifest.get('arrays', {}):
+            return None
+        try:
+            settings = bundle.manifest['cascade']
+            return DistilledTree.from_arrays(
+                bundle.load_arrays('cascade'), settings['n_features'], settings['max_depth']
+            )
+        except Exception as e:
+            logger.warning(f"Could not load distilled model, using the full model only: {e}")
+            return None
+    
+    def cascade_stats(self) -> Dict[str, Any]:
+        """Threshold and the held-out escalation rate and agreement it gives"""
+        cascade = self.cascade
+        if cascade is None:
+            return {'enabled': False, 'threshold': self.cascade_threshold}
+        return {
+            'enabled': self.cascade_threshold < 1,
+            'threshold': self.cascade_threshold,
+            'expected': cascade.expected(self.cascade_threshold),
+            'nodes': len(cascade.feature),
+            'max_depth': cascade.max_depth
+        }
+    
+    def get_sentence_model(self) -> Any:
+        """Load the sentence encoder on first use; None if unavailable"""
+        if not self._sentence_model_attempted:
+            with self._sentence_model_lock:
+                if not self._sentence_model_attempted:
+                    if EMBEDDING_BACKEND == 'onnx':
+                        # Falling back is safe for the index: the export passed a cosine parity check
+                        try:
+                            self.sentence_model = OnnxSentenceEncoder(
+                                onnx_model_dir(self.model_path, self.SENTENCE_MODEL_NAME)
+                            )
+                            logger.info(f"Loaded quantized ONNX encoder for {self.SENTENCE_MODEL_NAME}")
+                        except Exception as e:
+                            logger.warning(f"Could not load ONNX sentence encoder, using sentence-transformers: {e}")
+                    if self.sentence_model is None:
+                        try:
+                            # Imported here so startup does not pay for torch
+                            from sentence_transformers import SentenceTransformer
+                            self.sentence_model = SentenceTransformer(self.SENTENCE_MODEL_NAME)
+                            logger.info(f"Loaded sentence transformer {self.SENTENCE_MODEL_NAME}")
+                        except Exception as e:
+                            logger.warning(f"Could not load sentence transformer: {e}")
+                    self._sentence_model_attempted = True
+        return self.sentence_model
+    
+    def fit_features(self, data: pd.DataFrame) -> tuple:
+        """Fit the feature transformers and condition mappings to training data; returns (X, y)"""
         
         # Initialize encoders and vectorizers
         self.text_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
@@ -240,18 +412,10 @@ class SymptomAnalyzer:
         text_features = self.text_vectorizer.fit_transform(data['primary_concern']).toarray()
         
         # Duration encoding
-        duration_map = {
-            'Less than 24 hours': 0, '1-3 days': 1, '4-7 days': 2, 
-            '1-2 weeks': 3, 'More than 2 weeks': 4
-        }
-        duration_features = data['duration'].map(duration_map).values.reshape(-1, 1)
+        duration_features = data['duration'].map(self.DURATION_CODES).values.reshape(-1, 1)
         
         # Pain level encoding
-        pain_map = {
-            'No pain (0/10)': 0, 'Mild pain (1-3/10)': 2, 'Moderate pain (4-6/10)': 5,
-            'Severe pain (7-8/10)': 7.5, 'Extreme pain (9-10/10)': 9.5
-        }
-        pain_features = data['pain_level'].fillna('No pain (0/10)').map(pain_map).values.reshape(-1, 1)
+        pain_features = data['pain_level'].fillna('No pain (0/10)').map(self.PAIN_SCORES).values.reshape(-1, 1)
         
         # Additional symptoms count
         symptom_count = data['additional_symptoms'].apply(len).values.reshape(-1, 1)
@@ -268,140 +432,295 @@ class SymptomAnalyzer:
         
         return X, y
     
-    async def _save_models(self):
-        """Save trained models to disk"""
-        joblib.dump(self.primary_model, self.model_path / "primary_model.pkl")
-        joblib.dump(self.text_vectorizer, self.model_path / "vectorizer.pkl")
-        joblib.dump(self.symptom_encoder, self.model_path / "encoder.pkl")
-        joblib.dump(self.scaler, self.model_path / "scaler.pkl")
-        
-        with open(self.model_path / "condition_mappings.json", 'w') as f:
-            json.dump(self.condition_mappings, f)
+    def _save_models(self, training: Optional[Dict[str, Any]] = None, activate: bool = True):
+        """Save trained models as one atomically written bundle"""
+        self.model_bundle = self._write_bundle(self.primary_model, training, activate, cascade=self.cascade)
+    
+    def _write_bundle(self, model: Any, training: Optional[Dict[str, Any]] = None, activate: bool = True,
+                      arrays: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+                      cascade: Optional[DistilledTree] = None) -> ModelBundle:
+        """Write model with the loaded transformers as a bundle, leaving the served model alone"""
+        arrays = dict(arrays or {})
+        metadata = {
+            'model': {'type': type(model).__name__, 'classes': np.asarray(model.classes_).tolist()},
+            'condition_mappings': self.condition_mappings,
+            'feature_schema': self._feature_schema(),
+            'training': training or {}
+        }
+        try:
+            engine = CompiledTreeEnsemble(model)
+            arrays['tree_engine'] = engine.to_arrays()
+            metadata['tree_engine'] = engine.metadata()
+        except Exception as e:
+            logger.warning(f"Saving bundle without compiled trees: {e}")
+        if cascade is not None:
+            arrays['cascade'] = cascade.to_arrays()
+            metadata['cascade'] = cascade.metadata()
+        
+        return ModelBundle.write(
+            self.model_path,
+            components={
+                'primary_model': model,
+                'vectorizer': self.text_vectorizer,
+                'encoder': self.symptom_encoder,
+                'scaler': self.scaler
+            },
+            arrays=arrays,
+            metadata=metadata,
+            activate=activate
+        )
+    
+    async def analyze(self, processed_data: Dict[str, Any], top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze symptoms and predict condition with a ranked differential of top_k conditions"""
+        return self.analyze_sync(processed_data, top_k)
     
-    async def analyze(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze symptoms and predict condition"""
+    def analyze_sync(self, processed_data: Dict[str, Any], top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Synchronous core of analyze, safe to run in a worker"""
         try:
             # Extract features
             features = self._extract_features(processed_data)
             
             # Get predictions
-            probabilities = self.primary_model.predict_proba(features)[0]
-            predicted_class = self.primary_model.predict(features)[0]
+            probabilities, _, escalated = self._predict_cascade(features)
+            top_indices, top_probabilities = self.top_conditions(probabilities, top_k)
+            contributions = self._explain(features, top_indices[:, 0], escalated)
             
-            # Get condition name
-            reverse_mappings = {v: k for k, v in self.condition_mappings.items()}
-            primary_condition = reverse_mappings.get(predicted_class, "Unknown Condition")
-            
-            # Calculate confidence
-            confidence = float(np.max(probabilities))
-            
-            # Generate contributors
-            contributors = self._generate_contributors(processed_data, probabilities)
-            
-            analysis_id = str(uuid.uuid4())
-            
-            return {
-                'primary_condition': primary_condition,
-                'confidence': confidence,
-                'contributors': contributors,
-                'analysis_id': analysis_id,
-                'probabilities': probabilities.tolist(),
-                'all_conditions': [reverse_mappings.get(i, f"Condition_{i}") for i in range(len(probabilities))]
-            }
+            return self._build_analysis(
+                processed_data, top_indices[0], top_probabilities[0],
+                features[0], None if contributions is None else contributions[0], escalated[0]
+            )
             
         except Exception as e:
             logger.error(f"Error in analysis: {e}")
             # Return fallback analysis
-            return {
-                'primary_condition': self._get_fallback_condition(processed_data),
-                'confidence': 0.5,
-                'contributors': self._generate_fallback_contributors(processed_data),
-                'analysis_id': str(uuid.uuid4()),
-                'probabilities': [],
-                'all_conditions': []
-            }
+            return self._build_fallback_analysis(processed_data)
     
-    def _extract_features(self, processed_data: Dict[str, Any]) -> np.ndarray:
-        """Extract features from processed data"""
-        # Text features
-        text_features = self.text_vectorizer.transform([processed_data['primary_concern']]).toarray()
+    async def analyze_many(self, processed_items: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Analyze a batch of processed inputs with a single model call"""
+        return self.analyze_many_sync(processed_items, top_k)
+    
+    def analyze_many_sync(self, processed_items: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Synchronous core of analyze_many"""
+        if not processed_items:
+            return []
         
-        # Duration features
-        duration_map = {
-            'Less than 24 hours': 0, '1-3 days': 1, '4-7 days': 2,
-            '1-2 weeks': 3, 'More than 2 weeks': 4
-        }
-        duration_val = duration_map.get(processed_data['duration'], 2)
+        try:
+            # One vectorizer/scaler pass builds the whole feature matrix
+            features = self._extract_features_many(processed_items)
+        except Exception as e:
+            logger.error(f"Error in batch analysis: {e}")
+            return [self._build_fallback_analysis(processed_data) for processed_data in processed_items]
         
-        # Pain features
-        pain_map = {
-            'No pain (0/10)': 0, 'Mild pain (1-3/10)': 2, 'Moderate pain (4-6/10)': 5,
-            'Severe pain (7-8/10)': 7.5, 'Extreme pain (9-10/10)': 9.5
+        return self.analyze_features_sync(processed_items, features, top_k)
+    
+    def analyze_features_sync(self, processed_items: List[Dict[str, Any]], features: np.ndarray,
+                              top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Analyze processed inputs whose feature rows are already stacked"""
+        try:
+            probabilities, _, escalated = self._predict_cascade(features)
+            top_indices, top_probabilities = self.top_conditions(probabilities, top_k)
+            contributions = self._explain(features, top_indices[:, 0], escalated)
+            
+        except Exception as e:
+            logger.error(f"Error in batch analysis: {e}")
+            return [self._build_fallback_analysis(processed_data) for processed_data in processed_items]
+        
+        if contributions is None:
+            contributions = [None] * len(processed_items)
+        analyses = []
+        for processed_data, indices, top_row, feature_row, contribution_row, row_escalated in zip(
+            processed_items, top_indices, top_probabilities, features, contributions, escalated
+        ):
+            try:
+                analyses.append(self._build_analysis(
+                    processed_data, indices, top_row, feature_row, contribution_row, row_escalated
+                ))
+            except Exception as e:
+                logger.error(f"Error in analysis: {e}")
+                analyses.append(self._build_fallback_analysis(processed_data))
+        
+        return analyses
+    
+    def _predict(self, features: np.ndarray) -> tuple:
+        """Class probabilities and predicted classes for a feature matrix"""
+        # Read each reference once so a concurrent model swap cannot mix two models
+        engine = self.inference_engine
+        if engine is not None:
+            return engine.predict(features)
+        # predict() is the argmax of predict_proba, so one call covers both
+        model = self.primary_model
+        probabilities = model.predict_proba(features)
+        return probabilities, model.classes_[np.argmax(probabilities, axis=1)]
+    
+    def _predict_cascade(self, features: np.ndarray) -> tuple:
+        """Like _predict, answering from the distilled model where it is confident.
+        
+        Returns probabilities, predicted classes and which rows escalated to
+        the full model.
+        """
+        cascade, threshold = self.cascade, self.cascade_threshold
+        if cascade is None or threshold >= 1:
+            probabilities, predicted_classes = self._predict(features)
+            return probabilities, predicted_classes, np.ones(len(probabilities), dtype=bool)
+        
+        probabilities = cascade.predict_proba(features)
+        escalated = probabilities.max(axis=1) < threshold
+        predicted_classes = cascade.classes_.take(np.argmax(probabilities, axis=1))
+        if escalated.any():
+            # Only the unsure rows pay for the full model
+            full_probabilities, full_classes = self._predict(features[escalated])
+            probabilities[escalated] = full_probabilities
+            predicted_classes[escalated] = full_classes
+        return probabilities, predicted_classes, escalated
+    
+    def top_conditions(self, probabilities: np.ndarray, top_k: Optional[int] = None) -> tuple:
+        """Column indices and probabilities of each row's top_k conditions, best first.
+        
+        argpartition selects the k best columns of the whole matrix in one
+        pass; only those k are sorted. Equal probabilities are ordered by
+        column, like argmax, since argpartition leaves their order unspecified.
+        """
+        k = min(top_k or DIFFERENTIAL_TOP_K, probabilities.shape[1])
+        top_indices = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        top_probabilities = np.take_along_axis(probabilities, top_indices, axis=1)
+        order = np.lexsort((top_indices, -top_probabilities), axis=1)
+        return np.take_along_axis(top_indices, order, axis=1), np.take_along_axis(top_probabilities, order, axis=1)
+    
+    def _explain(self, features: np.ndarray, classes: np.ndarray, escalated: np.ndarray) -> Optional[np.ndarray]:
+        """Each row's feature contributions to the score of its class; None without an explainer.
+        
+        Rows the full model answered are explained over the ensemble, rows
+        the distilled tree answered over the tree's own path, so a fast
+        answer never pays for the ensemble walk.
+        """
+        explainer = self.explainer
+        if explainer is None:
+            return None
+        try:
+            contributions = np.zeros(features.shape, dtype=np.float64)
+            if escalated.any():
+                contributions[escalated], _ = explainer.explain(features[escalated], classes[escalated])
+            if not escalated.all():
+                fast = ~escalated
+                contributions[fast] = self.cascade.explain(features[fast], classes[fast])
+            return contributions
+        except Exception as e:
+            logger.warning(f"Could not explain prediction: {e}")
+            return None
+    
+    def _build_analysis(self, processed_data: Dict[str, Any], top_indices: np.ndarray,
+                        top_probabilities: np.ndarray, features: np.ndarray,
+                        contributions: Optional[np.ndarray], escalated: bool = True) -> Dict[str, Any]:
+        """Build the analysis record for one row of model output"""
+        # The best differential entry, so the two always name the same condition
+        if 0 <= top_indices[0] < len(self.condition_labels):
+            primary_condition = self.condition_labels[top_indices[0]]
+        else:
+            primary_condition = "Unknown Condition"
+        
+        # Calculate confidence
+        confidence = float(top_probabilities[0])
+        
+        # Generate contributors
+        contributors = self._generate_contributors(processed_data, features, contributions)
+        
+        analysis_id = str(uuid.uuid4())
+        
+        return {
+            'primary_condition': primary_condition,
+            'confidence': confidence,
+            'contributors': contributors,
+            'analysis_id': analysis_id,
+            # Which cascade tier answered, counted on /metrics
+            'model_tier': 'full' if escalated else 'fast',
+            'differential': [
+                {'condition': condition, 'probability': probability}
+                for condition, probability in zip(self.condition_labels[top_indices].tolist(), top_probabilities.tolist())
+            ]
         }
-        pain_val = pain_map.get(processed_data.get('pain_level', 'No pain (0/10)'), 0)
-        
-        # Symptom count
-        symptom_count = len(processed_data.get('additional_symptoms', []))
+    
+    def _build_fallback_analysis(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a keyword-based analysis when the model cannot be used"""
+        return {
+            'primary_condition': self._get_fallback_condition(processed_data),
+            'confidence': 0.5,
+            'contributors': self._generate_fallback_contributors(processed_data),
+            'analysis_id': str(uuid.uuid4()),
+            'differential': []
+        }
+    
+    def _extract_features(self, processed_data: Dict[str, Any]) -> np.ndarray:
+        """Extract features from processed data"""
+        return self._extract_features_many([processed_data])
+    
+    def extract_features_sync(self, processed_data: Dict[str, Any]) -> np.ndarray:
+        """Build the 1-row feature matrix for one input, e.g. for micro-batching"""
+        return self._extract_features(processed_data)
+    
+    def _extract_features_many(self, processed_items: List[Dict[str, Any]]) -> np.ndarray:
+        """Extract a feature matrix with one row per processed input"""
+        if self.feature_plan is not None:
+            return self.feature_plan.transform(processed_items)
         
-        # Numerical features
-        numerical_features = np.array([[duration_val, pain_val, symptom_count]])
+        # Text features
+        text_features = self.text_vectorizer.transform(
+            [processed_data['primary_concern'] for processed_data in processed_items]
+        ).toarray()
+        
+        # Duration, pain and symptom count features
+        numerical_features = np.array([
+            [
+                self.DURATION_CODES.get(processed_data['duration'], 2),
+                self.PAIN_SCORES.get(processed_data.get('pain_level', 'No pain (0/10)'), 0),
+                len(processed_data.get('additional_symptoms', []))
+            ]
+            for processed_data in processed_items
+        ], dtype=float)
         numerical_features = self.scaler.transform(numerical_features)
         
         # Combine features
         return np.hstack([text_features, numerical_features])
     
-    def _generate_contributors(self, processed_data: Dict[str, Any], probabilities: np.ndarray) -> List[Dict[str, Any]]:
-        """Generate contributor factors based on input data"""
-        contributors = []
+    def _generate_contributors(self, processed_data: Dict[str, Any], features: np.ndarray,
+                               contributions: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """Features that pushed the model towards the primary condition, largest first.
         
-        # Primary concern contribution
-        if processed_data.get('primary_concern'):
-            contributors.append({
-                'factor': f"Primary symptom: {processed_data['primary_concern'][:50]}...",
-                'impact': min(0.4, np.max(probabilities))
-            })
+        impact is the feature's share of the total absolute contribution to
+        the predicted class score, so features working against it reduce
+        every share.
+        """
+        if contributions is None:
+            return self._generate_fallback_contributors(processed_data)
         
-        # Duration contribution
-        duration_impacts = {
-            'Less than 24 hours': 0.3, '1-3 days': 0.25, '4-7 days': 0.2,
-            '1-2 weeks': 0.15, 'More than 2 weeks': 0.1
-        }
-        duration = processed_data.get('duration', '')
-        if duration:
-            contributors.append({
-                'factor': f"Symptom duration: {duration}",
-                'impact': duration_impacts.get(duration, 0.1)
-            })
+        total = np.abs(contributions).sum()
+        if total <= 0:
+            return []
         
-        # Pain level contribution
-        pain_level = processed_data.get('pain_level', '')
-        if pain_level and 'No pain' not in pain_level:
-            pain_impacts = {
-                'Mild pain (1-3/10)': 0.1, 'Moderate pain (4-6/10)': 0.2,
-                'Severe pain (7-8/10)': 0.3, 'Extreme pain (9-10/10)': 0.4
-            }
+        contributors = []
+        for index in np.argsort(-contributions, kind='stable')[:5]:  # Return top 5 contributors
+            if contributions[index] <= 0:
+                break
             contributors.append({
-                'factor': f"Pain level: {pain_level}",
-                'impact': pain_impacts.get(pain_level, 0.1)
+                'factor': self._describe_feature(index, features[index], processed_data),
+                'impact': float(contributions[index] / total)
             })
         
-        # Additional symptoms
+        return contributors
+    
+    def _describe_feature(self, index: int, value: float, processed_data: Dict[str, Any]) -> str:
+        """Readable contributor name for one feature column of an input"""
+        name = self.feature_names[index]
+        if index < len(self.feature_names) - len(self.NUMERIC_FEATURES):
+            # An absent term counts too, e.g. no 'chest' steering away from cardiac conditions
+            return f"Symptom term: {name}" if value > 0 else f"No mention of: {name}"
+        if name == 'duration_code':
+            return f"Symptom duration: {processed_data.get('duration', 'Unknown')}"
+        if name == 'pain_score':
+            return f"Pain level: {processed_data.get('pain_level', 'No pain (0/10)')}"
         additional_symptoms = processed_data.get('additional_symptoms', [])
         if additional_symptoms:
-            impact_per_symptom = min(0.3 / len(additional_symptoms), 0.1)
-            for symptom in additional_symptoms[:3]:  # Top 3 symptoms
-                contributors.append({
-                    'factor': f"Additional symptom: {symptom}",
-                    'impact': impact_per_symptom
-                })
-        
-        # Normalize impacts
-        total_impact = sum(c['impact'] for c in contributors)
-        if total_impact > 1.0:
-            for contributor in contributors:
-                contributor['impact'] = contributor['impact'] / total_impact
-        
-        return contributors[:5]  # Return top 5 contributors
+            return f"Additional symptoms: {', '.join(additional_symptoms[:3])}"
+        return "No additional symptoms"
     
     def _get_fallback_condition(self, processed_data: Dict[str, Any]) -> str:
         """Get fallback condition based on symptoms"""
@@ -431,6 +750,10 @@ class SymptomAnalyzer:
     
     async def generate_recommendations(self, analysis: Dict[str, Any], risk_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate recommendations based on analysis and risk"""
+        return self.generate_recommendations_sync(analysis, risk_data)
+    
+    def generate_recommendations_sync(self, analysis: Dict[str, Any], risk_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Synchronous core of generate_recommendations"""
         recommendations = []
         
         condition = analysis['primary_condition']
@@ -502,35 +825,30 @@ class SymptomAnalyzer:
         
         return recommendations[:6]  # Return top 6 recommendations
     
-    async def get_similar_conditions(self, condition_name: str) -> List[Dict[str, Any]]:
-        """Get conditions similar to the given condition"""
+    async def get_similar_conditions(self, query: str) -> List[Dict[str, Any]]:
+        """Get conditions similar to a condition name or free-text description"""
         try:
-            if not self.sentence_model:
+            # Building the index loads the sentence model, so keep it off the event loop
+            index = self.condition_index or await asyncio.to_thread(self.get_condition_index)
+            if index is None:
                 return []
             
-            # Get embedding for input condition
-            condition_embedding = self.sentence_model.encode([condition_name])
-            
-            # Get embeddings for all known conditions
-            all_conditions = list(self.condition_mappings.keys())
-            condition_embeddings = self.sentence_model.encode(all_conditions)
-            
-            # Calculate similarities
-            from sklearn.metrics.pairwise import cosine_similarity
-            similarities = cosine_similarity(condition_embedding, condition_embeddings)[0]
-            
-            # Get top similar conditions
-            similar_indices = np.argsort(similarities)[::-1][1:6]  # Exclude self
-            
-            similar_conditions = []
-            for idx in similar_indices:
-                if similarities[idx] > 0.3:  # Threshold for similarity
-                    similar_conditions.append({
-                        'condition': all_conditions[idx],
-                        'similarity': float(similarities[idx])
-                    })
+            # Known conditions use their own row and are left out of the results
+            position = index.position(query)
+            if position is not None:
+                vector = index.embeddings[position]
+            else:
+                vector = index.cached_query(query)
+                if vector is None:
+                    sentence_model = await asyncio.to_thread(self.get_sentence_model)
+                    if not sentence_model:
+                        return []
+                    embedding = await asyncio.to_thread(sentence_model.encode, [query.strip()])
+                    vector = index.remember_query(query, embedding[0])
             
-            return similar_conditions
+            return index.most_similar(
+                vector, self.SIMILAR_CONDITIONS_LIMIT, self.SIMILARITY_THRESHOLD, exclude=position
+            )
             
         except Exception as e:
             logger.error(f"Error finding similar conditions: {e}")
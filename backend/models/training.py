@@ -0,0 +1,278 @@
+# models/training.py
+"""Offline training for SymptomAnalyzer.
+
+The dataset is built from the condition templates below, featurized once
+with the analyzer's own transformers and split for evaluation. A
+distilled first-tier model for cascade inference is fit to the model's
+probabilities on the training split. The fitted models and transformers
+are left on the analyzer, so SymptomAnalyzer._save_models() writes them
+as a bundle. The API only loads bundles; see train_model.py.
+"""
+import logging
+import os
+import random
+import time
+from typing import Dict, Any
+
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from models.cascade import DistilledTree
+from models.symptom_analyzer import SymptomAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# 'hist' bins features once and grows trees on all cores; 'gradient_boosting' is the previous trainer
+TRAINERS = ['hist', 'gradient_boosting']
+DEFAULT_TRAINER = 'hist'
+DEFAULT_ROWS = 100_000
+DEFAULT_CASCADE_DEPTH = 16
+
+# Words mixed into template concerns so the text is not a fixed lookup
+FILLER_WORDS = ['really', 'bad', 'sharp', 'constant', 'mild', 'sudden', 'worse', 'today', 'lately', 'recurring']
+
+def make_estimator(trainer: str, seed: int = 42) -> Any:
+    """Unfitted classifier for a trainer name"""
+    if trainer == 'hist':
+        # Same depth and learning rate as the previous trainer; stops once the
+        # held-out loss has not improved for 10 iterations
+        return HistGradientBoostingClassifier(
+            max_iter=200,
+            learning_rate=0.1,
+            max_depth=6,
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=seed
+        )
+    if trainer == 'gradient_boosting':
+        return GradientBoostingClassifier(
+            n_estimators=200,
+            learning_rate=0.1,
+            max_depth=6,
+            random_state=seed
+        )
+    raise ValueError(f"Unknown trainer '{trainer}', expected one of {TRAINERS}")
+
+def training_templates() -> pd.DataFrame:
+    """Condition templates the training sets are built from, with a few variations of each"""
+    
+    # Comprehensive medical conditions with symptoms
+    medical_data = [
+        # Respiratory conditions
+        {
+            'primary_concern': 'persistent cough with fever',
+            'duration': '1-3 days',
+            'pain_level': 'Mild pain (1-3/10)',
+            'additional_symptoms': ['Fever', 'Fatigue', 'Headache'],
+            'condition': 'Upper Respiratory Infection',
+            'severity': 'moderate'
+        },
+        {
+            'primary_concern': 'severe chest pain and shortness of breath',
+            'duration': 'Less than 24 hours',
+            'pain_level': 'Severe pain (7-8/10)',
+            'additional_symptoms': ['Chest pain', 'Shortness of breath', 'Dizziness'],
+            'condition': 'Acute Chest Pain Syndrome',
+            'severity': 'high'
+        },
+        
+        # Gastrointestinal conditions
+        {
+            'primary_concern': 'severe stomach pain and nausea',
+            'duration': '4-7 days',
+            'pain_level': 'Severe pain (7-8/10)',
+            'additional_symptoms': ['Nausea', 'Abdominal pain', 'Fever'],
+            'condition': 'Gastroenteritis',
+            'severity': 'moderate'
+        },
+        {
+            'primary_concern': 'chronic abdominal discomfort',
+            'duration': 'More than 2 weeks',
+            'pain_level': 'Moderate pain (4-6/10)',
+            'additional_symptoms': ['Abdominal pain', 'Fatigue'],
+            'condition': 'Irritable Bowel Syndrome',
+            'severity': 'low'
+        },
+        
+        # Neurological conditions
+        {
+            'primary_concern': 'severe headache with sensitivity to light',
+            'duration': '1-2 weeks',
+            'pain_level': 'Severe pain (7-8/10)',
+            'additional_symptoms': ['Headache', 'Nausea', 'Dizziness'],
+            'condition': 'Migraine',
+            'severity': 'moderate'
+        },
+        {
+            'primary_concern': 'sudden severe headache',
+            'duration': 'Less than 24 hours',
+            'pain_level': 'Extreme pain (9-10/10)',
+            'additional_symptoms': ['Headache', 'Nausea', 'Dizziness'],
+            'condition': 'Acute Headache Syndrome',
+            'severity': 'high'
+        },
+        
+        # Cardiovascular conditions
+        {
+            'primary_concern': 'chest tightness with exercise',
+            'duration': '1-2 weeks',
+            'pain_level': 'Moderate pain (4-6/10)',
+            'additional_symptoms': ['Chest pain', 'Shortness of breath', 'Fatigue'],
+            'condition': 'Angina',
+            'severity': 'moderate'
+        },
+        
+        # Infectious diseases
+        {
+            'primary_concern': 'high fever with body aches',
+            'duration': '1-3 days',
+            'pain_level': 'Moderate pain (4-6/10)',
+            'additional_symptoms': ['Fever', 'Headache', 'Fatigue'],
+            'condition': 'Viral Syndrome',
+            'severity': 'moderate'
+        },
+        
+        # Musculoskeletal conditions
+        {
+            'primary_concern': 'joint pain and stiffness',
+            'duration': 'More than 2 weeks',
+            'pain_level': 'Moderate pain (4-6/10)',
+            'additional_symptoms': ['Fatigue'],
+            'condition': 'Arthritis',
+            'severity': 'low'
+        },
+        
+        # Add more variations and conditions
+        {
+            'primary_concern': 'difficulty breathing at night',
+            'duration': '4-7 days',
+            'pain_level': 'Mild pain (1-3/10)',
+            'additional_symptoms': ['Shortness of breath', 'Fatigue'],
+            'condition': 'Asthma Exacerbation',
+            'severity': 'moderate'
+        }
+    ]
+    
+    # Generate more variations
+    base_conditions = len(medical_data)
+    for i in range(base_conditions):
+        original = medical_data[i].copy()
+        
+        # Create variations with different symptom combinations
+        variations = [
+            {**original, 'duration': '1-2 weeks', 'additional_symptoms': original['additional_symptoms'][:2]},
+            {**original, 'pain_level': 'Mild pain (1-3/10)', 'additional_symptoms': original['additional_symptoms'] + ['Dizziness']},
+            {**original, 'duration': 'More than 2 weeks', 'severity': 'low' if original['severity'] != 'low' else 'moderate'}
+        ]
+        medical_data.extend(variations)
+    
+    return pd.DataFrame(medical_data)
+
+def build_training_frame(templates: pd.DataFrame, rows: int, seed: int = 42, label_noise: float = 0.05) -> pd.DataFrame:
+    """The templates followed by seeded variations of them, rows in total.
+    
+    A variation drops words from the concern and may add a filler word,
+    redraws the duration and pain level now and then, and keeps a random
+    subset of the additional symptoms, sometimes plus an unrelated one. A
+    label_noise share of the variations get a random condition, so accuracy
+    is not trivially perfect.
+    """
+    rng = random.Random(seed)
+    records = templates.to_dict('records')
+    conditions = sorted(templates['condition'].unique())
+    durations = list(SymptomAnalyzer.DURATION_CODES)
+    pain_levels = list(SymptomAnalyzer.PAIN_SCORES)
+    all_symptoms = sorted({symptom for symptoms in templates['additional_symptoms'] for symptom in symptoms})
+    
+    data = {column: [] for column in ('primary_concern', 'duration', 'pain_level', 'additional_symptoms', 'condition')}
+    for index in range(max(rows, len(records))):
+        template = records[index] if index < len(records) else rng.choice(records)
+        if index < len(records):
+            concern, duration, pain_level = template['primary_concern'], template['duration'], template['pain_level']
+            symptoms, condition = list(template['additional_symptoms']), template['condition']
+        else:
+            words = [word for word in template['primary_concern'].split() if rng.random() > 0.2]
+            if not words:
+                words = [rng.choice(template['primary_concern'].split())]
+            if rng.random() < 0.5:
+                words.insert(rng.randint(0, len(words)), rng.choice(FILLER_WORDS))
+            concern = ' '.join(words)
+            duration = rng.choice(durations) if rng.random() < 0.25 else template['duration']
+            pain_level = rng.choice(pain_levels) if rng.random() < 0.25 else template['pain_level']
+            symptoms = [symptom for symptom in template['additional_symptoms'] if rng.random() > 0.3]
+            if rng.random() < 0.3:
+                symptoms.append(rng.choice(all_symptoms))
+            condition = rng.choice(conditions) if rng.random() < label_noise else template['condition']
+        
+        data['primary_concern'].append(concern)
+        data['duration'].append(duration)
+        data['pain_level'].append(pain_level)
+        data['additional_symptoms'].append(symptoms)
+        data['condition'].append(condition)
+    
+    return pd.DataFrame(data)
+
+def train(analyzer: SymptomAnalyzer, rows: int = DEFAULT_ROWS, trainer: str = DEFAULT_TRAINER, seed: int = 42,
+          test_size: float = 0.2, label_noise: float = 0.05, cascade_depth: int = DEFAULT_CASCADE_DEPTH) -> Dict[str, Any]:
+    """Build, featurize, fit and evaluate; the analyzer keeps the fitted objects.
+    
+    Returns a report with row counts, per-phase wall times and test accuracy.
+    A cascade_depth of 0 skips the distilled model.
+    """
+    estimator = make_estimator(trainer, seed)
+    timings: Dict[str, float] = {}
+    
+    training_started = started = time.perf_counter()
+    frame = build_training_frame(training_templates(), rows, seed, label_noise)
+    timings['dataset_seconds'] = time.perf_counter() - started
+    
+    # Fits the vectorizer and scaler on the analyzer and sets condition_mappings
+    started = time.perf_counter()
+    X, y = analyzer.fit_features(frame)
+    y = y.to_numpy()
+    del frame
+    timings['featurize_seconds'] = time.perf_counter() - started
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y
+    )
+    del X
+    
+    logger.info(f"Training {trainer} on {len(y_train)} rows x {X_train.shape[1]} features")
+    started = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    timings['fit_seconds'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    accuracy = accuracy_score(y_test, estimator.predict(X_test))
+    timings['evaluate_seconds'] = time.perf_counter() - started
+    logger.info(f"Model accuracy: {accuracy:.3f}")
+    
+    analyzer.cascade = None
+    if cascade_depth > 0:
+        started = time.perf_counter()
+        analyzer.cascade = DistilledTree.distill(
+            estimator.predict_proba, estimator.classes_, X_train, X_test, max_depth=cascade_depth, seed=seed
+        )
+        timings['distill_seconds'] = time.perf_counter() - started
+    
+    analyzer.primary_model = estimator
+    return {
+        'trainer': trainer,
+        'model': type(estimator).__name__,
+        'rows': len(y),
+        'train_rows': len(y_train),
+        'test_rows': len(y_test),
+        'features': int(X_train.shape[1]),
+        'iterations': int(getattr(estimator, 'n_iter_', getattr(estimator, 'n_estimators_', 0))),
+        'seed': seed,
+        'label_noise': label_noise,
+        'cpu_count': os.cpu_count(),
+        'test_accuracy': float(accuracy),
+        'cascade': analyzer.cascade.metadata()['summary'] if analyzer.cascade else None,
+        **{name: round(seconds, 3) for name, seconds in timings.items()},
+        'total_seconds': round(time.perf_counter() - training_started, 3)
+    }
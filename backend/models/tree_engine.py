@@ -0,0 +1,259 @@
+# models/tree_engine.py
+import logging
+import os
+import numpy as np
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from scipy.special import expit
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+
+logger = logging.getLogger(__name__)
+
+# Batches above this go through sklearn's Cython traversal instead
+COMPILED_MAX_ROWS = int(os.getenv('TREE_ENGINE_MAX_ROWS', '16'))
+
+class CompiledTreeEnsemble:
+    """Boosted tree classifier flattened into arrays for vectorized inference.
+    
+    Every regression tree of a fitted GradientBoostingClassifier or
+    HistGradientBoostingClassifier is copied into one set of contiguous node
+    arrays. Leaves point to themselves, so a batch of rows walks all trees at
+    once in exactly max_depth gather steps, without per-tree Python calls or
+    sklearn's per-call validation. One pass yields both the class
+    probabilities and the predicted class. Gathers cost rows x trees x depth,
+    so large batches fall back to sklearn's own traversal (still a single
+    pass).
+    
+    Results match sklearn exactly: inputs are compared in the dtype the
+    model's trees use (float32 for GradientBoostingClassifier, float64 with
+    NaN routed by the learned missing-value direction for the histogram
+    booster), tree contributions are added to the initial raw prediction in
+    stage order, and the softmax/sigmoid follows sklearn's loss.
+    
+    The arrays can be saved in a model bundle and mapped back with
+    from_arrays(); the sklearn model is then only loaded, through the
+    reference callable, when a large batch needs it.
+    """
+    
+    ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots', 'init_raw', 'classes')
+    # missing_left only exists for models that route missing values; weight
+    # (training samples per node) is absent from bundles written before it
+    OPTIONAL_ARRAY_NAMES = ('missing_left', 'weight')
+    
+    def __init__(self, model: Any, max_rows: int = COMPILED_MAX_ROWS):
+        if isinstance(model, GradientBoostingClassifier):
+            trees, init_raw = self._gradient_boosting_trees(model)
+            input_dtype, raw_order = 'float32', 'C'
+        elif isinstance(model, HistGradientBoostingClassifier):
+            trees, init_raw = self._hist_gradient_boosting_trees(model)
+            # The histogram booster accumulates raw predictions column-major
+            input_dtype, raw_order = 'float64', 'F'
+        else:
+            raise TypeError(
+                f"Cannot compile {type(model).__name__}, expected GradientBoostingClassifier "
+                f"or HistGradientBoostingClassifier"
+            )
+        
+        features, thresholds, children, values, missing_left, weights, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        # Stage-major, then output: the same order sklearn accumulates in
+        for tree in trees:
+            node_ids = np.arange(len(tree['is_leaf']))
+            is_leaf = tree['is_leaf']
+            
+            left = np.where(is_leaf, node_ids, tree['left']) + offset
+            right = np.where(is_leaf, node_ids, tree['right']) + offset
+            # Interleave so that child = children[2 * node + goes_right]
+            children.append(np.column_stack([left, right]).ravel())
+            features.append(np.where(is_leaf, 0, tree['feature']))
+            thresholds.append(np.where(is_leaf, 0.0, tree['threshold']))
+            values.append(tree['value'])
+            weights.append(tree['weight'])
+            if 'missing_left' in tree:
+                missing_left.append(tree['missing_left'])
+            
+            roots.append(offset)
+            offset += len(node_ids)
+            depth = max(depth, tree['depth'])
+        
+        arrays = {
+            'feature': np.concatenate(features).astype(np.intp),
+            'threshold': np.concatenate(thresholds).astype(np.float64),
+            'children': np.concatenate(children).astype(np.intp),
+            'value': np.concatenate(values).astype(np.float64),
+            'roots': np.asarray(roots, dtype=np.intp),
+            'init_raw': np.asarray(init_raw, dtype=np.float64),
+            'classes': np.asarray(model.classes_),
+            'weight': np.concatenate(weights).astype(np.float64)
+        }
+        if missing_left:
+            arrays['missing_left'] = np.concatenate(missing_left).astype(bool)
+        self._assign(arrays, model.n_features_in_, depth, lambda: model, max_rows, input_dtype, raw_order)
+        
+        logger.info(
+            f"Compiled {len(self.roots)} trees ({len(self.feature)} nodes, depth {self.max_depth}) for inference"
+        )
+    
+    @staticmethod
+    def _gradient_boosting_trees(model: GradientBoostingClassifier) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        if not (model.init_ == 'zero' or isinstance(model.init_, DummyClassifier)):
+            raise TypeError("Cannot compile a GradientBoostingClassifier with a custom init estimator")
+        
+        trees = []
+        for stage in model.estimators_:
+            for estimator in stage:
+                tree = estimator.tree_
+                trees.append({
+                    'is_leaf': tree.children_left == -1,
+                    'left': tree.children_left,
+                    'right': tree.children_right,
+                    'feature': tree.feature,
+                    'threshold': tree.threshold,
+                    # sklearn adds learning_rate * leaf value per stage
+                    'value': model.learning_rate * tree.value[:, 0, 0],
+                    'weight': tree.weighted_n_node_samples,
+                    'depth': tree.max_depth
+                })
+        
+        # The prior (or zero) init estimator gives the same raw start for every row
+        init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+        return trees, init_raw
+    
+    @staticmethod
+    def _hist_gradient_boosting_trees(model: HistGradientBoostingClassifier) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        if getattr(model, '_preprocessor', None) is not None:
+            raise TypeError("Cannot compile a HistGradientBoostingClassifier with categorical features")
+        
+        trees = []
+        for predictors in model._predictors:
+            for predictor in predictors:
+                nodes = predictor.nodes
+                if nodes['is_categorical'].any():
+                    raise TypeError("Cannot compile a HistGradientBoostingClassifier with categorical splits")
+                trees.append({
+                    'is_leaf': nodes['is_leaf'].astype(bool),
+                    'left': nodes['left'].astype(np.intp),
+                    'right': nodes['right'].astype(np.intp),
+                    'feature': nodes['feature_idx'].astype(np.intp),
+                    'threshold': nodes['num_threshold'],
+                    # Leaf values already include the learning rate
+                    'value': nodes['value'],
+                    'missing_left': nodes['missing_go_to_left'].astype(bool),
+                    # The histogram booster only records unweighted sample counts
+                    'weight': nodes['count'],
+                    'depth': int(nodes['depth'].max())
+                })
+        
+        return trees, np.asarray(model._baseline_prediction, dtype=np.float64).reshape(-1)
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], n_features: int, max_depth: int,
+                    reference: Callable[[], Any], max_rows: int = COMPILED_MAX_ROWS,
+                    input_dtype: str = 'float32', raw_order: str = 'C') -> 'CompiledTreeEnsemble':
+        """Rebuild from to_arrays() output and metadata(); reference() returns the sklearn model"""
+        engine = cls.__new__(cls)
+        engine._assign(arrays, n_features, max_depth, reference, max_rows, input_dtype, raw_order)
+        return engine
+    
+    def _assign(self, arrays: Dict[str, np.ndarray], n_features: int, max_depth: int,
+                reference: Callable[[], Any], max_rows: int, input_dtype: str, raw_order: str):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.init_raw = arrays['init_raw']
+        self.classes_ = arrays['classes']
+        self.missing_left = arrays.get('missing_left')
+        self.weight = arrays.get('weight')
+        self.n_outputs = len(self.init_raw)
+        self.n_stages = len(self.roots) // self.n_outputs
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.input_dtype = np.dtype(input_dtype)
+        self.raw_order = raw_order
+        self.reference = reference
+        self.max_rows = max_rows
+    
+    def metadata(self) -> Dict[str, Any]:
+        """Scalar settings from_arrays() needs besides the arrays"""
+        return {
+            'n_features': self.n_features, 'max_depth': self.max_depth,
+            'input_dtype': self.input_dtype.name, 'raw_order': self.raw_order
+        }
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The flattened ensemble, for saving alongside the model"""
+        arrays = {name: getattr(self, 'classes_' if name == 'classes' else name) for name in self.ARRAY_NAMES}
+        for name in self.OPTIONAL_ARRAY_NAMES:
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        return arrays
+    
+    def _check_input(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        # GradientBoostingClassifier rejects NaN and infinity; the histogram booster routes NaN
+        if self.missing_left is None and not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        # Compare in the dtype the model's trees use (float32 for GradientBoostingClassifier)
+        return X.astype(self.input_dtype)
+    
+    def _walk(self, X: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(roots, (X.shape[0], roots.shape[-1]))
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            goes_right = values > self.threshold[nodes]
+            if self.missing_left is not None:
+                goes_right |= np.isnan(values) & ~self.missing_left[nodes]
+            nodes = self.children[2 * nodes + goes_right]
+        return nodes
+    
+    def apply(self, X: np.ndarray, roots: Optional[np.ndarray] = None) -> np.ndarray:
+        """Leaf node reached in each tree, shape (n_samples, trees).
+        
+        roots selects the trees, either one list for every row or one row of
+        roots per sample; by default all trees in stage order.
+        """
+        return self._walk(self._check_input(X), self.roots if roots is None else np.asarray(roots))
+    
+    def raw_predict(self, X: np.ndarray) -> np.ndarray:
+        """Raw (pre-link) ensemble output, shape (n_samples, n_outputs)"""
+        X = self._check_input(X)
+        
+        n_samples = X.shape[0]
+        if n_samples > self.max_rows:
+            # Past the crossover sklearn's compiled traversal is faster than numpy gathers
+            return self.reference().decision_function(X).reshape(n_samples, self.n_outputs)
+        
+        nodes = self._walk(X, self.roots)
+        
+        # Row 0 is the init, rows 1.. the stage contributions; reducing over the
+        # outer axis adds them one stage at a time, in sklearn's order
+        terms = np.empty((self.n_stages + 1, n_samples, self.n_outputs))
+        terms[0] = self.init_raw
+        terms[1:] = self.value[nodes].reshape(n_samples, self.n_stages, self.n_outputs).transpose(1, 0, 2)
+        raw = np.add.reduce(terms, axis=0)
+        # The layout decides how numpy sums each row in the softmax, so match sklearn's
+        return np.asfortranarray(raw) if self.raw_order == 'F' else raw
+    
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (class probabilities, predicted class labels) in one pass"""
+        raw = self.raw_predict(X)
+        
+        if self.n_outputs == 1:
+            # Binary: a single log-odds output
+            positive = expit(raw[:, 0])
+            probabilities = np.column_stack([1 - positive, positive])
+            predicted = (raw[:, 0] > 0).astype(np.intp)
+        else:
+            # Same steps as sklearn's softmax so the floats agree exactly
+            probabilities = raw - raw.max(axis=1).reshape(-1, 1)
+            np.exp(probabilities, out=probabilities)
+            probabilities /= probabilities.sum(axis=1).reshape(-1, 1)
+            predicted = np.argmax(raw, axis=1)
+        
+        return probabilities, self.classes_.take(predicted)
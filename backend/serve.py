@@ -0,0 +1,112 @@
+# serve.py
+"""Production launcher: load models once, then fork N uvicorn workers.
+
+The master process loads the preprocessor and ML models, freezes the GC so
+those objects stay on shared pages, binds the listening socket and forks the
+workers. Each worker runs its own event loop, database pool and inference
+executor, but reads the models through pages shared copy-on-write with the
+master, so resident memory grows sub-linearly with the worker count.
+
+Usage: python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+import main
+
+logger = logging.getLogger("serve")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for the symptom checker API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Bind the listening socket in the master so every worker inherits it"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(sock: socket.socket, log_level: str):
+    """Serve the app on the inherited socket; never returns to the master loop"""
+    # Default signal handling so uvicorn can install its own graceful handlers
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    
+    config = uvicorn.Config(main.app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    try:
+        server.run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+def spawn_worker(sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock, log_level)
+    return pid
+
+def main_loop():
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    
+    started = time.perf_counter()
+    main.preload_models()
+    
+    # Move everything loaded so far into the permanent generation: the
+    # collector then never writes to those objects' headers, which would
+    # otherwise un-share their pages in every worker.
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Models preloaded in {time.perf_counter() - started:.2f}s")
+    
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn_worker(sock, args.log_level) for _ in range(max(1, args.workers))}
+    logger.info(f"Serving on {args.host}:{args.port} with {len(workers)} workers (master pid {os.getpid()})")
+    
+    stopping = False
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            # Replace crashed workers; the new fork shares the same model pages
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            workers.add(spawn_worker(sock, args.log_level))
+    
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_loop())
@@ -0,0 +1,167 @@
+# tests/parity.py
+"""Reference implementations and input generators shared by the parity tests and benchmarks.
+
+The reference functions are the comorbidity, urgency and risk factor code
+the compiled matcher replaced; the generators mix synthetic requests with
+rows that hit every edge the scalar risk path branches on. The benchmarks
+under benchmarks/ import them from here to run the same checks at scale.
+"""
+import random
+from typing import Dict, List, Any, Callable, Optional, Set, Tuple
+
+import numpy as np
+
+from benchmarks.synthetic import SymptomInputGenerator, MEDICAL_HISTORY
+from models.risk_calculator import RiskCalculator
+from utils.data_preprocessor import DataPreprocessor
+
+EDGE_HISTORIES = [
+    [], [''], ['DIABETES'], ['Type 2 Diabetes Mellitus'], ['prediabetes'], ['Asthmatic bronchitis'],
+    ['COPD', 'copd', 'Copd exacerbation'], ['heart disease and kidney disease'], ['heart\ndisease'],
+    ['liver diseases', 'chronic kidney disease stage 3'], ['İstanbul flu', 'hypertension'],
+    ['ẞ', 'cancer survivor', 'skin cancer'], ['Cardiovascular Disease'], ['hyper tension'],
+    ['asthma'] * 6, ['diabetes', 'diabetes'], ['no known conditions', 'allergies'], ['copdiabetes'],
+    ['COPD/diabetes', 'kidney diseaseliver disease']
+]
+
+def reference_count(medical_history: List[str]) -> int:
+    """Comorbidity count as computed before the matcher"""
+    high_risk_conditions = [
+        'diabetes', 'heart disease', 'hypertension', 'copd',
+        'asthma', 'cancer', 'kidney disease', 'liver disease'
+    ]
+    risk_count = 0
+    for condition in medical_history:
+        if any(high_risk in condition.lower() for high_risk in high_risk_conditions):
+            risk_count += 1
+    return risk_count
+
+def reference_categories(medical_history: List[str], categories: List[str]) -> Set[str]:
+    """Categories that are a substring of any lower-cased entry"""
+    return {category for category in categories if any(category in condition.lower() for condition in medical_history)}
+
+def reference_urgency(calculator: RiskCalculator, risk_score: int, condition: str, processed_data: Dict[str, Any]) -> str:
+    """Urgency level as computed before the matcher"""
+    emergency_conditions = ['Acute Chest Pain Syndrome', 'Acute Headache Syndrome']
+    emergency_symptoms = ['Chest pain', 'Extreme pain (9-10/10)', 'Shortness of breath']
+    if condition in emergency_conditions:
+        return 'emergency'
+    additional_symptoms = processed_data.get('additional_symptoms', [])
+    pain_level = processed_data.get('pain_level', '')
+    if any(symptom in emergency_symptoms for symptom in additional_symptoms + [pain_level]):
+        return 'emergency'
+    if risk_score >= calculator.urgency_thresholds['emergency']:
+        return 'emergency'
+    elif risk_score >= calculator.urgency_thresholds['urgent']:
+        return 'urgent'
+    elif risk_score >= calculator.urgency_thresholds['routine']:
+        return 'routine'
+    return 'monitoring'
+
+def reference_risk_factors(processed_data: Dict[str, Any], condition: str) -> List[str]:
+    """Primary risk factors as computed before the matcher"""
+    risk_factors = []
+    age = processed_data.get('age')
+    if age:
+        if age < 2:
+            risk_factors.append("Very young age (infant)")
+        elif age > 75:
+            risk_factors.append("Advanced age (>75 years)")
+        elif age > 65:
+            risk_factors.append("Senior age (65-75 years)")
+    pain_level = processed_data.get('pain_level', '')
+    if 'Severe' in pain_level or 'Extreme' in pain_level:
+        risk_factors.append("High pain severity")
+    additional_symptoms = processed_data.get('additional_symptoms', [])
+    high_risk_symptoms = ['Chest pain', 'Shortness of breath', 'Severe pain']
+    for symptom in additional_symptoms:
+        if symptom in high_risk_symptoms:
+            risk_factors.append(f"Presence of {symptom.lower()}")
+    duration = processed_data.get('duration', '')
+    if duration == 'Less than 24 hours' and condition in ['Acute Chest Pain Syndrome', 'Acute Headache Syndrome']:
+        risk_factors.append("Acute onset of serious symptoms")
+    if processed_data.get('medical_history', []):
+        risk_factors.append("Pre-existing medical conditions")
+    return risk_factors[:5]
+
+def build_corpus(calculator: RiskCalculator, rows: int, seed: int,
+                 preprocess: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Processed inputs whose histories are preprocessed, raw or edge cases.
+    
+    preprocess defaults to the full process_symptoms_sync.
+    """
+    rng = random.Random(seed)
+    raw_history = MEDICAL_HISTORY + [
+        'Type 1 diabetes', 'COPD', 'breast cancer', 'Hypertension (controlled)', 'seasonal allergies'
+    ]
+    preprocess = preprocess or DataPreprocessor().process_symptoms_sync
+    corpus = [preprocess(item) for item in SymptomInputGenerator(seed=seed).batch(rows // 2)]
+    for item in SymptomInputGenerator(seed=seed + 1).batch(rows - len(corpus)):
+        item['medical_history'] = (
+            rng.choice(EDGE_HISTORIES) if rng.random() < 0.3 else rng.sample(raw_history, rng.randint(0, 4))
+        )
+        item['additional_symptoms'] = item.get('additional_symptoms') or []
+        item['pain_level'] = rng.choice(list(calculator.SEVERITY_MODIFIERS) + ['', 'Chest pain'])
+        corpus.append(item)
+    return corpus
+
+def build_inputs(calculator: RiskCalculator, rows: int, seed: int,
+                 preprocess: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+                 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Analyses and processed inputs, half preprocessed requests and half edge cases.
+    
+    preprocess defaults to the full process_symptoms_sync.
+    """
+    rng = random.Random(seed)
+    conditions = list(calculator.condition_risk_profiles) + ['Unlisted Condition']
+    durations = list(calculator.DURATION_MODIFIERS) + ['', 'About a month']
+    pain_levels = list(calculator.SEVERITY_MODIFIERS) + ['', 'Chest pain', 'Unrated pain']
+    symptoms = list(calculator.symptom_risk_weights) + list(calculator.EMERGENCY_SYMPTOMS) + ['Rash', 'Cough']
+    ages = [None, 0, 1, 2, 17, 18, 64, 65, 74, 75, 76, 101]
+    history = MEDICAL_HISTORY + ['seasonal allergies', 'Type 2 Diabetes', 'COPD']
+    confidences = [0.0, 0.3, 0.5, 0.6, 0.8, 0.81, 1.0]
+    
+    preprocess = preprocess or DataPreprocessor().process_symptoms_sync
+    processed = [preprocess(item) for item in SymptomInputGenerator(seed=seed).batch(rows // 2)]
+    for _ in range(rows - len(processed)):
+        item = {
+            'duration': rng.choice(durations),
+            'pain_level': rng.choice(pain_levels),
+            'age': rng.choice(ages) if rng.random() < 0.5 else rng.randint(0, 100),
+            'additional_symptoms': [rng.choice(symptoms) for _ in range(rng.choice([0, 0, 1, 2, 3, 6]))],
+            'medical_history': rng.sample(history, rng.choice([0, 1, 2, 5]))
+        }
+        # Keys the scalar path reads with defaults are sometimes absent
+        for key in ('duration', 'pain_level', 'additional_symptoms', 'medical_history'):
+            if rng.random() < 0.05:
+                del item[key]
+        processed.append(item)
+    
+    analyses = [{
+        'primary_condition': rng.choice(conditions),
+        'confidence': rng.choice(confidences) if rng.random() < 0.5 else rng.random()
+    } for _ in processed]
+    return analyses, processed
+
+def random_columns(calculator: RiskCalculator, rows: int, seed: int) -> Dict[str, np.ndarray]:
+    """Columns over every code, including rows outside the lookup table"""
+    rng = np.random.default_rng(seed)
+    return {
+        'condition_index': rng.integers(0, len(calculator.condition_risk_profiles) + 1, rows),
+        'duration_code': rng.integers(0, calculator.UNKNOWN_DURATION_CODE + 1, rows),
+        'pain_code': rng.integers(0, calculator.EMERGENCY_PAIN_CODE + 1, rows),
+        'age': np.where(rng.random(rows) < 0.1, np.nan, rng.integers(0, 110, rows)),
+        'symptom_mask': rng.integers(0, len(calculator.symptom_mask_weight), rows),
+        'comorbidity_count': rng.integers(-1, 9, rows),
+        'confidence': np.where(rng.random(rows) < 0.3, rng.choice([0.5, 0.8], rows), rng.random(rows)),
+        'other_symptom_weight': rng.integers(-60, 20, rows)
+    }
+
+def count_mismatches(batch: Dict[str, np.ndarray], scalar: List[Dict[str, Any]], immediate: int) -> Dict[str, int]:
+    """Rows where the batch result differs from the scalar path"""
+    follow_up = [immediate if r['follow_up_days'] is None else r['follow_up_days'] for r in scalar]
+    return {
+        'risk_score': int((batch['risk_score'] != [r['risk_score'] for r in scalar]).sum()),
+        'urgency_level': int((batch['urgency_level'] != [r['urgency_level'] for r in scalar]).sum()),
+        'follow_up_days': int((batch['follow_up_days'] != follow_up).sum())
+    }
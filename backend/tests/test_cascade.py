@@ -0,0 +1,91 @@
+# tests/test_cascade.py
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier
+
+from models.cascade import PYTHON_WALK_MAX_ROWS, DistilledTree
+from models.symptom_analyzer import SymptomAnalyzer
+from models.tree_engine import CompiledTreeEnsemble
+from models.tree_explainer import TreePathExplainer
+
+N_FEATURES = 5
+LABELS = np.array(['Angina', 'Migraine', 'Viral Syndrome'], dtype=object)
+
+def make_data(rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES))
+    y = (X[:, 0] > 0).astype(int) + (X[:, 1] * X[:, 2] > 0.5)
+    return X, y
+
+@pytest.fixture(scope='module')
+def models():
+    X, y = make_data(800, seed=1)
+    model = GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0).fit(X, y)
+    distilled = DistilledTree.distill(model.predict_proba, model.classes_, X, make_data(200, seed=2)[0],
+                                      max_depth=6, min_samples_leaf=10)
+    return model, distilled
+
+class RecordingExplainer:
+    """Passes through to a TreePathExplainer and keeps the rows it was asked for"""
+    
+    def __init__(self, explainer: TreePathExplainer):
+        self.explainer = explainer
+        self.calls = []
+    
+    def explain(self, X, class_columns):
+        self.calls.append(np.array(X))
+        return self.explainer.explain(X, class_columns)
+
+@pytest.fixture
+def analyzer(models):
+    model, distilled = models
+    analyzer = SymptomAnalyzer()
+    analyzer.condition_labels = LABELS
+    analyzer.feature_names = ['chest', 'head'] + list(SymptomAnalyzer.NUMERIC_FEATURES)
+    analyzer.primary_model = model
+    analyzer.inference_engine = CompiledTreeEnsemble(model)
+    analyzer.explainer = RecordingExplainer(TreePathExplainer(analyzer.inference_engine))
+    analyzer.cascade = distilled
+    return analyzer
+
+# Both sides of the plain Python walk
+@pytest.mark.parametrize('rows', [1, PYTHON_WALK_MAX_ROWS, 300])
+def test_distilled_contributions_sum_to_leaf_minus_root(models, rows):
+    _, distilled = models
+    X = make_data(rows, seed=3)[0]
+    columns = np.random.default_rng(4).integers(0, len(LABELS), size=len(X))
+    contributions = distilled.explain(X, columns)
+    
+    assert contributions.shape == X.shape
+    leaf = distilled.predict_proba(X)[np.arange(len(X)), columns]
+    np.testing.assert_allclose(contributions.sum(axis=1), leaf - distilled.value[0, columns], atol=1e-12)
+    # The Python and vectorized walks agree
+    np.testing.assert_allclose(contributions, np.vstack([distilled.explain(X[[i]], columns[[i]]) for i in range(rows)]))
+
+def test_explainer_only_sees_escalated_rows(analyzer):
+    X = make_data(64, seed=5)[0]
+    analyzer.cascade_threshold = 0.9
+    _, _, escalated = analyzer._predict_cascade(X)
+    assert 0 < escalated.sum() < len(X)
+    
+    analyses = analyzer.analyze_features_sync([{'primary_concern': 'headache', 'duration': '1-3 days'}] * len(X), X)
+    assert len(analyzer.explainer.calls) == 1
+    np.testing.assert_array_equal(analyzer.explainer.calls[0], X[escalated])
+    assert [analysis['model_tier'] for analysis in analyses] == ['full' if row else 'fast' for row in escalated]
+
+def test_fast_rows_are_attributed_from_the_tree_path(analyzer):
+    X = make_data(64, seed=6)[0]
+    analyzer.cascade_threshold = 0.9
+    probabilities, _, escalated = analyzer._predict_cascade(X)
+    columns = probabilities.argmax(axis=1)
+    
+    contributions = analyzer._explain(X, columns, escalated)
+    np.testing.assert_allclose(contributions[~escalated], analyzer.cascade.explain(X[~escalated], columns[~escalated]))
+    np.testing.assert_allclose(contributions[escalated], analyzer.explainer.explainer.explain(X[escalated], columns[escalated])[0])
+
+def test_all_fast_rows_skip_the_explainer(analyzer):
+    X = make_data(64, seed=7)[0]
+    analyzer.cascade_threshold = 0.0
+    analyses = analyzer.analyze_features_sync([{'primary_concern': 'headache', 'duration': '1-3 days'}] * len(X), X)
+    assert analyzer.explainer.calls == []
+    assert all(analysis['model_tier'] == 'fast' for analysis in analyses)
@@ -0,0 +1,73 @@
+# tests/test_comorbidity_matcher.py
+import random
+
+import pytest
+
+from tests.parity import (
+    EDGE_HISTORIES, build_corpus, reference_categories, reference_count, reference_risk_factors, reference_urgency
+)
+from models.comorbidity_matcher import ComorbidityMatcher
+from models.risk_calculator import RiskCalculator
+
+ROWS = 1000
+
+@pytest.fixture(scope='module')
+def calculator():
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    return calculator
+
+@pytest.fixture(scope='module')
+def corpus(calculator):
+    # Both paths read the same dicts, so requests can skip the NLTK text processing
+    return build_corpus(calculator, ROWS, seed=3, preprocess=dict)
+
+@pytest.mark.parametrize('history', EDGE_HISTORIES)
+def test_edge_histories_match_the_substring_scan(calculator, history):
+    assert calculator.comorbidity_count(history) == reference_count(history)
+    assert calculator.comorbidity_categories(history) == reference_categories(history, calculator.HIGH_RISK_CONDITIONS)
+
+def test_corpus_matches_the_substring_scan(calculator, corpus):
+    for processed_data in corpus:
+        history = processed_data.get('medical_history', [])
+        assert calculator.comorbidity_count(history) == reference_count(history), history
+        assert (
+            calculator.comorbidity_categories(history) == reference_categories(history, calculator.HIGH_RISK_CONDITIONS)
+        ), history
+
+def test_urgency_and_risk_factors_match_the_reference(calculator, corpus):
+    rng = random.Random(5)
+    conditions = list(calculator.condition_risk_profiles) + ['Unlisted Condition']
+    for processed_data in corpus:
+        condition = rng.choice(conditions)
+        risk_score = rng.randint(0, 100)
+        assert (
+            calculator._determine_urgency_level(risk_score, condition, processed_data)
+            == reference_urgency(calculator, risk_score, condition, processed_data)
+        )
+        assert (
+            calculator._identify_primary_risk_factors(processed_data, condition)
+            == reference_risk_factors(processed_data, condition)
+        )
+
+def test_cache_does_not_change_results(calculator, corpus):
+    histories = [processed_data.get('medical_history', []) for processed_data in corpus] + EDGE_HISTORIES
+    cached = ComorbidityMatcher(calculator.HIGH_RISK_CONDITIONS, cache_size=16)
+    uncached = ComorbidityMatcher(calculator.HIGH_RISK_CONDITIONS, cache_size=0)
+    # Twice over, so the second pass is served from the cache where it still holds the history
+    for history in histories + histories:
+        assert cached.match(history) == uncached.match(history), history
+    assert len(cached._cache) <= cached.cache_size
+
+def test_categories_overlapping_a_match_are_found():
+    categories = ['kidney', 'eye', 'kidney disease', 'disease']
+    matcher = ComorbidityMatcher(categories, cache_size=0)
+    # A scan stops at 'kidney' and would skip the 'eye' starting in its last letters
+    for history in (['kidneye'], ['Kidney Disease'], ['eye', 'no issues'], ['KIDNEYES and diseases']):
+        match = matcher.match(history)
+        assert match.categories == reference_categories(history, categories), history
+        assert match.entries == sum(any(category in entry.lower() for category in categories) for entry in history)
+
+def test_empty_category_is_rejected():
+    with pytest.raises(ValueError):
+        ComorbidityMatcher(['diabetes', ''])
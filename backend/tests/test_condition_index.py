@@ -0,0 +1,108 @@
+# tests/test_condition_index.py
+import asyncio
+
+import numpy as np
+import pytest
+
+from models.condition_index import ConditionEmbeddingIndex
+from models.symptom_analyzer import SymptomAnalyzer
+
+NAMES = [f"Condition {i}" for i in range(300)]
+DIMENSIONS = 16
+
+class CountingEncoder:
+    """Stands in for the sentence model: a fixed random vector per sentence"""
+    
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.vectors = {}
+        self.calls = []
+    
+    def encode(self, sentences):
+        self.calls.append(list(sentences))
+        for sentence in sentences:
+            if sentence not in self.vectors:
+                self.vectors[sentence] = self.rng.normal(size=DIMENSIONS).astype(np.float32)
+        return np.stack([self.vectors[sentence] for sentence in sentences])
+
+@pytest.fixture
+def index():
+    return ConditionEmbeddingIndex.build(CountingEncoder(), NAMES, 'test-model')
+
+def reference_similar(index: ConditionEmbeddingIndex, vector: np.ndarray, limit: int, min_similarity: float, exclude=None):
+    """Every similarity, fully sorted"""
+    similarities = (index.embeddings @ vector).tolist()
+    ranked = sorted((i for i in range(len(NAMES)) if i != exclude), key=lambda i: -similarities[i])[:limit]
+    return [{'condition': NAMES[i], 'similarity': similarities[i]} for i in ranked if similarities[i] > min_similarity]
+
+@pytest.mark.parametrize('limit', [1, 5, len(NAMES) - 1, len(NAMES), 100])
+def test_top_k_matches_a_full_sort(index, limit):
+    rng = np.random.default_rng(limit)
+    for _ in range(20):
+        vector = index.normalize(rng.normal(size=DIMENSIONS).astype(np.float32))
+        results = index.most_similar(vector, limit, min_similarity=-1.0)
+        expected = reference_similar(index, vector, limit, -1.0)
+        assert results == expected
+        similarities = [r['similarity'] for r in results]
+        assert similarities == sorted(similarities, reverse=True)
+
+def test_known_condition_is_excluded_and_threshold_applied(index):
+    position = index.position('  condition 7 ')
+    assert position == 7
+    results = index.most_similar(index.embeddings[position].copy(), 5, min_similarity=0.1, exclude=position)
+    assert 'Condition 7' not in [r['condition'] for r in results]
+    assert all(r['similarity'] > 0.1 for r in results)
+    assert results == reference_similar(index, index.embeddings[position], 5, 0.1, exclude=position)
+    assert index.most_similar(index.embeddings[0].copy(), 0, min_similarity=-1.0) == []
+
+def test_embeddings_are_unit_length_and_zero_rows_stay_zero():
+    index = ConditionEmbeddingIndex(['a', 'b'], np.array([[3.0, 4.0], [0.0, 0.0]]), 'test-model')
+    np.testing.assert_allclose(index.embeddings, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_query_cache_evicts_the_least_recently_used(index):
+    index = ConditionEmbeddingIndex(index.names, index.embeddings, 'test-model', query_cache_size=2)
+    for query in ('chest pain', 'headache'):
+        assert index.cached_query(query) is None
+        index.remember_query(query, np.ones(DIMENSIONS))
+    # Reading 'chest pain' makes 'headache' the oldest entry
+    assert index.cached_query(' chest pain ') is not None
+    index.remember_query('cough', np.ones(DIMENSIONS))
+    assert index.cached_query('headache') is None
+    assert index.cached_query('chest pain') is not None
+    assert index.cached_query('cough') is not None
+    
+    stats = index.stats()
+    assert stats['cached_queries'] == 2
+    assert (stats['query_cache_hits'], stats['query_cache_misses']) == (3, 3)
+
+def test_zero_cache_size_keeps_nothing(index):
+    index = ConditionEmbeddingIndex(index.names, index.embeddings, 'test-model', query_cache_size=0)
+    vector = index.remember_query('chest pain', np.full(DIMENSIONS, 2.0))
+    np.testing.assert_allclose(np.linalg.norm(vector), 1.0, rtol=1e-6)
+    assert index.cached_query('chest pain') is None
+    assert index.stats()['cached_queries'] == 0
+
+def test_saved_index_is_reused_only_for_the_same_names_and_model(index, tmp_path):
+    index.save(tmp_path)
+    loaded = ConditionEmbeddingIndex.load(tmp_path, NAMES, 'test-model')
+    np.testing.assert_allclose(loaded.embeddings, index.embeddings, atol=1e-7)
+    assert ConditionEmbeddingIndex.load(tmp_path, NAMES[:-1], 'test-model') is None
+    assert ConditionEmbeddingIndex.load(tmp_path, NAMES, 'other-model') is None
+    assert ConditionEmbeddingIndex.load(tmp_path / 'missing', NAMES, 'test-model') is None
+
+def test_repeated_free_text_queries_skip_the_sentence_model(index):
+    encoder = CountingEncoder(seed=1)
+    analyzer = SymptomAnalyzer()
+    analyzer.condition_index = index
+    analyzer.sentence_model = encoder
+    analyzer._sentence_model_attempted = True
+    
+    first = asyncio.run(analyzer.get_similar_conditions('tight chest when climbing stairs'))
+    again = asyncio.run(analyzer.get_similar_conditions(' tight chest when climbing stairs '))
+    known = asyncio.run(analyzer.get_similar_conditions('Condition 3'))
+    assert encoder.calls == [['tight chest when climbing stairs']]
+    assert first == again
+    vector = index.normalize(encoder.vectors['tight chest when climbing stairs'])
+    expected = reference_similar(index, vector, analyzer.SIMILAR_CONDITIONS_LIMIT, analyzer.SIMILARITY_THRESHOLD)
+    assert first == expected
+    assert 'Condition 3' not in [r['condition'] for r in known]
@@ -0,0 +1,89 @@
+# tests/test_feature_plan.py
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import StandardScaler
+
+from models.feature_plan import FeaturePlan
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import build_training_frame, training_templates
+
+EDGE_CASES = [
+    {'primary_concern': '', 'duration': '1-3 days', 'pain_level': None, 'additional_symptoms': []},
+    {'primary_concern': 'the and of', 'duration': '', 'pain_level': '', 'additional_symptoms': ['Fatigue']},
+    {'primary_concern': 'headache headache headache fever', 'duration': 'unknown', 'additional_symptoms': []},
+    {'primary_concern': 'no words the model knows', 'duration': 'fortnight', 'pain_level': 'Agony',
+     'additional_symptoms': ['Fatigue']},
+    {'primary_concern': 'Severe CHEST pain!!! and  shortness-of-breath', 'duration': 'More than 2 weeks',
+     'pain_level': 'Extreme pain (9-10/10)', 'additional_symptoms': [f"Symptom {i}" for i in range(40)]},
+    {'primary_concern': 'fièvre et toux', 'duration': 'Less than 24 hours'}
+]
+
+@pytest.fixture(scope='module')
+def frame():
+    return build_training_frame(training_templates(), 600, seed=7)
+
+@pytest.fixture(scope='module')
+def inputs(frame):
+    """Varied training-like rows with the edge cases spread through them"""
+    rows = frame.drop(columns='condition').to_dict('records')[::3]
+    for offset, edge_case in enumerate(EDGE_CASES):
+        rows.insert(offset * 30, edge_case)
+    return rows
+
+def reference(vectorizer, scaler, processed_items):
+    """What SymptomAnalyzer computed before the plan: vectorizer.transform and scaler.transform"""
+    text = vectorizer.transform([item['primary_concern'] for item in processed_items]).toarray()
+    numeric = np.array([
+        [
+            SymptomAnalyzer.DURATION_CODES.get(item['duration'], 2),
+            SymptomAnalyzer.PAIN_SCORES.get(item.get('pain_level', 'No pain (0/10)'), 0),
+            len(item.get('additional_symptoms', []))
+        ]
+        for item in processed_items
+    ], dtype=float)
+    return np.hstack([text, scaler.transform(numeric)])
+
+def fit(frame, **vectorizer_params):
+    vectorizer = TfidfVectorizer(**{'max_features': 1000, 'stop_words': 'english', **vectorizer_params})
+    vectorizer.fit(frame['primary_concern'])
+    numeric = np.column_stack([
+        frame['duration'].map(SymptomAnalyzer.DURATION_CODES),
+        frame['pain_level'].fillna('No pain (0/10)').map(SymptomAnalyzer.PAIN_SCORES),
+        frame['additional_symptoms'].apply(len)
+    ]).astype(float)
+    scaler = StandardScaler().fit(numeric)
+    plan = FeaturePlan(vectorizer, scaler, SymptomAnalyzer.DURATION_CODES, SymptomAnalyzer.PAIN_SCORES)
+    return vectorizer, scaler, plan
+
+@pytest.mark.parametrize('vectorizer_params', [
+    {}, {'sublinear_tf': True}, {'binary': True}, {'norm': None}, {'use_idf': False}
+])
+def test_mixed_batch_matches_vectorizer_and_scaler(frame, inputs, vectorizer_params):
+    vectorizer, scaler, plan = fit(frame, **vectorizer_params)
+    np.testing.assert_array_equal(plan.transform(inputs), reference(vectorizer, scaler, inputs))
+
+def test_single_rows_and_edge_cases_match(frame, inputs):
+    vectorizer, scaler, plan = fit(frame)
+    for item in EDGE_CASES + inputs[:20]:
+        np.testing.assert_array_equal(plan.transform([item]), reference(vectorizer, scaler, [item]))
+
+def test_reused_output_buffer_is_overwritten(frame, inputs):
+    vectorizer, scaler, plan = fit(frame)
+    out = np.full((len(inputs) + 5, plan.n_features), np.nan)
+    features = plan.transform(inputs, out=out)
+    assert np.shares_memory(features, out)
+    np.testing.assert_array_equal(features, reference(vectorizer, scaler, inputs))
+    
+    np.testing.assert_array_equal(plan.transform(EDGE_CASES, out=out), reference(vectorizer, scaler, EDGE_CASES))
+
+def test_empty_batch(frame):
+    _, _, plan = fit(frame)
+    assert plan.transform([]).shape == (0, plan.n_features)
+
+def test_matches_compares_the_fitted_state(frame):
+    _, _, plan = fit(frame)
+    assert plan.matches(fit(frame)[2])
+    assert not plan.matches(fit(frame, sublinear_tf=True)[2])
+    assert not plan.matches(fit(build_training_frame(training_templates(), 600, seed=8))[2])
+    assert not plan.matches(None)
@@ -0,0 +1,45 @@
+# tests/test_model_admin.py
+import pytest
+from fastapi.testclient import TestClient
+
+import main as api
+
+class StubRetrainer:
+    def __init__(self):
+        self.rollbacks = 0
+    
+    def rollback(self):
+        self.rollbacks += 1
+        return 'previous'
+
+@pytest.fixture
+def retrainer(monkeypatch):
+    retrainer = StubRetrainer()
+    monkeypatch.setattr(api, 'model_retrainer', retrainer)
+    monkeypatch.setattr(api, 'symptom_analyzer', type('Analyzer', (), {'model_version': 'current'})())
+    monkeypatch.setattr(api, 'service_ready', True)
+    return retrainer
+
+def test_rollback_is_disabled_without_an_admin_token(retrainer, monkeypatch):
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', '')
+    response = TestClient(api.app).post('/model/rollback', headers={'X-Admin-Token': ''})
+    assert response.status_code == 403
+    assert retrainer.rollbacks == 0
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': 'wrong'}])
+def test_rollback_rejects_a_missing_or_wrong_token(retrainer, monkeypatch, headers):
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', 'secret')
+    response = TestClient(api.app).post('/model/rollback', headers=headers)
+    assert response.status_code == 401
+    assert retrainer.rollbacks == 0
+
+def test_rollback_with_the_admin_token(retrainer, monkeypatch):
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', 'secret')
+    response = TestClient(api.app).post('/model/rollback', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.json() == {'model_version': 'previous', 'rolled_back': 'current'}
+    assert retrainer.rollbacks == 1
+
+def test_cascade_threshold_cannot_change_at_runtime():
+    response = TestClient(api.app).post('/model/cascade', json={'threshold': 0.5})
+    assert response.status_code in (404, 405)
@@ -0,0 +1,75 @@
+# tests/test_model_bundle.py
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from models.model_bundle import CURRENT_POINTER, BundleError, ModelBundle
+
+def make_artifacts(seed: int):
+    rng = np.random.default_rng(seed)
+    scaler = StandardScaler().fit(rng.normal(size=(50, 4)))
+    arrays = {'trees': {'threshold': rng.normal(size=64), 'feature': rng.integers(0, 4, size=64)}}
+    return {'scaler': scaler}, arrays
+
+def write_bundle(model_dir, seed: int = 0, activate: bool = True) -> ModelBundle:
+    components, arrays = make_artifacts(seed)
+    return ModelBundle.write(model_dir, components, arrays, {'feature_names': ['a', 'b', 'c', 'd']},
+                             activate=activate)
+
+def test_round_trip_maps_arrays_read_only(tmp_path):
+    written = write_bundle(tmp_path)
+    bundle = ModelBundle.load_current(tmp_path)
+    assert bundle.version == written.version
+    assert bundle.manifest['feature_names'] == ['a', 'b', 'c', 'd']
+    
+    components, expected = make_artifacts(0)
+    arrays = bundle.load_arrays('trees')
+    for name, array in expected['trees'].items():
+        np.testing.assert_array_equal(arrays[name], array)
+        assert arrays[name].dtype == array.dtype
+        assert not arrays[name].flags.writeable
+    
+    scaler = bundle.load_component('scaler')
+    assert isinstance(scaler.mean_, np.memmap)
+    np.testing.assert_array_equal(scaler.mean_, components['scaler'].mean_)
+    np.testing.assert_array_equal(bundle.load_component('scaler', mmap=False).scale_, components['scaler'].scale_)
+    with pytest.raises(BundleError):
+        bundle.load_arrays('missing')
+
+def test_identical_content_keeps_its_version(tmp_path):
+    assert write_bundle(tmp_path).version == write_bundle(tmp_path).version
+    assert write_bundle(tmp_path, seed=1).version != write_bundle(tmp_path).version
+
+def test_corrupted_array_fails_its_checksum(tmp_path):
+    bundle = write_bundle(tmp_path)
+    array_path = bundle.path / "arrays" / "trees" / "threshold.npy"
+    data = bytearray(array_path.read_bytes())
+    data[-1] ^= 0xFF
+    array_path.write_bytes(bytes(data))
+    
+    with pytest.raises(BundleError, match="checksum"):
+        ModelBundle.load(bundle.path)
+    # Unverified loads trust the files as they are
+    assert ModelBundle.load(bundle.path, verify=False).version == bundle.version
+
+def test_missing_file_fails_verification(tmp_path):
+    bundle = write_bundle(tmp_path)
+    (bundle.path / "scaler.joblib").unlink()
+    with pytest.raises(BundleError, match="missing"):
+        ModelBundle.load(bundle.path)
+
+def test_activate_moves_current(tmp_path):
+    assert ModelBundle.current_path(tmp_path) is None
+    assert ModelBundle.load_current(tmp_path) is None
+    
+    first = write_bundle(tmp_path)
+    second = write_bundle(tmp_path, seed=1, activate=False)
+    assert ModelBundle.current_path(tmp_path) == first.path
+    
+    second.activate(tmp_path)
+    assert ModelBundle.current_path(tmp_path) == second.path
+    assert (tmp_path / CURRENT_POINTER).read_text() == second.version + "\n"
+    assert ModelBundle.load_current(tmp_path).version == second.version
+    # No temporary directories or pointer files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == [CURRENT_POINTER, 'bundles']
+    assert sorted(p.name for p in (tmp_path / 'bundles').iterdir()) == sorted([first.version, second.version])
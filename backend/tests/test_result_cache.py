@@ -0,0 +1,30 @@
+# tests/test_result_cache.py
+from models.risk_calculator import RiskCalculator
+from utils.result_cache import AnalysisResultCache
+
+BASE = {
+    'primary_concern': 'chest pain', 'duration': '1-3 days', 'pain_level': 'Moderate pain (4-6/10)',
+    'additional_symptoms': ['Fatigue'], 'medical_history': ['diabetes']
+}
+
+def test_key_splits_ages_with_different_risk_factors():
+    calculator = RiskCalculator()
+    for younger, older in ((65, 66), (75, 76)):
+        first, second = dict(BASE, age=younger), dict(BASE, age=older)
+        assert (
+            calculator._identify_primary_risk_factors(first, 'Angina')
+            != calculator._identify_primary_risk_factors(second, 'Angina')
+        )
+        assert AnalysisResultCache.make_key(first) != AnalysisResultCache.make_key(second)
+
+def test_key_ignores_patient_fields_and_history_order():
+    key = AnalysisResultCache.make_key(dict(BASE, age=40, medical_history=['asthma', 'diabetes']))
+    assert key == AnalysisResultCache.make_key(
+        dict(BASE, age=40, medical_history=['diabetes', 'asthma'], patient_id='p1', timestamp='2024-01-01')
+    )
+
+def test_recorded_worker_lookups_count_in_stats():
+    cache = AnalysisResultCache(max_entries=8, ttl_seconds=60)
+    cache.record_lookups(hits=3, misses=1)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (3, 1, 0.75)
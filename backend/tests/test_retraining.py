@@ -0,0 +1,238 @@
+# tests/test_retraining.py
+import asyncio
+import shutil
+
+import numpy as np
+import pytest
+
+from database.db_manager import DatabaseManager
+from models import retraining
+from models.model_bundle import ModelBundle
+from models.retraining import FeedbackRetrainer, retrain_from_feedback
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import train, training_templates
+from utils.data_preprocessor import DataPreprocessor
+
+# More symptoms than any template row, so feedback features never equal replay features
+FEEDBACK_SYMPTOMS = ['Fatigue'] * 8
+
+class StubDB:
+    """Serves feedback examples like DatabaseManager.iter_feedback_examples"""
+    
+    def __init__(self, examples, fail_at_batch=None):
+        self.examples = examples
+        self.fail_at_batch = fail_at_batch
+    
+    async def iter_feedback_examples(self, after_id=0, batch_size=500):
+        rows = [example for example in self.examples if example['feedback_id'] > after_id]
+        for number, start in enumerate(range(0, len(rows), batch_size)):
+            if number == self.fail_at_batch:
+                raise ConnectionError("connection lost")
+            yield rows[start:start + batch_size]
+
+class ScriptedCandidate:
+    """Candidate model that predicts like the served one except where a test says otherwise"""
+    
+    def __init__(self, model, drop_class=False, wrong_everywhere=False, wrong_rows=None):
+        self.model = model
+        self.drop_class = drop_class
+        self.wrong_everywhere = wrong_everywhere
+        self.wrong_rows = wrong_rows
+    
+    def fit(self, X, y, sample_weight=None):
+        self.classes_ = self.model.classes_[:-1] if self.drop_class else self.model.classes_
+        self.n_iter_ = 1
+        return self
+    
+    def predict(self, X):
+        predicted = self.model.predict(X)
+        if self.wrong_everywhere:
+            wrong = np.ones(len(X), dtype=bool)
+        elif self.wrong_rows is not None:
+            wrong = (X[:, None, :] == self.wrong_rows[None, :, :]).all(axis=2).any(axis=1)
+        else:
+            wrong = np.zeros(len(X), dtype=bool)
+        return np.where(wrong, (predicted + 1) % len(self.model.classes_), predicted)
+
+@pytest.fixture(scope='module')
+def trained_dir(tmp_path_factory):
+    analyzer = SymptomAnalyzer()
+    analyzer.model_path = tmp_path_factory.mktemp('trained')
+    analyzer._save_models(training=train(analyzer, rows=1500, cascade_depth=4))
+    return analyzer.model_path
+
+@pytest.fixture
+def analyzer(trained_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(retraining, 'RETRAIN_REPLAY_ROWS', 1000)
+    monkeypatch.setattr(retraining, 'RETRAIN_MIN_FEEDBACK', 10)
+    monkeypatch.setattr(retraining, 'FEEDBACK_BATCH_SIZE', 8)
+    # Feedback examples are already normalized, so skip the NLTK text processing
+    monkeypatch.setattr(DataPreprocessor, 'process_symptoms_many_sync', lambda self, items: [dict(item) for item in items])
+    
+    async def retrain_in_process(self, bundle, examples):
+        return retrain_from_feedback(str(bundle.path), examples, seed=1)
+    monkeypatch.setattr(FeedbackRetrainer, '_retrain', retrain_in_process)
+    
+    shutil.copytree(trained_dir, tmp_path, dirs_exist_ok=True)
+    analyzer = SymptomAnalyzer()
+    analyzer.model_path = tmp_path
+    analyzer.load_models_sync()
+    return analyzer
+
+def make_feedback(analyzer, ids):
+    """Feedback on template concerns, diagnosed as the served model predicts them"""
+    templates = training_templates().to_dict('records')
+    examples = [
+        {
+            'feedback_id': feedback_id, 'primary_concern': templates[i % len(templates)]['primary_concern'],
+            'duration': templates[i % len(templates)]['duration'],
+            'pain_level': templates[i % len(templates)]['pain_level'], 'additional_symptoms': FEEDBACK_SYMPTOMS
+        }
+        for i, feedback_id in enumerate(ids)
+    ]
+    features = analyzer._extract_features_many(examples)
+    names = {index: condition for condition, index in analyzer.condition_mappings.items()}
+    for example, predicted in zip(examples, analyzer.primary_model.predict(features)):
+        example['actual_diagnosis'] = names[predicted]
+    return examples, features
+
+def run(retrainer):
+    return asyncio.run(retrainer.run_once())
+
+def test_accepted_candidate_is_swapped_in_and_rollback_skips_its_feedback(analyzer, monkeypatch):
+    # The review margin is covered by the rejection tests
+    monkeypatch.setattr(retraining, 'RETRAIN_MAX_REGRESSION', 1.0)
+    original = analyzer.model_bundle
+    examples, _ = make_feedback(analyzer, range(20, 80))
+    swaps = []
+    retrainer = FeedbackRetrainer(analyzer, StubDB(examples), on_swap=lambda: swaps.append(True), interval=0)
+    
+    report = run(retrainer)
+    assert report['accepted'] and report['reason'] is None
+    assert report['new_feedback'] == 60 and report['feedback_through_id'] == 79
+    assert analyzer.model_version == report['bundle']
+    assert ModelBundle.current_path(analyzer.model_path).name == report['bundle']
+    np.testing.assert_array_equal(analyzer.model_bundle.load_arrays('feedback')['ids'], np.arange(20, 80))
+    assert swaps == [True]
+    
+    assert retrainer.rollback() == original.version
+    assert analyzer.model_version == original.version
+    assert ModelBundle.current_path(analyzer.model_path) == original.path
+    assert retrainer.stats()['skip_through_id'] == 79
+    # The same feedback does not trigger another run on the restored model
+    assert run(retrainer) is None
+    assert retrainer.stats()['runs'] == 1
+    
+    # Nor in a worker started after the rollback, which loads CURRENT
+    restarted = SymptomAnalyzer()
+    restarted.model_path = analyzer.model_path
+    restarted.load_models_sync()
+    assert restarted.model_version == original.version
+    other = FeedbackRetrainer(restarted, StubDB(examples), interval=0)
+    assert other.stats()['skip_through_id'] == 79
+    assert run(other) is None
+
+@pytest.mark.parametrize('script, reason', [
+    ({'drop_class': True}, "candidate is missing conditions"),
+    ({'wrong_everywhere': True}, "replay holdout accuracy regressed"),
+    ({'wrong_rows': 'feedback'}, "feedback holdout accuracy regressed"),
+])
+def test_rejected_candidate_is_not_swapped_and_its_feedback_is_skipped(analyzer, monkeypatch, script, reason):
+    original = analyzer.model_bundle
+    # ids below 20 fall in the feedback holdout
+    examples, features = make_feedback(analyzer, range(1, 60))
+    if script.get('wrong_rows') == 'feedback':
+        script = {'wrong_rows': features}
+    model = analyzer.primary_model
+    monkeypatch.setattr(retraining, 'make_estimator', lambda trainer, seed: ScriptedCandidate(model, **script))
+    retrainer = FeedbackRetrainer(analyzer, StubDB(examples), interval=0)
+    
+    report = run(retrainer)
+    assert not report['accepted'] and report['reason'] == reason
+    assert report['feedback_holdout'] == 19
+    assert 'bundle' not in report
+    assert analyzer.model_version == original.version
+    assert ModelBundle.current_path(analyzer.model_path) == original.path
+    assert retrainer.stats()['skip_through_id'] == 59
+    assert run(retrainer) is None
+    
+    # Enough newer feedback retries with everything since the served model
+    retrainer.db_manager.examples += make_feedback(analyzer, range(60, 80))[0]
+    assert run(retrainer)['new_feedback'] == 79
+
+def test_run_keeps_the_newest_feedback_up_to_the_cap(analyzer, monkeypatch):
+    monkeypatch.setattr(retraining, 'RETRAIN_MAX_FEEDBACK', 25)
+    model = analyzer.primary_model
+    monkeypatch.setattr(retraining, 'make_estimator', lambda trainer, seed: ScriptedCandidate(model, drop_class=True))
+    examples, _ = make_feedback(analyzer, range(20, 80))
+    
+    report = run(FeedbackRetrainer(analyzer, StubDB(examples), interval=0))
+    assert report['new_feedback'] == 25
+    assert report['feedback_through_id'] == 79
+
+def test_failed_feedback_read_fails_the_run(analyzer):
+    examples, _ = make_feedback(analyzer, range(20, 80))
+    retrainer = FeedbackRetrainer(analyzer, StubDB(examples, fail_at_batch=1), interval=0.01)
+    with pytest.raises(ConnectionError):
+        run(retrainer)
+    
+    async def run_briefly():
+        task = asyncio.create_task(retrainer.run_forever())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    asyncio.run(run_briefly())
+    stats = retrainer.stats()
+    assert stats['failed'] >= 1 and stats['runs'] == 0
+    assert stats['last_error'] == "connection lost"
+
+class FailingCursor:
+    def __init__(self):
+        self.fetches = 0
+    
+    async def fetch(self, batch_size):
+        self.fetches += 1
+        if self.fetches > 1:
+            raise ConnectionError("connection lost")
+        return [{
+            'feedback_id': 1, 'actual_diagnosis': 'Migraine', 'primary_concern': 'headache',
+            'duration': '1-3 days', 'pain_level': None, 'additional_symptoms': '["Nausea"]'
+        }]
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+class FakeConnection:
+    def transaction(self):
+        return FakeTransaction()
+    
+    async def cursor(self, query, *args):
+        return FailingCursor()
+
+class FakeAcquire:
+    async def __aenter__(self):
+        return FakeConnection()
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+class FakePool:
+    def acquire(self):
+        return FakeAcquire()
+
+def test_feedback_stream_raises_database_errors():
+    db = DatabaseManager()
+    db.pool = FakePool()
+    
+    async def read():
+        batches = []
+        async for batch in db.iter_feedback_examples(0, batch_size=1):
+            batches.append(batch)
+        return batches
+    
+    with pytest.raises(ConnectionError):
+        asyncio.run(read())
@@ -0,0 +1,135 @@
+# tests/test_risk_backfill.py
+import asyncio
+import random
+
+import pytest
+
+from models.risk_calculator import RiskCalculator
+from utils.data_preprocessor import DataPreprocessor
+from utils.risk_backfill import RiskBackfill
+
+class StubDB:
+    """Serves stored rows in chunks and records checkpoint writes; write number fail_write fails"""
+    
+    def __init__(self, rows, finished=False, last_id=0, fail_write=None):
+        self.pool = object()
+        self.rows = rows
+        self.checkpoint = {'last_id': last_id, 'finished_at': '2026-01-01' if finished else None}
+        self.fail_write = fail_write
+        self.writes = []
+        self.in_flight = False
+        self.finished = 0
+        self.cursor_open = False
+    
+    async def start_risk_backfill(self, job, restart=False):
+        return dict(self.checkpoint)
+    
+    async def iter_risk_inputs(self, after_id=0, batch_size=5000):
+        rows = [row for row in self.rows if row['id'] > after_id]
+        self.cursor_open = True
+        try:
+            for start in range(0, len(rows), batch_size):
+                yield rows[start:start + batch_size]
+        finally:
+            self.cursor_open = False
+    
+    async def update_risk_scores(self, job, updates, last_id, scanned):
+        assert not self.in_flight, "checkpoint writes overlapped"
+        self.in_flight = True
+        # Give the backfill a chance to start the next write too early
+        await asyncio.sleep(0.01)
+        self.in_flight = False
+        self.writes.append(last_id)
+        return len(self.writes) != self.fail_write
+    
+    async def finish_risk_backfill(self, job):
+        self.finished += 1
+
+@pytest.fixture(scope='module')
+def calculator():
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    return calculator
+
+def stored_rows(calculator, count, seed=5):
+    """Stored analyses with risk fields that may or may not match the current profiles"""
+    rng = random.Random(seed)
+    conditions = list(calculator.condition_risk_profiles) + ['Unlisted Condition']
+    history = ['diabetes', 'heart disease', 'asthma', 'copd', 'none']
+    rows = []
+    for row_id in range(1, count + 1):
+        rows.append({
+            'id': row_id,
+            'condition_prediction': rng.choice(conditions),
+            'confidence': round(rng.random(), 3),
+            'duration': rng.choice(list(calculator.DURATION_MODIFIERS) + ['']),
+            'pain_level': rng.choice(list(calculator.SEVERITY_MODIFIERS) + [None]),
+            'age': rng.choice([None, 8, 30, 66, 80]),
+            'additional_symptoms': rng.sample(['Fever', 'Chest pain', 'Nausea', 'Dizziness'], rng.randint(0, 3)),
+            'medical_history': rng.sample(history, rng.randint(0, 3)),
+            'risk_score': rng.randint(0, 100),
+            'urgency_level': rng.choice(['routine', 'urgent']),
+            'follow_up_days': rng.choice([None, 1, 7])
+        })
+    return rows
+
+def test_rescore_matches_scalar_scoring(calculator):
+    preprocessor = DataPreprocessor()
+    rows = stored_rows(calculator, 40)
+    # Rows already scored with the current profiles are left alone
+    for row in rows[:10]:
+        expected = calculator.calculate_risk_sync(
+            {'primary_condition': row['condition_prediction'], 'confidence': row['confidence']},
+            preprocessor.process_risk_inputs_sync(row)
+        )
+        row.update(risk_score=expected['risk_score'], urgency_level=expected['urgency_level'],
+                   follow_up_days=expected['follow_up_days'])
+    rows[-1]['condition_prediction'] = None
+    
+    updates, unscored = RiskBackfill(StubDB(rows), calculator, preprocessor).rescore(rows)
+    assert unscored == 1
+    changed = {update[0]: update[1:] for update in updates}
+    for row in rows[:-1]:
+        expected = calculator.calculate_risk_sync(
+            {'primary_condition': row['condition_prediction'], 'confidence': row['confidence']},
+            preprocessor.process_risk_inputs_sync(row)
+        )
+        expected = (expected['risk_score'], expected['urgency_level'], expected['follow_up_days'])
+        stored = (row['risk_score'], row['urgency_level'], row['follow_up_days'])
+        assert changed.get(row['id'], stored) == expected, row
+        assert (row['id'] in changed) == (stored != expected)
+    assert not set(changed) & {row['id'] for row in rows[:10]}
+
+def test_checkpoints_advance_in_order_and_stop_at_a_failed_write(calculator):
+    db = StubDB(stored_rows(calculator, 50), fail_write=2)
+    backfill = RiskBackfill(db, calculator, DataPreprocessor(), chunk_size=10)
+    
+    async def scenario():
+        with pytest.raises(RuntimeError, match="resume from the last checkpoint"):
+            await backfill.run(job='test')
+        # The cursor is released as soon as the run fails
+        assert not db.cursor_open
+    asyncio.run(scenario())
+    
+    # The second write failed, so the third chunk's write was never started
+    assert db.writes == [10, 20]
+    assert db.finished == 0
+
+def test_completed_run_writes_every_chunk_then_finishes(calculator):
+    db = StubDB(stored_rows(calculator, 25))
+    summary = asyncio.run(RiskBackfill(db, calculator, DataPreprocessor(), chunk_size=10).run(job='test'))
+    assert db.writes == [10, 20, 25]
+    assert db.finished == 1
+    assert summary['rows_scanned'] == 25 and summary['resumed_after_id'] == 0
+
+def test_finished_job_rescores_only_newer_analyses(calculator):
+    db = StubDB(stored_rows(calculator, 25), finished=True, last_id=20)
+    summary = asyncio.run(RiskBackfill(db, calculator, DataPreprocessor(), chunk_size=10).run(job='test'))
+    assert db.writes == [25]
+    assert summary['rows_scanned'] == 5 and summary['resumed_after_id'] == 20
+
+def test_dry_run_writes_nothing(calculator):
+    db = StubDB(stored_rows(calculator, 25), finished=True, last_id=20)
+    summary = asyncio.run(RiskBackfill(db, calculator, DataPreprocessor(), chunk_size=10, dry_run=True).run(job='test'))
+    assert db.writes == [] and db.finished == 0
+    assert summary['rows_scanned'] == 25
@@ -0,0 +1,49 @@
+# tests/test_risk_batch.py
+import numpy as np
+import pytest
+
+from tests.parity import build_inputs, count_mismatches, random_columns
+from models.risk_calculator import RiskCalculator
+
+ROWS = 2000
+
+@pytest.fixture(scope='module')
+def calculators():
+    calculators = {}
+    for lookup_table in (False, True):
+        calculators[lookup_table] = RiskCalculator(lookup_table=lookup_table)
+        calculators[lookup_table].initialize_sync()
+    return calculators
+
+@pytest.fixture(scope='module')
+def inputs(calculators):
+    # Both paths read the same dicts, so requests can skip the NLTK text processing
+    return build_inputs(calculators[False], ROWS, seed=3, preprocess=dict)
+
+@pytest.mark.parametrize('lookup_table', [False, True])
+def test_batch_matches_scalar_path(calculators, inputs, lookup_table):
+    calculator = calculators[lookup_table]
+    analyses, processed = inputs
+    scalar = calculator.calculate_risk_many_sync(analyses, processed)
+    batch = calculator.calculate_risk_batch(**calculator.encode_risk_inputs(analyses, processed))
+    
+    assert count_mismatches(batch, scalar, calculator.FOLLOW_UP_IMMEDIATE) == {
+        'risk_score': 0, 'urgency_level': 0, 'follow_up_days': 0
+    }
+
+def test_inputs_cover_the_scalar_branches(calculators, inputs):
+    analyses, processed = inputs
+    ages = [item.get('age') for item in processed]
+    assert {None, 0, 65, 75, 76} <= set(ages)
+    assert {0.5, 0.8} <= {analysis['confidence'] for analysis in analyses}
+    assert 'Unlisted Condition' in {analysis['primary_condition'] for analysis in analyses}
+
+def test_table_matches_arithmetic_outside_encoded_inputs(calculators):
+    columns = random_columns(calculators[False], ROWS, seed=5)
+    # Past the table: comorbidity counts beyond its last one and negative symptom weights
+    assert (columns['comorbidity_count'] > RiskCalculator.TABLE_MAX_COMORBIDITIES).any()
+    assert (columns['other_symptom_weight'] < 0).any()
+    arithmetic = calculators[False].calculate_risk_batch(**columns)
+    table = calculators[True].calculate_risk_batch(**columns)
+    for name in arithmetic:
+        np.testing.assert_array_equal(table[name], arithmetic[name], err_msg=name)
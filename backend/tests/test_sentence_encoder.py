@@ -0,0 +1,67 @@
+# tests/test_sentence_encoder.py
+import asyncio
+import logging
+import sys
+import types
+
+import pytest
+
+import models.symptom_analyzer as symptom_analyzer
+from models.sentence_encoder import OnnxSentenceEncoder, onnx_model_dir
+from models.symptom_analyzer import SymptomAnalyzer
+
+class FakeSentenceTransformer:
+    """Stands in for sentence_transformers.SentenceTransformer"""
+    
+    loaded = []
+    
+    def __init__(self, name: str):
+        self.name = name
+        FakeSentenceTransformer.loaded.append(name)
+
+@pytest.fixture
+def sentence_transformers(monkeypatch):
+    FakeSentenceTransformer.loaded = []
+    module = types.ModuleType('sentence_transformers')
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', module)
+    return module
+
+@pytest.fixture
+def analyzer(monkeypatch, tmp_path):
+    monkeypatch.setattr(symptom_analyzer, 'EMBEDDING_BACKEND', 'onnx')
+    analyzer = SymptomAnalyzer()
+    analyzer.model_path = tmp_path
+    return analyzer
+
+def test_missing_export_falls_back_to_sentence_transformers(analyzer, sentence_transformers, caplog):
+    assert not onnx_model_dir(analyzer.model_path, analyzer.SENTENCE_MODEL_NAME).exists()
+    with caplog.at_level(logging.WARNING, logger='models.symptom_analyzer'):
+        model = analyzer.get_sentence_model()
+    
+    assert isinstance(model, FakeSentenceTransformer)
+    assert FakeSentenceTransformer.loaded == [analyzer.SENTENCE_MODEL_NAME]
+    assert 'Could not load ONNX sentence encoder' in caplog.text
+
+def test_missing_onnxruntime_falls_back_to_sentence_transformers(analyzer, sentence_transformers, monkeypatch):
+    # A None entry makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, 'onnxruntime', None)
+    with pytest.raises(ImportError):
+        OnnxSentenceEncoder(onnx_model_dir(analyzer.model_path, analyzer.SENTENCE_MODEL_NAME))
+    
+    assert isinstance(analyzer.get_sentence_model(), FakeSentenceTransformer)
+
+def test_no_encoder_at_all_disables_similar_conditions(analyzer, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'onnxruntime', None)
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', None)
+    analyzer.condition_mappings = {'Migraine': 0, 'Angina': 1}
+    
+    assert analyzer.get_sentence_model() is None
+    assert analyzer.get_condition_index() is None
+    assert asyncio.run(analyzer.get_similar_conditions('headache')) == []
+
+def test_loading_is_attempted_once(analyzer, sentence_transformers, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'onnxruntime', None)
+    first = analyzer.get_sentence_model()
+    assert analyzer.get_sentence_model() is first
+    assert len(FakeSentenceTransformer.loaded) == 1
@@ -0,0 +1,48 @@
+# tests/test_symptom_analyzer.py
+import numpy as np
+import pytest
+
+from models.symptom_analyzer import SymptomAnalyzer
+
+LABELS = np.array(['Angina', 'Arthritis', 'Migraine', 'Viral Syndrome', 'Gastroenteritis', 'Asthma Exacerbation'], dtype=object)
+
+@pytest.fixture
+def analyzer():
+    analyzer = SymptomAnalyzer()
+    analyzer.condition_labels = LABELS
+    return analyzer
+
+def tied_probabilities(rows: int, seed: int) -> np.ndarray:
+    """Rows drawn from a few values, so most rows have ties, including for the maximum"""
+    rng = np.random.default_rng(seed)
+    probabilities = rng.choice([0.0, 0.1, 0.2, 0.3], size=(rows, len(LABELS)))
+    return probabilities / probabilities.sum(axis=1, keepdims=True).clip(min=1e-12)
+
+@pytest.mark.parametrize('top_k', [1, 3, len(LABELS)])
+def test_top_conditions_rank_ties_by_column(analyzer, top_k):
+    probabilities = tied_probabilities(500, seed=top_k)
+    top_indices, top_probabilities = analyzer.top_conditions(probabilities, top_k)
+    
+    assert top_indices.shape == (len(probabilities), top_k)
+    np.testing.assert_array_equal(top_probabilities, np.take_along_axis(probabilities, top_indices, axis=1))
+    np.testing.assert_array_equal(top_probabilities[:, 0], probabilities.max(axis=1))
+    # Descending probability, then ascending column within equal probabilities
+    assert (np.diff(top_probabilities, axis=1) <= 0).all()
+    ties = np.diff(top_probabilities, axis=1) == 0
+    assert (np.diff(top_indices, axis=1)[ties] > 0).all()
+
+def test_full_ranking_matches_a_stable_sort(analyzer):
+    probabilities = tied_probabilities(500, seed=7)
+    top_indices, _ = analyzer.top_conditions(probabilities, len(LABELS))
+    np.testing.assert_array_equal(top_indices, np.argsort(-probabilities, axis=1, kind='stable'))
+    np.testing.assert_array_equal(top_indices[:, 0], np.argmax(probabilities, axis=1))
+
+@pytest.mark.parametrize('top_k', [1, 3])
+def test_primary_condition_is_the_first_differential_entry(analyzer, top_k):
+    probabilities = tied_probabilities(200, seed=11)
+    top_indices, top_probabilities = analyzer.top_conditions(probabilities, top_k)
+    features = np.zeros(3)
+    for indices, top_row in zip(top_indices, top_probabilities):
+        analysis = analyzer._build_analysis({'primary_concern': 'headache'}, indices, top_row, features, None)
+        assert analysis['primary_condition'] == analysis['differential'][0]['condition']
+        assert analysis['confidence'] == analysis['differential'][0]['probability']
@@ -0,0 +1,78 @@
+# tests/test_tree_engine.py
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+
+from models.tree_engine import COMPILED_MAX_ROWS, CompiledTreeEnsemble
+
+N_FEATURES = 6
+# Both sides of the compiled/sklearn crossover
+BATCH_SIZES = (1, COMPILED_MAX_ROWS - 1, COMPILED_MAX_ROWS, COMPILED_MAX_ROWS + 1, 300)
+
+def make_data(rows: int, n_classes: int, seed: int, missing: float = 0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1) * (n_classes - 2)
+    if missing:
+        X[rng.random(X.shape) < missing] = np.nan
+    return X, y
+
+def inputs(engine: CompiledTreeEnsemble, seed: int, missing: float = 0.0) -> np.ndarray:
+    """Random rows, plus rows with a split feature exactly on its threshold"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(max(BATCH_SIZES), N_FEATURES))
+    splits = np.flatnonzero(engine.children[0::2] != np.arange(len(engine.feature)))
+    picked = rng.choice(splits, size=len(X) // 2)
+    X[np.arange(len(picked)), engine.feature[picked]] = engine.threshold[picked]
+    if missing:
+        X[rng.random(X.shape) < missing] = np.nan
+    return X
+
+def assert_parity(model, engine: CompiledTreeEnsemble, X: np.ndarray):
+    np.testing.assert_array_equal(engine.classes_, model.classes_)
+    for size in BATCH_SIZES:
+        probabilities, predicted = engine.predict(X[:size])
+        np.testing.assert_array_equal(probabilities, model.predict_proba(X[:size]))
+        np.testing.assert_array_equal(predicted, model.predict(X[:size]))
+
+@pytest.fixture(scope='module')
+def gradient_boosting():
+    X, y = make_data(600, n_classes=3, seed=1)
+    return GradientBoostingClassifier(n_estimators=15, max_depth=3, random_state=0).fit(X, y)
+
+@pytest.fixture(scope='module')
+def hist_gradient_boosting():
+    X, y = make_data(600, n_classes=3, seed=2, missing=0.1)
+    return HistGradientBoostingClassifier(max_iter=15, max_depth=4, random_state=0).fit(X, y)
+
+@pytest.mark.parametrize('max_rows', [COMPILED_MAX_ROWS, 10**6])
+def test_gradient_boosting_parity(gradient_boosting, max_rows):
+    engine = CompiledTreeEnsemble(gradient_boosting, max_rows=max_rows)
+    assert_parity(gradient_boosting, engine, inputs(engine, seed=3))
+
+def test_binary_gradient_boosting_parity():
+    X, y = make_data(400, n_classes=2, seed=4)
+    model = GradientBoostingClassifier(n_estimators=10, max_depth=2, random_state=0).fit(X, y)
+    engine = CompiledTreeEnsemble(model, max_rows=10**6)
+    assert_parity(model, engine, inputs(engine, seed=5))
+
+@pytest.mark.parametrize('max_rows', [COMPILED_MAX_ROWS, 10**6])
+def test_hist_gradient_boosting_parity_with_missing_values(hist_gradient_boosting, max_rows):
+    engine = CompiledTreeEnsemble(hist_gradient_boosting, max_rows=max_rows)
+    assert engine.missing_left is not None
+    X = inputs(engine, seed=6, missing=0.15)
+    assert np.isnan(X[:COMPILED_MAX_ROWS]).any()
+    assert_parity(hist_gradient_boosting, engine, X)
+
+def test_from_arrays_round_trip(hist_gradient_boosting):
+    engine = CompiledTreeEnsemble(hist_gradient_boosting, max_rows=10**6)
+    rebuilt = CompiledTreeEnsemble.from_arrays(
+        engine.to_arrays(), reference=lambda: hist_gradient_boosting, max_rows=10**6, **engine.metadata()
+    )
+    assert_parity(hist_gradient_boosting, rebuilt, inputs(engine, seed=7, missing=0.15))
+
+def test_gradient_boosting_rejects_missing_values(gradient_boosting):
+    X = np.zeros((1, N_FEATURES))
+    X[0, 0] = np.nan
+    with pytest.raises(ValueError):
+        CompiledTreeEnsemble(gradient_boosting).predict(X)
@@ -0,0 +1,100 @@
+# tests/test_tree_explainer.py
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+
+from models.symptom_analyzer import SymptomAnalyzer
+from models.tree_engine import CompiledTreeEnsemble
+from models.tree_explainer import TreePathExplainer
+
+N_FEATURES = 6
+PROCESSED = {'duration': '1-3 days', 'pain_level': 'Mild pain (1-3/10)', 'additional_symptoms': ['fever']}
+
+def make_data(rows: int, n_classes: int, seed: int, missing: float = 0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1) * (n_classes - 2)
+    if missing:
+        X[rng.random(X.shape) < missing] = np.nan
+    return X, y
+
+def raw_scores(model, X: np.ndarray) -> np.ndarray:
+    """Raw score of every class column; a binary model's column 0 is the negated log-odds"""
+    scores = model.decision_function(X)
+    return np.column_stack([-scores, scores]) if scores.ndim == 1 else scores
+
+@pytest.fixture(scope='module', params=['gradient_boosting', 'hist_gradient_boosting', 'binary'])
+def fitted(request):
+    if request.param == 'gradient_boosting':
+        X, y = make_data(600, n_classes=3, seed=1)
+        model = GradientBoostingClassifier(n_estimators=15, max_depth=3, random_state=0)
+    elif request.param == 'hist_gradient_boosting':
+        X, y = make_data(600, n_classes=3, seed=2, missing=0.1)
+        model = HistGradientBoostingClassifier(max_iter=15, max_depth=4, random_state=0)
+    else:
+        X, y = make_data(400, n_classes=2, seed=3)
+        model = GradientBoostingClassifier(n_estimators=10, max_depth=2, random_state=0)
+    model.fit(X, y)
+    return model, X[:200]
+
+def test_bias_and_contributions_add_up_to_the_predicted_raw_score(fitted):
+    model, X = fitted
+    predicted = np.searchsorted(model.classes_, model.predict(X))
+    contributions, bias = TreePathExplainer(CompiledTreeEnsemble(model)).explain(X, predicted)
+    assert contributions.shape == X.shape
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), raw_scores(model, X)[np.arange(len(X)), predicted], atol=1e-10)
+
+def test_every_class_column_adds_up(fitted):
+    model, X = fitted
+    explainer = TreePathExplainer(CompiledTreeEnsemble(model))
+    for column in range(len(model.classes_)):
+        contributions, bias = explainer.explain(X, np.full(len(X), column))
+        np.testing.assert_allclose(bias + contributions.sum(axis=1), raw_scores(model, X)[:, column], atol=1e-10)
+
+def test_batch_matches_single_rows(fitted):
+    model, X = fitted
+    explainer = TreePathExplainer(CompiledTreeEnsemble(model))
+    predicted = np.searchsorted(model.classes_, model.predict(X[:20]))
+    contributions, bias = explainer.explain(X[:20], predicted)
+    singles = [explainer.explain(X[[i]], predicted[[i]]) for i in range(20)]
+    np.testing.assert_allclose(contributions, np.vstack([single[0] for single in singles]))
+    np.testing.assert_allclose(bias, np.concatenate([single[1] for single in singles]))
+
+@pytest.fixture
+def analyzer():
+    analyzer = SymptomAnalyzer()
+    analyzer.feature_names = np.array(['chest', 'head', 'cough'] + SymptomAnalyzer.NUMERIC_FEATURES, dtype=object)
+    return analyzer
+
+def test_contributor_impacts_are_shares_of_the_absolute_total(analyzer):
+    contributions = np.array([0.5, -0.25, 0.0, 0.125, -0.0625, 0.0625])
+    contributors = analyzer._generate_contributors(PROCESSED, np.ones(N_FEATURES), contributions)
+    impacts = [contributor['impact'] for contributor in contributors]
+    assert impacts == sorted(impacts, reverse=True) and all(impact > 0 for impact in impacts)
+    assert [contributor['factor'] for contributor in contributors] == [
+        'Symptom term: chest', 'Symptom duration: 1-3 days', 'Additional symptoms: fever'
+    ]
+    # Features working against the class take the rest of the absolute total
+    against = np.abs(contributions[contributions < 0]).sum() / np.abs(contributions).sum()
+    assert sum(impacts) + against == pytest.approx(1.0)
+
+def test_contributor_impacts_sum_to_one_when_all_push_the_same_way(analyzer):
+    contributions = np.array([0.3, 0.0, 0.1, 0.2, 0.0, 0.4])
+    contributors = analyzer._generate_contributors(PROCESSED, np.zeros(N_FEATURES), contributions)
+    assert [contributor['impact'] for contributor in contributors] == pytest.approx([0.4, 0.3, 0.2, 0.1])
+    assert sum(contributor['impact'] for contributor in contributors) == pytest.approx(1.0)
+
+def test_contributors_of_explained_rows(analyzer, fitted):
+    model, X = fitted
+    predicted = np.searchsorted(model.classes_, model.predict(X))
+    contributions, _ = TreePathExplainer(CompiledTreeEnsemble(model)).explain(X, predicted)
+    for row, features in zip(contributions, X):
+        contributors = analyzer._generate_contributors(PROCESSED, features, row)
+        assert len(contributors) <= 5
+        shares = np.abs(row) / np.abs(row).sum()
+        assert shares.sum() == pytest.approx(1.0)
+        np.testing.assert_allclose([contributor['impact'] for contributor in contributors],
+                                   np.sort(shares[row > 0])[::-1][:5])
+
+def test_no_contributions_yield_no_contributors(analyzer):
+    assert analyzer._generate_contributors(PROCESSED, np.zeros(N_FEATURES), np.zeros(N_FEATURES)) == []
@@ -0,0 +1,86 @@
+# tests/test_what_if.py
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main as api
+from models.risk_calculator import RiskCalculator
+from utils import analysis_pipeline
+from utils.analysis_pipeline import AnalysisPipeline, install_pipeline
+from utils.data_preprocessor import DataPreprocessor
+from utils.inference_executor import InferenceExecutor
+
+BASE = {
+    'condition': 'Angina', 'confidence': 0.72, 'duration': '1-3 days', 'pain_level': 'Moderate pain (4-6/10)',
+    'additional_symptoms': ['Fatigue', 'Nausea'], 'age': 58, 'medical_history': ['high blood pressure']
+}
+
+@pytest.fixture(scope='module')
+def calculator():
+    calculator = RiskCalculator()
+    calculator.initialize_sync()
+    return calculator
+
+@pytest.fixture
+def executor(calculator):
+    previous = analysis_pipeline._pipeline
+    # The grid needs no model, only the preprocessor and risk calculator
+    install_pipeline(AnalysisPipeline(DataPreprocessor(), None, calculator))
+    executor = InferenceExecutor(kind='thread', max_workers=1)
+    executor.start()
+    yield executor
+    executor.shutdown()
+    install_pipeline(previous)
+
+@pytest.fixture
+def client(calculator, executor):
+    api.app.dependency_overrides[api.get_risk_calculator] = lambda: calculator
+    api.app.dependency_overrides[api.get_inference_executor] = lambda: executor
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+def test_grid_cells_match_scalar_scoring(client, calculator, executor):
+    request = dict(
+        BASE, ages=[None, 30, 65, 66, 80], durations=list(calculator.DURATION_MODIFIERS),
+        pain_levels=['No pain (0/10)', 'Severe pain (7-8/10)', 'Extreme pain (9-10/10)'],
+        comorbidity_counts=[0, 1, 3]
+    )
+    response = client.post('/risk/what-if', json=request)
+    assert response.status_code == 200
+    body = response.json()
+    assert executor.stats()['completed'] == 1
+    
+    scores, urgency = np.array(body['risk_scores']), np.array(body['urgency'])
+    assert scores.shape == (5, len(calculator.DURATION_MODIFIERS), 3, 3)
+    analysis = {'primary_condition': BASE['condition'], 'confidence': BASE['confidence']}
+    base = DataPreprocessor().process_risk_inputs_sync(BASE)
+    for index in np.ndindex(scores.shape):
+        age, duration, pain_level, count = (body['axes'][axis][i] for axis, i in zip(body['axes'], index))
+        processed_data = {
+            **base, 'age': age, 'duration': duration, 'pain_level': pain_level,
+            'medical_history': ['diabetes'] * count
+        }
+        expected = calculator.calculate_risk_sync(analysis, processed_data)
+        assert expected['risk_score'] == scores[index], index
+        assert expected['urgency_level'] == body['urgency_levels'][urgency[index]], index
+    
+    expected = calculator.calculate_risk_sync(analysis, base)
+    assert body['base'] == {
+        'risk_score': expected['risk_score'], 'urgency_level': expected['urgency_level'],
+        'follow_up_days': expected['follow_up_days']
+    }
+    assert body['unchanged'] + sum(body['transitions'].values()) == scores.size
+
+def test_grid_over_the_limit_is_rejected(client, executor):
+    request = dict(BASE, ages=[20, 40], comorbidity_counts=list(range(api.WHAT_IF_MAX_POINTS // 2 + 1)))
+    response = client.post('/risk/what-if', json=request)
+    assert response.status_code == 413
+    assert str(api.WHAT_IF_MAX_POINTS) in response.json()['detail']
+    assert executor.stats()['completed'] == 0
+
+@pytest.mark.parametrize('axis, value', [('durations', '2 weeks'), ('pain_levels', 'Agony')])
+def test_unknown_axis_values_are_rejected(client, executor, axis, value):
+    response = client.post('/risk/what-if', json=dict(BASE, **{axis: ['1-3 days', value]}))
+    assert response.status_code == 422
+    assert value in response.json()['detail']
+    assert executor.stats()['completed'] == 0
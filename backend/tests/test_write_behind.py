@@ -0,0 +1,136 @@
+# tests/test_write_behind.py
+import asyncio
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+
+from database.write_behind import WriteBehindQueue
+
+class FakeDB:
+    """Records stored rows; COPY can be held, fail a few times or reject given rows"""
+    
+    def __init__(self, bad_ids=(), outages=0):
+        self.bad_ids = set(bad_ids)
+        self.outages = outages
+        self.copies = 0
+        self.copied = []
+        self.inline = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+    
+    async def copy_analyses(self, items, raise_errors=False):
+        self.copies += 1
+        await self.gate.wait()
+        if self.outages:
+            self.outages -= 1
+            raise ConnectionError("connection refused")
+        if any(result.analysis_id in self.bad_ids for _, result in items):
+            raise asyncpg.exceptions.IntegrityConstraintViolationError("duplicate key value")
+        self.copied.extend(result.analysis_id for _, result in items)
+        return True
+    
+    async def store_analysis(self, symptom_input, result):
+        self.inline.append(result.analysis_id)
+        return True
+
+def item(analysis_id):
+    return (SimpleNamespace(patient_id='p1'), SimpleNamespace(analysis_id=analysis_id))
+
+async def fill_while_held(db, writer, count):
+    """Enqueue count items while the first flush waits on the database"""
+    db.gate.clear()
+    writer.start()
+    for analysis_id in range(count):
+        await writer.enqueue(*item(analysis_id))
+        # Let the drain task take the first item before the queue fills
+        await asyncio.sleep(0)
+
+def test_drop_policy_discards_when_full():
+    async def scenario():
+        db = FakeDB()
+        writer = WriteBehindQueue(db, max_rows=1, flush_interval_ms=1, max_queue=2, policy='drop')
+        await fill_while_held(db, writer, 4)
+        db.gate.set()
+        await writer.close()
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert db.copied == [0, 1, 2] and db.inline == []
+    assert stats['dropped'] == 1 and stats['flushed_rows'] == 3
+
+def test_inline_policy_writes_through_when_full():
+    async def scenario():
+        db = FakeDB()
+        writer = WriteBehindQueue(db, max_rows=1, flush_interval_ms=1, max_queue=2, policy='inline')
+        await fill_while_held(db, writer, 4)
+        assert db.inline == [3]
+        db.gate.set()
+        await writer.close()
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert db.copied == [0, 1, 2]
+    assert stats['inline_writes'] == 1 and stats['dropped'] == 0
+
+def test_block_policy_waits_for_space():
+    async def scenario():
+        db = FakeDB()
+        writer = WriteBehindQueue(db, max_rows=1, flush_interval_ms=1, max_queue=2, policy='block')
+        await fill_while_held(db, writer, 3)
+        blocked = asyncio.create_task(writer.enqueue(*item(3)))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        db.gate.set()
+        await asyncio.wait_for(blocked, timeout=1)
+        await writer.close()
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert db.copied == [0, 1, 2, 3] and db.inline == []
+    assert stats['dropped'] == 0 and stats['inline_writes'] == 0
+
+def test_close_flushes_queued_rows_and_writes_later_ones_through():
+    async def scenario():
+        db = FakeDB()
+        # Neither limit is reached before close()
+        writer = WriteBehindQueue(db, max_rows=100, flush_interval_ms=60000, max_queue=100)
+        writer.start()
+        for analysis_id in range(10):
+            await writer.enqueue(*item(analysis_id))
+        await asyncio.sleep(0.01)
+        assert db.copied == []
+        await writer.close()
+        await writer.enqueue(*item(10))
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert db.copied == list(range(10)) and db.copies == 1
+    assert db.inline == [10]
+    assert stats['flushes'] == 1 and stats['queued'] == 0
+
+@pytest.mark.parametrize('outages, stored', [(2, 5), (4, 0)])
+def test_unavailable_database_is_retried(outages, stored):
+    async def scenario():
+        db = FakeDB(outages=outages)
+        writer = WriteBehindQueue(db, max_rows=5, flush_interval_ms=1, max_queue=10, max_retries=3)
+        await writer._flush([item(analysis_id) for analysis_id in range(5)])
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert db.copies == min(outages + 1, 4)
+    assert len(db.copied) == stored
+    assert stats['flushed_rows'] == stored and stats['failed_rows'] == 5 - stored
+
+def test_bad_rows_are_isolated_and_dropped_alone():
+    async def scenario():
+        db = FakeDB(bad_ids={3, 6})
+        writer = WriteBehindQueue(db, max_rows=8, flush_interval_ms=1, max_queue=10)
+        await writer._flush([item(analysis_id) for analysis_id in range(8)])
+        return db, writer.stats()
+    
+    db, stats = asyncio.run(scenario())
+    assert sorted(db.copied) == [0, 1, 2, 4, 5, 7]
+    assert stats['flushed_rows'] == 6 and stats['failed_rows'] == 2 and stats['flushes'] == 1
+    # The batch, its halves and quarters, then single rows only in the two failing quarters
+    assert db.copies == 1 + 2 + 4 + 4
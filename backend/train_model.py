@@ -0,0 +1,60 @@
+# train_model.py
+"""Train the symptom classifier offline and publish it as a model bundle.
+
+Builds the training set, featurizes it once, fits the chosen trainer,
+evaluates it on a held-out split, distills the first-tier cascade model
+and writes a bundle under models/trained_models. The new bundle becomes
+CURRENT unless --no-activate is given; running servers pick it up on
+their next start. The API never trains, so run this before the first
+start.
+
+Usage: python train_model.py --rows 100000 [--trainer hist]
+"""
+import argparse
+import json
+import logging
+import sys
+
+from models.symptom_analyzer import SymptomAnalyzer
+from models.training import TRAINERS, DEFAULT_TRAINER, DEFAULT_ROWS, DEFAULT_CASCADE_DEPTH, train
+
+logger = logging.getLogger("train_model")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train the symptom classifier and write a model bundle")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Training set size, including the test split")
+    parser.add_argument("--trainer", choices=TRAINERS, default=DEFAULT_TRAINER)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--test-size", type=float, default=0.2, help="Share of rows held out for evaluation")
+    parser.add_argument("--label-noise", type=float, default=0.05, help="Share of synthetic rows with a random label")
+    parser.add_argument(
+        "--cascade-depth", type=int, default=DEFAULT_CASCADE_DEPTH, help="Depth of the distilled first-tier model, 0 skips it"
+    )
+    parser.add_argument("--min-accuracy", type=float, default=0.0, help="Do not write a bundle below this test accuracy")
+    parser.add_argument("--no-activate", action="store_true", help="Write the bundle without making it CURRENT")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    
+    analyzer = SymptomAnalyzer()
+    report = train(
+        analyzer, rows=args.rows, trainer=args.trainer, seed=args.seed,
+        test_size=args.test_size, label_noise=args.label_noise, cascade_depth=args.cascade_depth
+    )
+    
+    if report['test_accuracy'] < args.min_accuracy:
+        logger.error(f"Test accuracy {report['test_accuracy']:.3f} is below {args.min_accuracy:.3f}, no bundle written")
+        print(json.dumps(report))
+        return 1
+    
+    analyzer._save_models(training=report, activate=not args.no_activate)
+    report['bundle'] = analyzer.model_bundle.version
+    report['activated'] = not args.no_activate
+    print(json.dumps(report))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# utils/analysis_pipeline.py
+import logging
+import uuid
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+from utils.metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+class AnalysisPipeline:
+    """Synchronous preprocess -> analyze -> risk -> recommendations chain.
+    
+    Every result carries a 'timings' dict of seconds per stage. Callers record
+    them as metrics, which works even when the pipeline runs in a worker process.
+    """
+    
+    def __init__(self, preprocessor: Any, analyzer: Any, risk_calculator: Any, cache: Optional[Any] = None):
+        self.preprocessor = preprocessor
+        self.analyzer = analyzer
+        self.risk_calculator = risk_calculator
+        self.cache = cache
+    
+    def run(self, symptom_input: Any) -> Dict[str, Any]:
+        """Run every CPU-bound stage for a single input"""
+        timer = StageTimer()
+        processed_data = self.preprocessor.process_symptoms_sync(symptom_input)
+        timer.lap('preprocess')
+        
+        model_version = self.analyzer.model_version
+        cache_key = self._cache_key(processed_data)
+        cached = self._cache_lookup(processed_data, cache_key, model_version)
+        timer.lap('cache')
+        if cached is not None:
+            cached['timings'] = timer.timings
+            return cached
+        
+        analysis = self.analyzer.analyze_sync(processed_data)
+        timer.lap('inference')
+        risk_data = self.risk_calculator.calculate_risk_sync(analysis, processed_data)
+        timer.lap('risk')
+        recommendations = self.analyzer.generate_recommendations_sync(analysis, risk_data)
+        timer.lap('recommendations')
+        
+        stages = {
+            'processed_data': processed_data,
+            'analysis': analysis,
+            'risk_data': risk_data,
+            'recommendations': recommendations
+        }
+        self._cache_store(cache_key, model_version, stages)
+        self._mark_miss(stages, cache_key)
+        stages['timings'] = timer.timings
+        return stages
+    
+    def run_many(self, symptom_inputs: List[Any]) -> List[Dict[str, Any]]:
+        """Run the stages for a batch with one model call, preserving order.
+        
+        Stage timings cover the whole batch and are shared by every result.
+        """
+        timer = StageTimer()
+        processed_items = self.preprocessor.process_symptoms_many_sync(symptom_inputs)
+        timer.lap('preprocess')
+        
+        model_version = self.analyzer.model_version
+        cache_keys = [self._cache_key(processed_data) for processed_data in processed_items]
+        results: List[Optional[Dict[str, Any]]] = [
+            self._cache_lookup(processed_data, key, model_version)
+            for processed_data, key in zip(processed_items, cache_keys)
+        ]
+        timer.lap('cache')
+        
+        # Only cache misses go through the model
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            miss_items = [processed_items[i] for i in misses]
+            analyses = self.analyzer.analyze_many_sync(miss_items)
+            timer.lap('inference')
+            for i, stages in zip(misses, self._finish_many(miss_items, analyses, timer)):
+                results[i] = stages
+                self._cache_store(cache_keys[i], model_version, stages)
+                self._mark_miss(stages, cache_keys[i])
+        
+        for stages in results:
+            stages['timings'] = timer.timings
+        return results
+    
+    def prepare(self, symptom_input: Any) -> Dict[str, Any]:
+        """Preprocess one input and build its feature row for a later batch"""
+        timer = StageTimer()
+        processed_data = self.preprocessor.process_symptoms_sync(symptom_input)
+        timer.lap('preprocess')
+        
+        model_version = self.analyzer.model_version
+        cache_key = self._cache_key(processed_data)
+        cached = self._cache_lookup(processed_data, cache_key, model_version)
+        timer.lap('cache')
+        if cached is not None:
+            cached['timings'] = timer.timings
+            return {'processed_data': processed_data, 'stages': cached}
+        
+        try:
+            features = self.analyzer.extract_features_sync(processed_data)
+        except Exception as e:
+            logger.error(f"Error extracting features: {e}")
+            features = None
+        timer.lap('features')
+        
+        return {
+            'processed_data': processed_data,
+            'features': features,
+            'cache_key': cache_key,
+            'model_version': model_version,
+            'timings': timer.timings
+        }
+    
+    def run_prepared_many(self, prepared_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score prepared inputs with one stacked prediction, preserving order.
+        
+        Each result's timings combine its own prepare() stages with the shared
+        batch stages, since every item waited for the whole batch.
+        """
+        timer = StageTimer()
+        processed_items = [item['processed_data'] for item in prepared_items]
+        analyses: List[Optional[Dict[str, Any]]] = [None] * len(prepared_items)
+        
+        # Rows whose features could not be built take the per-item fallback path
+        ready = [i for i, item in enumerate(prepared_items) if item['features'] is not None]
+        if ready:
+            features = np.vstack([prepared_items[i]['features'] for i in ready])
+            batch_analyses = self.analyzer.analyze_features_sync([processed_items[i] for i in ready], features)
+            for i, analysis in zip(ready, batch_analyses):
+                analyses[i] = analysis
+        for i, analysis in enumerate(analyses):
+            if analysis is None:
+                analyses[i] = self.analyzer.analyze_sync(processed_items[i])
+        timer.lap('inference')
+        
+        results = self._finish_many(processed_items, analyses, timer)
+        for item, stages in zip(prepared_items, results):
+            self._cache_store(item.get('cache_key'), item.get('model_version'), stages)
+            self._mark_miss(stages, item.get('cache_key'))
+            stages['timings'] = dict(item.get('timings', {}), **timer.timings)
+        
+        return results
+    
+    def score_what_if(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Score a what-if grid and serialize it as the JSON response content.
+        
+        request holds the base analysis inputs plus the optional axes ages,
+        durations, pain_levels and comorbidity_counts. Axis values are
+        validated by the caller.
+        """
+        calculator = self.risk_calculator
+        processed_data = self.preprocessor.process_risk_inputs_sync(request)
+        grid = calculator.calculate_risk_grid(
+            {'primary_condition': request['condition'], 'confidence': request['confidence']}, processed_data,
+            request.get('ages'), request.get('durations'), request.get('pain_levels'), request.get('comorbidity_counts')
+        )
+        
+        base = grid['base']
+        base_level = calculator.URGENCY_LEVELS[base['urgency_code']]
+        transitions = {
+            f"{base_level}->{level}": int(count)
+            for level, count in zip(calculator.URGENCY_LEVELS, grid['urgency_counts'])
+            if level != base_level and count
+        }
+        # Plain lists, so the response goes straight through json.dumps
+        return {
+            "axes": grid['axes'],
+            "base": {
+                "risk_score": base['risk_score'],
+                "urgency_level": base_level,
+                "follow_up_days": None if base['follow_up_days'] == calculator.FOLLOW_UP_IMMEDIATE else base['follow_up_days']
+            },
+            "urgency_levels": list(calculator.URGENCY_LEVELS),
+            "risk_scores": grid['risk_score'].tolist(),
+            "urgency": grid['urgency_code'].tolist(),
+            "transitions": transitions,
+            "unchanged": int(grid['urgency_counts'][base['urgency_code']])
+        }
+    
+    def _finish_many(self, processed_items: List[Dict[str, Any]], analyses: List[Dict[str, Any]],
+                     timer: StageTimer) -> List[Dict[str, Any]]:
+        """Score risk and build recommendations for analyzed inputs"""
+        risk_items = self.risk_calculator.calculate_risk_many_sync(analyses, processed_items)
+        timer.lap('risk')
+        
+        results = []
+        for processed_data, analysis, risk_data in zip(processed_items, analyses, risk_items):
+            try:
+                recommendations = self.analyzer.generate_recommendations_sync(analysis, risk_data)
+                results.append({
+                    'processed_data': processed_data,
+                    'analysis': analysis,
+                    'risk_data': risk_data,
+                    'recommendations': recommendations
+                })
+            except Exception as e:
+                logger.error(f"Error generating recommendations: {e}")
+                results.append({'error': str(e)})
+        timer.lap('recommendations')
+        
+        return results
+    
+    def _cache_key(self, processed_data: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None or not self.cache.enabled:
+            return None
+        return self.cache.make_key(processed_data)
+    
+    def _cache_lookup(self, processed_data: Dict[str, Any], cache_key: Optional[str],
+                      model_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return stages for a cache hit, with a freshly minted analysis id"""
+        if cache_key is None:
+            return None
+        
+        cached = self.cache.get(cache_key, model_version)
+        if cached is None:
+            return None
+        
+        return {
+            'processed_data': processed_data,
+            'analysis': dict(cached['analysis'], analysis_id=str(uuid.uuid4())),
+            'risk_data': cached['risk_data'],
+            'recommendations': cached['recommendations'],
+            'cache_hit': True
+        }
+    
+    def _cache_store(self, cache_key: Optional[str], model_version: Optional[str], stages: Dict[str, Any]):
+        """Cache the model-dependent stages of a successful analysis"""
+        # Keyword fallbacks (no differential) reflect a model failure, not the input
+        if cache_key is None or 'error' in stages or not stages['analysis'].get('differential'):
+            return
+        
+        self.cache.put(cache_key, model_version, {
+            'analysis': stages['analysis'],
+            'risk_data': stages['risk_data'],
+            'recommendations': stages['recommendations']
+        })
+    
+    @staticmethod
+    def _mark_miss(stages: Dict[str, Any], cache_key: Optional[str]):
+        """Flag results that were looked up and missed, so the parent can count them"""
+        if cache_key is not None:
+            stages['cache_hit'] = False
+
+# Pipeline used by the module-level entry points below. Executors reference
+# those functions by name, so forked worker processes pick up the pipeline
+# that was installed before the fork.
+_pipeline: Optional[AnalysisPipeline] = None
+
+def install_pipeline(pipeline: AnalysisPipeline):
+    """Make pipeline the target of the executor entry points"""
+    global _pipeline
+    _pipeline = pipeline
+
+def run_analysis(symptom_input: Any) -> Dict[str, Any]:
+    """Executor entry point for a single analysis"""
+    return _pipeline.run(symptom_input)
+
+def run_analysis_many(symptom_inputs: List[Any]) -> List[Dict[str, Any]]:
+    """Executor entry point for a batch analysis"""
+    return _pipeline.run_many(symptom_inputs)
+
+def prepare_analysis(symptom_input: Any) -> Dict[str, Any]:
+    """Executor entry point for the per-request half of a micro-batch"""
+    return _pipeline.prepare(symptom_input)
+
+def run_prepared_analyses(prepared_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Executor entry point for one coalesced micro-batch"""
+    return _pipeline.run_prepared_many(prepared_items)
+
+def run_what_if(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Executor entry point for a what-if risk grid"""
+    return _pipeline.score_what_if(request)
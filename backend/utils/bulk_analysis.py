@@ -0,0 +1,123 @@
+# utils/bulk_analysis.py
+import csv
+import io
+import json
+import logging
+import os
+from itertools import islice
+from typing import Dict, List, Any, Iterator, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rows read, analyzed and written per step; memory use scales with this, not the file
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+
+# CSV cells holding lists accept either a JSON array or ';'-separated values
+LIST_FIELDS = ('additional_symptoms', 'medical_history')
+INT_FIELDS = ('age',)
+
+FORMATS = ('csv', 'jsonl')
+
+# (row number, parsed record or None, parse error or None)
+BulkRecord = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+def detect_format(requested: Optional[str], filename: Optional[str]) -> str:
+    """Resolve the input format from an explicit value or the file extension"""
+    if requested:
+        fmt = requested.lower()
+    else:
+        extension = os.path.splitext(filename or '')[1].lower()
+        fmt = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension)
+    
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported bulk input format: {requested or filename}, expected csv or jsonl")
+    return fmt
+
+def open_text(binary_stream: Any) -> TextIO:
+    """Wrap a binary file object for line-by-line text reading"""
+    # utf-8-sig drops the BOM that spreadsheet exports often add
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[BulkRecord]:
+    """Yield input rows one at a time without reading the whole stream"""
+    if fmt == 'csv':
+        return _iter_csv(stream)
+    return _iter_jsonl(stream)
+
+def read_chunk(records: Iterator[BulkRecord], size: Optional[int] = None) -> List[BulkRecord]:
+    """Take the next chunk of rows; an empty list means the input is exhausted"""
+    return list(islice(records, size or BULK_CHUNK_SIZE))
+
+def _iter_csv(stream: TextIO) -> Iterator[BulkRecord]:
+    # csv.reader pulls further lines itself for quoted fields spanning lines
+    reader = csv.DictReader(stream)
+    row_number = 0
+    while True:
+        row_number += 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield row_number, None, f"Malformed CSV row: {e}"
+            continue
+        
+        if None in row:
+            yield row_number, None, "Row has more fields than the header"
+            continue
+        
+        try:
+            yield row_number, _csv_row_to_input(row), None
+        except ValueError as e:
+            yield row_number, None, str(e)
+
+def _iter_jsonl(stream: TextIO) -> Iterator[BulkRecord]:
+    row_number = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Malformed JSON: {e}"
+            continue
+        
+        if not isinstance(record, dict):
+            yield row_number, None, "Expected a JSON object per line"
+            continue
+        
+        yield row_number, record, None
+
+def _csv_row_to_input(row: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """Convert CSV cells to SymptomInput fields; blank cells are omitted"""
+    item = {}
+    for field, value in row.items():
+        value = (value or '').strip()
+        if not field or not value:
+            continue
+        
+        field = field.strip()
+        if field in LIST_FIELDS:
+            item[field] = _parse_list_cell(value)
+        elif field in INT_FIELDS:
+            try:
+                item[field] = int(float(value))
+            except ValueError:
+                raise ValueError(f"Invalid {field}: {value}")
+        else:
+            item[field] = value
+    
+    return item
+
+def _parse_list_cell(value: str) -> List[str]:
+    if value.startswith('['):
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return [str(entry) for entry in parsed]
+        except json.JSONDecodeError:
+            pass
+    return [entry.strip() for entry in value.split(';') if entry.strip()]
@@ -8,18 +8,38 @@ import pandas as pd
 from typing import Dict, List, Any, Optional
 import logging
 import asyncio
+import threading
 from spellchecker import SpellChecker
 
 logger = logging.getLogger(__name__)
 
 class DataPreprocessor:
     def __init__(self):
-        self.spell_checker = SpellChecker()
+        self._spell_checker = None
         self.lemmatizer = WordNetLemmatizer()
         self.medical_synonyms = {}
         self.symptom_normalizer = {}
+        self._nltk_ready = False
+        self._init_lock = threading.Lock()
         self._setup_medical_vocabulary()
-        self._initialize_nltk_data()
+    
+    @property
+    def spell_checker(self) -> SpellChecker:
+        """Spell checker, built on first use since loading its dictionary is slow"""
+        if self._spell_checker is None:
+            with self._init_lock:
+                if self._spell_checker is None:
+                    self._spell_checker = SpellChecker()
+        return self._spell_checker
+    
+    def ensure_nltk_data(self):
+        """Check for (and if needed download) NLTK data once, on first use"""
+        if self._nltk_ready:
+            return
+        with self._init_lock:
+            if not self._nltk_ready:
+                self._initialize_nltk_data()
+                self._nltk_ready = True
     
     def _initialize_nltk_data(self):
         """Download required NLTK data"""
@@ -85,6 +105,11 @@ class DataPreprocessor:
     
     async def process_symptoms(self, symptom_input: Any) -> Dict[str, Any]:
         """Process and normalize symptom input data"""
+        return self.process_symptoms_sync(symptom_input)
+    
+    def process_symptoms_sync(self, symptom_input: Any) -> Dict[str, Any]:
+        """Synchronous core of process_symptoms, safe to run in a worker"""
+        self.ensure_nltk_data()
         try:
             # Convert input to dictionary if it's a Pydantic model
             if hasattr(symptom_input, 'dict'):
@@ -93,10 +118,10 @@ class DataPreprocessor:
                 data = dict(symptom_input)
             
             # Process primary concern
-            primary_concern = await self._process_text_symptom(data.get('primary_concern', ''))
+            primary_concern = self._process_text_symptom(data.get('primary_concern', ''))
             
             # Process additional symptoms
-            additional_symptoms = await self._process_symptom_list(data.get('additional_symptoms', []))
+            additional_symptoms = self._process_symptom_list(data.get('additional_symptoms', []))
             
             # Normalize duration
             duration = self._normalize_duration(data.get('duration', ''))
@@ -105,14 +130,14 @@ class DataPreprocessor:
             pain_level = self._normalize_pain_level(data.get('pain_level', ''))
             
             # Process medications
-            medications = await self._process_medications(data.get('medications', ''))
+            medications = self._process_medications(data.get('medications', ''))
             
             # Extract demographic info
             age = self._validate_age(data.get('age'))
             gender = self._normalize_gender(data.get('gender', ''))
             
             # Process medical history
-            medical_history = await self._process_medical_history(data.get('medical_history', []))
+            medical_history = self._process_medical_history(data.get('medical_history', []))
             
             # Create processed data
             processed_data = {
@@ -129,7 +154,7 @@ class DataPreprocessor:
             }
             
             # Add derived features
-            processed_data.update(await self._extract_derived_features(processed_data))
+            processed_data.update(self._extract_derived_features(processed_data))
             
             logger.info("Successfully processed symptom data")
             return processed_data
@@ -138,7 +163,26 @@ class DataPreprocessor:
             logger.error(f"Error processing symptoms: {e}")
             return self._create_fallback_processed_data(symptom_input)
     
-    async def _process_text_symptom(self, text: str) -> str:
+    async def process_symptoms_many(self, symptom_inputs: List[Any]) -> List[Dict[str, Any]]:
+        """Process a batch of symptom inputs, preserving input order"""
+        return self.process_symptoms_many_sync(symptom_inputs)
+    
+    def process_symptoms_many_sync(self, symptom_inputs: List[Any]) -> List[Dict[str, Any]]:
+        """Synchronous core of process_symptoms_many"""
+        return [self.process_symptoms_sync(symptom_input) for symptom_input in symptom_inputs]
+    
+    def process_risk_inputs_sync(self, symptom_input: Any) -> Dict[str, Any]:
+        """Normalize only the fields risk scoring reads, skipping the text processing"""
+        data = symptom_input.dict() if hasattr(symptom_input, 'dict') else dict(symptom_input)
+        return {
+            'additional_symptoms': self._process_symptom_list(data.get('additional_symptoms', [])),
+            'duration': self._normalize_duration(data.get('duration', '')),
+            'pain_level': self._normalize_pain_level(data.get('pain_level', '')),
+            'age': self._validate_age(data.get('age')),
+            'medical_history': self._process_medical_history(data.get('medical_history', []))
+        }
+    
+    def _process_text_symptom(self, text: str) -> str:
         """Process and normalize text-based symptom descriptions"""
         if not text or not isinstance(text, str):
             return ""
@@ -150,7 +194,7 @@ class DataPreprocessor:
         text = re.sub(r'\s+', ' ', text)
         
         # Correct common spelling errors
-        text = await self._spell_check_medical_terms(text)
+        text = self._spell_check_medical_terms(text)
         
         # Normalize medical synonyms
         text = self._apply_medical_synonyms(text)
@@ -160,7 +204,7 @@ class DataPreprocessor:
         
         return text.strip()
     
-    async def _process_symptom_list(self, symptoms: List[str]) -> List[str]:
+    def _process_symptom_list(self, symptoms: List[str]) -> List[str]:
         """Process list of additional symptoms"""
         if not symptoms:
             return []
@@ -236,7 +280,7 @@ class DataPreprocessor:
         else:
             return "Moderate pain (4-6/10)"  # Default
     
-    async def _process_medications(self, medications: str) -> Dict[str, Any]:
+    def _process_medications(self, medications: str) -> Dict[str, Any]:
         """Process medication information"""
         if not medications or not isinstance(medications, str):
             return {'current_medications': [], 'medication_categories': []}
@@ -298,7 +342,7 @@ class DataPreprocessor:
         else:
             return "Not specified"
     
-    async def _process_medical_history(self, medical_history: List[str]) -> List[str]:
+    def _process_medical_history(self, medical_history: List[str]) -> List[str]:
         """Process and normalize medical history"""
         if not medical_history:
             return []
@@ -333,7 +377,7 @@ class DataPreprocessor:
         
         return condition_mappings.get(condition, condition.title())
     
-    async def _spell_check_medical_terms(self, text: str) -> str:
+    def _spell_check_medical_terms(self, text: str) -> str:
         """Spell check with focus on medical terms"""
         words = word_tokenize(text)
         corrected_words = []
@@ -437,7 +481,7 @@ class DataPreprocessor:
         
         return list(all_symptoms)
     
-    async def _extract_derived_features(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _extract_derived_features(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
         """Extract derived features from processed data"""
         derived_features = {}
         
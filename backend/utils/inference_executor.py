@@ -0,0 +1,129 @@
+# utils/inference_executor.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference queue is full and a request must be shed"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+def _call_with_start_time(fn: Callable, *args) -> tuple:
+    """Run fn in the worker and report when it actually started"""
+    # CLOCK_MONOTONIC is system-wide, so this is comparable across processes
+    return time.monotonic(), fn(*args)
+
+class InferenceExecutor:
+    """Bounded thread or process pool for CPU-bound inference work"""
+    
+    def __init__(self, kind: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, retry_after: Optional[int] = None):
+        self.kind = (kind or os.getenv('INFERENCE_EXECUTOR', 'thread')).lower()
+        if self.kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown inference executor kind: {self.kind}")
+        
+        self.max_workers = max_workers or int(os.getenv('INFERENCE_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('INFERENCE_QUEUE_SIZE', '64'))
+        self.retry_after = retry_after or int(os.getenv('INFERENCE_RETRY_AFTER', '1'))
+        
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+    
+    def start(self):
+        """Create the underlying worker pool"""
+        if self._executor is not None:
+            return
+        
+        if self.kind == 'process':
+            # Fork so workers inherit the models already loaded in this process
+            context = multiprocessing.get_context('fork')
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+        
+        logger.info(
+            f"Inference executor started ({self.kind}, workers={self.max_workers}, queue={self.max_queue})"
+        )
+    
+    def restart(self):
+        """Fork fresh process workers, e.g. after the parent swapped its model.
+        
+        Jobs already submitted finish on the old workers. Thread workers share
+        the parent's model references, so there is nothing to do for them.
+        """
+        if self.kind != 'process' or self._executor is None:
+            return
+        old_executor, self._executor = self._executor, None
+        self.start()
+        old_executor.shutdown(wait=False)
+    
+    def shutdown(self):
+        """Wait for running jobs and release the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+    
+    @property
+    def queue_depth(self) -> int:
+        """Jobs accepted but not yet picked up by a worker"""
+        return max(0, self._in_flight - self.max_workers)
+    
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool, shedding load when the queue is full.
+        
+        With a process pool fn must be a module-level function so it can be
+        referenced by name in the forked workers.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference executor is not started")
+        
+        # Only the event loop thread touches the counters, so no lock is needed
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise ExecutorSaturatedError(self.retry_after)
+        
+        self._in_flight += 1
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(self._executor, _call_with_start_time, fn, *args)
+            finished = time.monotonic()
+            self.wait_time.observe(max(0.0, started - submitted))
+            self.run_time.observe(finished - started)
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current load and timing statistics for sizing the pool"""
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self._in_flight,
+            'queue_depth': self.queue_depth,
+            'completed': self._completed,
+            'rejected': self._rejected,
+            'failed': self._failed,
+            'wait_time_seconds': self.wait_time.snapshot(),
+            'run_time_seconds': self.run_time.snapshot()
+        }
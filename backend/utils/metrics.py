@@ -0,0 +1,209 @@
+# utils/metrics.py
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# Default latency buckets in seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket bounds"""
+    
+    def __init__(self, buckets: Optional[tuple] = None):
+        self.buckets = tuple(sorted(buckets or DEFAULT_LATENCY_BUCKETS))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """Record a single observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a consistent copy of the histogram state"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+            maximum = self._max
+        
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'max': maximum,
+            'buckets': buckets
+        }
+
+class Counter:
+    """Thread-safe monotonically increasing counter"""
+    
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+    
+    @property
+    def value(self) -> float:
+        return self._value
+
+class MetricFamily:
+    """A named metric with one histogram or counter per label value combination"""
+    
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Optional[tuple] = None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values: str) -> Any:
+        """Return the child for these label values, creating it on first use"""
+        # Hot path: label values are already strings and the child exists
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+                    self._children[key] = child
+        return child
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            if self.kind == 'histogram':
+                lines.extend(_histogram_samples(self.name, child, labels))
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide set of metric families rendered in Prometheus text format"""
+    
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Optional[tuple] = None) -> MetricFamily:
+        return self._register(MetricFamily(name, help_text, 'histogram', labelnames, buckets))
+    
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, help_text, 'counter', labelnames))
+    
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callable producing extra exposition lines at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def remove_collector(self, collector: Callable[[], List[str]]):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+    
+    def render(self) -> str:
+        """Render every family and collector in the Prometheus text format"""
+        with self._lock:
+            families = list(self._families.values())
+            collectors = list(self._collectors)
+        
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        for collector in collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+    
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        with self._lock:
+            existing = self._families.get(family.name)
+            if existing is not None:
+                return existing
+            self._families[family.name] = family
+            return family
+
+# Registry exposed on /metrics
+REGISTRY = MetricsRegistry()
+
+class StageTimer:
+    """Wall time per named stage, measured as laps of one stopwatch"""
+    
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._last = time.perf_counter()
+    
+    def lap(self, stage: str):
+        """Attribute the time since the previous lap to stage"""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+def render_histogram(name: str, help_text: str, histogram: Histogram,
+                     labels: Optional[Dict[str, str]] = None) -> List[str]:
+    """Exposition lines for a histogram owned outside the registry"""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"] + _histogram_samples(name, histogram, labels or {})
+
+def render_value(name: str, help_text: str, kind: str, value: float,
+                 labels: Optional[Dict[str, str]] = None) -> List[str]:
+    """Exposition lines for a single gauge or counter sample"""
+    return [
+        f"# HELP {name} {help_text}",
+        f"# TYPE {name} {kind}",
+        f"{name}{_format_labels(labels or {})} {_format_value(value)}"
+    ]
+
+def _histogram_samples(name: str, histogram: Histogram, labels: Dict[str, str]) -> List[str]:
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot['buckets'].items():
+        lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    return lines
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,104 @@
+# utils/micro_batcher.py
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Batch-size buckets; latency histograms use the default second buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into one batched executor job.
+    
+    Items are collected until max_batch_size is reached or max_wait_ms has
+    passed since the first pending item, then batch_fn(items) runs once on
+    the inference executor and each awaiting caller gets its own result.
+    """
+    
+    def __init__(self, executor: Any, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.executor = executor
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or int(os.getenv('MICRO_BATCH_MAX_SIZE', '32'))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('MICRO_BATCH_WINDOW_MS', '2'))
+        
+        self._pending: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._batches = 0
+        self.batch_size = Histogram(buckets=BATCH_SIZE_BUCKETS)
+        self.queue_latency = Histogram()
+        self.batch_latency = Histogram()
+    
+    async def submit(self, item: Any) -> Any:
+        """Queue item for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Dispatch everything pending as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[tuple]):
+        """Run batch_fn on the executor and fan results back out"""
+        dispatched = time.monotonic()
+        self._batches += 1
+        self.batch_size.observe(len(batch))
+        for _, _, queued in batch:
+            self.queue_latency.observe(dispatched - queued)
+        
+        try:
+            results = await self.executor.run(self.batch_fn, [item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.batch_latency.observe(time.monotonic() - dispatched)
+        
+        for (_, future, _), result in zip(batch, results):
+            # Callers that went away (client disconnects) have cancelled futures
+            if not future.done():
+                future.set_result(result)
+    
+    async def close(self):
+        """Flush pending items and wait for in-flight batches"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size and latency histograms for tuning the window"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'pending': len(self._pending),
+            'batches': self._batches,
+            'batch_size': self.batch_size.snapshot(),
+            'queue_latency_seconds': self.queue_latency.snapshot(),
+            'batch_latency_seconds': self.batch_latency.snapshot()
+        }
@@ -0,0 +1,117 @@
+# utils/result_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class AnalysisResultCache:
+    """LRU + TTL cache of analysis results keyed on normalized inputs.
+    
+    The key covers only the processed fields that drive analysis, risk and
+    recommendations, so patient id and timestamps never split entries. The
+    model version is tracked separately: a different version empties the
+    cache, which keeps stale predictions from outliving a model change.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESULT_CACHE_SIZE', '4096'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+        self._entries: OrderedDict = OrderedDict()
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    @staticmethod
+    def make_key(processed_data: Dict[str, Any]) -> Optional[str]:
+        """Canonical hash of the processed fields used by the pipeline"""
+        # Fallback-processed inputs are not normalized, so never cache them
+        if processed_data.get('processing_error'):
+            return None
+        
+        canonical = {
+            'primary_concern': processed_data.get('primary_concern'),
+            'duration': processed_data.get('duration'),
+            'pain_level': processed_data.get('pain_level'),
+            # Order matters: contributors list the first additional symptoms
+            'additional_symptoms': list(processed_data.get('additional_symptoms') or []),
+            # Raw age: risk factors split the risk bands at 65/66 and 75/76
+            'age': processed_data.get('age'),
+            'medical_history': sorted(processed_data.get('medical_history') or [])
+        }
+        encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    def _check_version(self, model_version: Optional[str]):
+        """Drop every entry when the model artifacts change (lock held)"""
+        if model_version != self._model_version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._model_version = model_version
+    
+    def get(self, key: Optional[str], model_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the cached stages for key, or None on a miss"""
+        if not self.enabled or key is None:
+            return None
+        
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+    
+    def put(self, key: Optional[str], model_version: Optional[str], value: Dict[str, Any]):
+        """Store value under key, evicting the least recently used entries"""
+        if not self.enabled or key is None:
+            return
+        
+        with self._lock:
+            self._check_version(model_version)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def record_lookups(self, hits: int = 0, misses: int = 0):
+        """Count lookups made elsewhere, by the copies of this cache in forked workers"""
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'model_version': self._model_version
+            }
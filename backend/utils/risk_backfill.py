@@ -0,0 +1,135 @@
+# utils/risk_backfill.py
+import asyncio
+import logging
+import os
+import time
+from contextlib import aclosing
+from typing import Dict, List, Any, Optional, Tuple
+
+from models.risk_calculator import RiskCalculator
+from utils.data_preprocessor import DataPreprocessor
+
+logger = logging.getLogger(__name__)
+
+# Stored analyses fetched, rescored and written per step; memory use scales with this, not the table
+RISK_BACKFILL_CHUNK_SIZE = int(os.getenv('RISK_BACKFILL_CHUNK_SIZE', '5000'))
+
+# (id, risk_score, urgency_level, follow_up_days) as written back to symptom_analyses
+RiskUpdate = Tuple[int, int, str, Optional[int]]
+
+class RiskBackfill:
+    """Rescores stored analyses with the current risk profiles and writes back the ones that changed.
+    
+    Analyses are streamed in id order through a server-side cursor, one
+    chunk at a time. Each chunk is preprocessed and scored in one
+    calculate_risk_batch call off the event loop, and its changed rows are
+    written with batched UPDATE ... FROM (VALUES ...) together with the
+    checkpoint, while the next chunk is fetched and scored. At most one
+    write is in flight, so memory stays within about two chunks, and an
+    interrupted job resumes after the last chunk it wrote.
+    """
+    
+    def __init__(self, db: Any, calculator: RiskCalculator, preprocessor: DataPreprocessor,
+                 chunk_size: Optional[int] = None, dry_run: bool = False):
+        self.db = db
+        self.calculator = calculator
+        self.preprocessor = preprocessor
+        self.chunk_size = chunk_size or RISK_BACKFILL_CHUNK_SIZE
+        self.dry_run = dry_run
+    
+    def default_job(self) -> str:
+        """Job name tied to the profiles in use, so a profile change starts a fresh backfill"""
+        return f"risk-{self.calculator.profile_fingerprint()}"
+    
+    def rescore(self, rows: List[Dict[str, Any]]) -> Tuple[List[RiskUpdate], int]:
+        """Changed rows of a chunk, and how many rows could not be scored"""
+        analyses, processed_items, scored = [], [], []
+        for row in rows:
+            # Risk depends on the predicted condition and its confidence
+            if row.get('condition_prediction') is None or row.get('confidence') is None:
+                continue
+            analyses.append({'primary_condition': row['condition_prediction'], 'confidence': row['confidence']})
+            processed_items.append(self.preprocessor.process_risk_inputs_sync(row))
+            scored.append(row)
+        if not scored:
+            return [], len(rows)
+        
+        result = self.calculator.calculate_risk_batch(**self.calculator.encode_risk_inputs(analyses, processed_items))
+        immediate = self.calculator.FOLLOW_UP_IMMEDIATE
+        updates = []
+        for row, risk_score, urgency_level, follow_up_days in zip(
+            scored, result['risk_score'].tolist(), result['urgency_level'], result['follow_up_days'].tolist()
+        ):
+            follow_up_days = None if follow_up_days == immediate else follow_up_days
+            if (row['risk_score'], row['urgency_level'], row['follow_up_days']) != (risk_score, urgency_level, follow_up_days):
+                updates.append((row['id'], risk_score, urgency_level, follow_up_days))
+        return updates, len(rows) - len(scored)
+    
+    async def run(self, job: Optional[str] = None, restart: bool = False) -> Dict[str, Any]:
+        """Rescore every analysis after the job's checkpoint and return a summary"""
+        if not self.db.pool:
+            raise RuntimeError("Risk backfill needs a postgres connection")
+        job = job or self.default_job()
+        if self.dry_run:
+            # A dry run reads everything and leaves the checkpoint alone
+            checkpoint = {'last_id': 0, 'finished_at': None}
+        else:
+            checkpoint = await self.db.start_risk_backfill(job, restart=restart)
+        if checkpoint['finished_at'] is not None:
+            # Same profiles as a finished run: only analyses stored since then are new
+            logger.info(
+                f"Risk backfill {job} finished before, rescoring analyses after id {checkpoint['last_id']}; "
+                f"pass restart to rescore all of them"
+            )
+        
+        started = time.perf_counter()
+        scanned = updated = skipped = 0
+        pending: Optional[asyncio.Task] = None
+        try:
+            # Closed on any exit, so a failed write releases the cursor and its transaction at once
+            async with aclosing(self.db.iter_risk_inputs(checkpoint['last_id'], self.chunk_size)) as chunks:
+                async for rows in chunks:
+                    updates, unscored = await asyncio.to_thread(self.rescore, rows)
+                    # Checkpoints must advance in order, so wait for the previous chunk's write
+                    if pending is not None:
+                        await self._finish_write(pending)
+                    if not self.dry_run:
+                        pending = asyncio.create_task(
+                            self.db.update_risk_scores(job, updates, rows[-1]['id'], len(rows))
+                        )
+                    
+                    scanned += len(rows)
+                    updated += len(updates)
+                    skipped += unscored
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"Risk backfill {job}: {scanned} rows scanned, {updated} changed, "
+                        f"{scanned / elapsed:,.0f} rows/s, up to id {rows[-1]['id']}"
+                    )
+            
+            if pending is not None:
+                await self._finish_write(pending)
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+        
+        if not self.dry_run:
+            await self.db.finish_risk_backfill(job)
+        seconds = time.perf_counter() - started
+        return {
+            'job': job,
+            'profile': self.calculator.profile_fingerprint(),
+            'resumed_after_id': checkpoint['last_id'],
+            'rows_scanned': scanned,
+            'rows_updated': updated,
+            'rows_skipped': skipped,
+            'dry_run': self.dry_run,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(scanned / seconds, 1) if seconds else None
+        }
+    
+    @staticmethod
+    async def _finish_write(task: asyncio.Task):
+        if not await task:
+            raise RuntimeError("Writing rescored analyses failed, rerun to resume from the last checkpoint")